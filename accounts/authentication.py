@@ -1,22 +1,133 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
 from accounts.models import User, Token
 
 
+class UserCache(object):
+    '''кэш поиска пользователей по email для get_user
+
+    Первый уровень - словарь в памяти процесса с TTL и вытеснением давно
+    не использованных записей (LRU), второй, необязательный - общий кэш
+    Django (USER_CACHE_ALIAS), который видят все процессы. У User есть
+    только email, поэтому хранится лишь факт существования пользователя,
+    а объект каждый раз собирается заново: запросы не делят один экземпляр.
+    '''
+
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.shared_hits = self.misses = 0
+
+    def get_user(self, email, load):
+        '''пользователь по email; load(email) вызывается при промахе'''
+        exists = self._get_local(email)
+        if exists is None:
+            exists = self._get_shared(email)
+            if exists is None:
+                self._count('misses')
+                exists = load(email) is not None
+                self._set_shared(email, exists)
+            else:
+                self._count('shared_hits')
+            self._set_local(email, exists)
+        else:
+            self._count('hits')
+        return User.from_db(DEFAULT_DB_ALIAS, ['email'], [email]) if exists else None
+
+    def invalidate(self, email):
+        '''забыть запись о пользователе'''
+        with self._lock:
+            self._entries.pop(email, None)
+        shared = self._shared()
+        if shared is not None:
+            shared.delete(self._shared_key(email))
+
+    def clear(self):
+        '''очистить кэш процесса и счетчики'''
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.shared_hits = self.misses = 0
+
+    def stats(self):
+        '''счетчики попаданий'''
+        total = self.hits + self.shared_hits + self.misses
+        return {
+            'hits': self.hits,
+            'shared_hits': self.shared_hits,
+            'misses': self.misses,
+            'hit_rate': (self.hits + self.shared_hits) / total if total else 0.0,
+        }
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _get_local(self, email):
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None:
+                return None
+            exists, expires = entry
+            if expires < time.monotonic():
+                del self._entries[email]
+                return None
+            self._entries.move_to_end(email)
+            return exists
+
+    def _set_local(self, email, exists):
+        with self._lock:
+            self._entries[email] = (exists, time.monotonic() + settings.USER_CACHE_TTL)
+            self._entries.move_to_end(email)
+            while len(self._entries) > settings.USER_CACHE_SIZE:
+                self._entries.popitem(last=False)
+
+    def _shared(self):
+        alias = settings.USER_CACHE_ALIAS
+        return caches[alias] if alias else None
+
+    def _shared_key(self, email):
+        return f'user-exists:{email}'
+
+    def _get_shared(self, email):
+        shared = self._shared()
+        if shared is not None:
+            return shared.get(self._shared_key(email))
+
+    def _set_shared(self, email, exists):
+        shared = self._shared()
+        if shared is not None:
+            shared.set(self._shared_key(email), exists, settings.USER_CACHE_TTL)
+
+
+user_cache = UserCache()
+
+
 class PasswordlessAuthenticationBackend(object):
     '''беспарольный серверный процессор аутентификации'''
 
     def authenticate(self, request, uid):
         '''аутентифицировать'''
+        email = Token.use(uid)
+        if email is None:
+            return None
         try:
-            token = Token.objects.get(uid=uid)
-            return User.objects.get(email=token.email)
+            return User.objects.get(email=email)
         except User.DoesNotExist:
-            return User.objects.create(email=token.email)
-        except Token.DoesNotExist:
-            return None
+            user = User.objects.create(email=email)
+            user_cache.invalidate(email)
+            return user
     
     def get_user(self, email):
-        '''получить пользователя по email'''
+        '''получить пользователя по email (через кэш)'''
+        return user_cache.get_user(email, self._load_user)
+
+    def _load_user(self, email):
+        '''получить пользователя из базы данных'''
         try:
             return User.objects.get(email=email)
         except User.DoesNotExist:
-            return None
\ No newline at end of file
+            return None
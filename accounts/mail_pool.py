@@ -0,0 +1,203 @@
+import queue
+import smtplib
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.mail import get_connection
+
+
+def is_connection_error(error):
+    '''ошибка соединения (а не отказ сервера принять письмо): после нее
+    соединение считается испорченным и открывается заново'''
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError)):
+        return True
+    # SMTPException - тоже OSError, но означает ответ сервера, а не обрыв
+    return isinstance(error, OSError) and not isinstance(error, smtplib.SMTPException)
+
+
+class DeliveryStats(object):
+    '''скорость отправки и задержка на одно письмо'''
+
+    def __init__(self, window=1000):
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=window)
+        self.sent = self.failed = self.reconnects = 0
+        self.busy_time = 0.0
+
+    def record(self, latency, ok):
+        with self._lock:
+            self._latencies.append(latency)
+            self.busy_time += latency
+            if ok:
+                self.sent += 1
+            else:
+                self.failed += 1
+
+    def snapshot(self):
+        '''текущие показатели: писем в секунду и задержка p50/p95 в мс'''
+        with self._lock:
+            latencies = sorted(self._latencies)
+            busy_time = self.busy_time
+            sent, failed, reconnects = self.sent, self.failed, self.reconnects
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+        return {
+            'sent': sent,
+            'failed': failed,
+            'reconnects': reconnects,
+            'messages_per_second': sent / busy_time if busy_time else 0.0,
+            'latency_p50_ms': percentile(0.50),
+            'latency_p95_ms': percentile(0.95),
+        }
+
+
+class SMTPConnectionPool(object):
+    '''пул открытых и авторизованных соединений с почтовым сервером
+
+    Соединение открывается (TLS и вход) один раз и затем используется
+    для многих писем. Перед выдачей соединение, простоявшее дольше
+    max_idle, проверяется командой NOOP; испорченное соединение
+    закрывается и открывается заново, а письмо отправляется повторно.
+    '''
+
+    def __init__(self, size=None, max_idle=None, backend=None):
+        self.size = size or settings.EMAIL_POOL_SIZE
+        self.max_idle = settings.EMAIL_POOL_MAX_IDLE if max_idle is None else max_idle
+        self.backend = backend
+        self.stats = DeliveryStats()
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+
+    def send_batch(self, messages):
+        '''отправить пакет писем; вернуть список ошибок (None - отправлено)
+
+        Если соединение не удалось открыть (в начале или при повторном
+        открытии после обрыва), оставшиеся письма пакета получают эту
+        ошибку, а уже отправленные остаются отправленными.
+        '''
+        results = []
+        try:
+            with self.connection() as holder:
+                for message in messages:
+                    started = time.perf_counter()
+                    error = self._send(holder, message)
+                    self.stats.record(time.perf_counter() - started, error is None)
+                    results.append(error)
+        except Exception as e:
+            results.extend([e] * (len(messages) - len(results)))
+        return results
+
+    def close(self):
+        '''закрыть все свободные соединения'''
+        while True:
+            try:
+                connection, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(connection)
+
+    @contextmanager
+    def connection(self):
+        '''взять соединение из пула на время блока'''
+        holder = [self._acquire()]
+        try:
+            yield holder
+        except BaseException:
+            self._discard(holder[0])
+            raise
+        else:
+            self._idle.put((holder[0], time.monotonic()))
+
+    def _send(self, holder, message):
+        '''отправить одно письмо; при обрыве соединения переоткрыть и повторить'''
+        error = None
+        for attempt in range(2):
+            try:
+                holder[0].send_messages([message])
+                return None
+            except Exception as e:
+                if not is_connection_error(e):
+                    return e
+                error = e
+                holder[0].close()
+                holder[0] = self._open()
+                with self._lock:
+                    self.stats.reconnects += 1
+        return error
+
+    def _acquire(self):
+        '''свободное соединение, новое (если пул не заполнен) или ожидание'''
+        while True:
+            try:
+                connection, idle_since = self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            else:
+                idle = time.monotonic() - idle_since
+                if idle <= self.max_idle or self._is_alive(connection):
+                    return connection
+                self._discard(connection)
+                continue
+            with self._lock:
+                can_open = self._created < self.size
+                if can_open:
+                    self._created += 1
+            if can_open:
+                try:
+                    return self._open()
+                except BaseException:
+                    self._release_slot()
+                    raise
+            try:
+                connection, _ = self._idle.get(timeout=1)
+            except queue.Empty:
+                continue
+            return connection
+
+    def _open(self):
+        '''открыть новое соединение'''
+        connection = get_connection(self.backend, fail_silently=False)
+        connection.open()
+        return connection
+
+    def _is_alive(self, connection):
+        '''проверить давно простаивающее соединение командой NOOP'''
+        smtp = getattr(connection, 'connection', None)
+        if smtp is None:
+            return True
+        try:
+            return smtp.noop()[0] == 250
+        except OSError:
+            return False
+
+    def _discard(self, connection):
+        '''закрыть соединение и освободить его место в пуле'''
+        try:
+            connection.close()
+        except Exception:
+            pass
+        self._release_slot()
+
+    def _release_slot(self):
+        with self._lock:
+            self._created -= 1
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    '''общий пул соединений процесса'''
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SMTPConnectionPool()
+        return _pool
@@ -0,0 +1,56 @@
+import time
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from accounts.models import Token
+
+
+class Command(BaseCommand):
+    '''удалить просроченные маркеры входа и сеансы
+
+    Удаление идет небольшими пакетами по первичному ключу с паузой между
+    ними: каждая транзакция держит блокировку записи SQLite недолго,
+    и запросы сайта успевают выполняться между пакетами. Поэтому команду
+    можно запускать из cron на работающем сайте.
+    '''
+
+    help = 'Delete expired login tokens and sessions in small batches'
+
+    def add_arguments(self, parser):
+        '''добавить аргументы'''
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--pause', type=float, default=0.1,
+            help='seconds to sleep between batches',
+        )
+
+    def handle(self, *args, **options):
+        '''Обработать'''
+        self.batch_size = options['batch_size']
+        self.pause = options['pause']
+        self._purge('tokens', Token.objects.filter(created_at__lt=Token.expiry_cutoff()))
+        self._purge('sessions', Session.objects.filter(expire_date__lt=timezone.now()))
+
+    def _purge(self, label, expired):
+        '''удалить строки запроса пакетами по возрастанию первичного ключа'''
+        started = time.monotonic()
+        deleted = batches = 0
+        last_pk = None
+        while True:
+            batch = expired.order_by('pk')
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            pks = list(batch.values_list('pk', flat=True)[:self.batch_size])
+            if not pks:
+                break
+            count, _ = expired.model.objects.filter(pk__in=pks).delete()
+            deleted += count
+            batches += 1
+            last_pk = pks[-1]
+            if len(pks) < self.batch_size:
+                break
+            time.sleep(self.pause)
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            f'{label}: deleted {deleted} in {batches} batches, {elapsed:.1f}s'
+        )
@@ -0,0 +1,33 @@
+import time
+from django.core.management.base import BaseCommand
+from accounts.mail_pool import get_pool
+from accounts.outbox import deliver_pending
+
+
+class Command(BaseCommand):
+    '''отдельный процесс отправки писем из очереди исходящих'''
+
+    help = 'Deliver queued emails from the outbox (EMAIL_OUTBOX_DELIVERY=command)'
+
+    def add_arguments(self, parser):
+        '''добавить аргументы'''
+        parser.add_argument('--once', action='store_true', help='deliver one pass and exit')
+        parser.add_argument('--interval', type=float, default=2.0, help='seconds between polls')
+        parser.add_argument('--batch-size', type=int)
+
+    def handle(self, *args, **options):
+        '''Обработать'''
+        while True:
+            sent, failed = deliver_pending(options['batch_size'])
+            if sent or failed:
+                stats = get_pool().stats.snapshot()
+                self.stdout.write(
+                    f'sent {sent}, failed {failed} '
+                    f"({stats['messages_per_second']:.1f} msg/s, "
+                    f"p50 {stats['latency_p50_ms']:.1f} ms, "
+                    f"p95 {stats['latency_p95_ms']:.1f} ms)"
+                )
+                continue
+            if options['once']:
+                return
+            time.sleep(options['interval'])
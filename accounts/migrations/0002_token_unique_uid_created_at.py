@@ -0,0 +1,25 @@
+# Generated by Django 3.2.3 on 2026-10-18 10:30
+
+from django.db import migrations, models
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='token',
+            name='created_at',
+            field=models.DateTimeField(db_index=True, default=django.utils.timezone.now),
+        ),
+        migrations.AlterField(
+            model_name='token',
+            name='uid',
+            field=models.CharField(default=uuid.uuid4, max_length=40, unique=True),
+        ),
+    ]
@@ -1,5 +1,8 @@
 import uuid
+from datetime import timedelta
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 
 class User(models.Model):
@@ -16,4 +19,55 @@ class Token(models.Model):
     """маркер"""
 
     email = models.EmailField()
-    uid = models.CharField(default=uuid.uuid4, max_length=40)
\ No newline at end of file
+    uid = models.CharField(default=uuid.uuid4, max_length=40, unique=True)
+    created_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    @staticmethod
+    def expiry_cutoff():
+        '''маркеры, созданные раньше этого времени, просрочены'''
+        return timezone.now() - timedelta(seconds=settings.LOGIN_TOKEN_TTL)
+
+    @staticmethod
+    def use(uid):
+        '''использовать маркер: вернуть его email и удалить маркер
+
+        Поиск идет по уникальному индексу uid. Удаление по первичному
+        ключу атомарно: из одновременных входов по одной ссылке маркер
+        достанется только тому, чей DELETE действительно удалил строку.
+        Просроченный или уже использованный маркер дает None.
+        '''
+        token = Token.objects.filter(
+            uid=uid, created_at__gte=Token.expiry_cutoff()
+        ).first()
+        if token is None:
+            return None
+        deleted, _ = Token.objects.filter(pk=token.pk).delete()
+        return token.email if deleted else None
+
+
+class OutboxEmail(models.Model):
+    '''письмо в очереди на отправку (исходящие)
+
+    Представление только записывает письмо сюда, а отправляет его
+    фоновый обработчик (accounts.outbox) с повторами и растущей паузой.
+    '''
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUSES = [(PENDING, 'pending'), (SENT, 'sent'), (FAILED, 'failed')]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.EmailField()
+    to = models.EmailField()
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    created_at = models.DateTimeField(default=timezone.now)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # метка обработчика, который забрал письмо на отправку
+    claim = models.CharField(max_length=32, blank=True, default='', db_index=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    last_error = models.TextField(blank=True, default='')
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'next_attempt_at'])]
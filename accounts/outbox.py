@@ -0,0 +1,146 @@
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMessage
+from django.db import connections, transaction
+from django.db.models import Min
+from django.utils import timezone
+from accounts.mail_pool import get_pool
+from accounts.models import OutboxEmail
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+# таймер следующей попытки в режиме thread и время, на которое он заведен
+_timer = None
+_timer_due = None
+_timer_lock = threading.Lock()
+
+
+def enqueue(subject, body, from_email, to):
+    '''поставить письмо в очередь; при режиме thread отправка начнется
+    в фоновом потоке после фиксации транзакции запроса'''
+    email = OutboxEmail.objects.create(
+        subject=subject, body=body, from_email=from_email, to=to,
+    )
+    if settings.EMAIL_OUTBOX_DELIVERY == 'thread':
+        transaction.on_commit(_deliver_in_background)
+    return email
+
+def deliver_pending(batch_size=None):
+    '''отправить письма, подошедшие по времени; вернуть (отправлено, ошибок)
+
+    Пакет уходит через общий пул открытых SMTP-соединений, без
+    установки соединения, TLS и входа на каждое письмо.
+    '''
+    batch = claim_batch(batch_size or settings.EMAIL_OUTBOX_BATCH_SIZE)
+    if not batch:
+        return 0, 0
+    try:
+        errors = get_pool().send_batch([_message(email) for email in batch])
+    except Exception as e:
+        errors = [e] * len(batch)
+    _mark_sent([email for email, error in zip(batch, errors) if error is None])
+    failed = 0
+    for email, error in zip(batch, errors):
+        if error is not None:
+            _schedule_retry(email, error)
+            failed += 1
+    return len(batch) - failed, failed
+
+def claim_batch(batch_size):
+    '''забрать пакет писем на отправку
+
+    Письма помечаются меткой обработчика и сдвигаются на время аренды,
+    так что параллельные обработчики не отправят одно письмо дважды,
+    а письма упавшего обработчика вернутся в очередь после аренды.
+    '''
+    now = timezone.now()
+    due = OutboxEmail.objects.filter(
+        status=OutboxEmail.PENDING, next_attempt_at__lte=now,
+    )
+    ids = list(due.order_by('next_attempt_at').values_list('id', flat=True)[:batch_size])
+    if not ids:
+        return []
+    claim = uuid.uuid4().hex
+    due.filter(id__in=ids).update(
+        claim=claim,
+        next_attempt_at=now + timedelta(seconds=settings.EMAIL_OUTBOX_LEASE),
+    )
+    return list(OutboxEmail.objects.filter(claim=claim).order_by('id'))
+
+def _message(email):
+    '''письмо Django для записи очереди'''
+    return EmailMessage(email.subject, email.body, email.from_email, [email.to])
+
+def _mark_sent(emails):
+    '''отметить письма отправленными (одним запросом)'''
+    if not emails:
+        return
+    OutboxEmail.objects.filter(id__in=[email.id for email in emails]).update(
+        status=OutboxEmail.SENT, sent_at=timezone.now(), claim='',
+    )
+
+def _schedule_retry(email, error):
+    '''запланировать повтор с удвоением паузы или сдаться после предела'''
+    attempts = email.attempts + 1
+    delay = settings.EMAIL_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1)
+    status = OutboxEmail.PENDING
+    if attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+        status = OutboxEmail.FAILED
+        logger.error('giving up on outbox email %s to %s: %s', email.id, email.to, error)
+    else:
+        logger.warning('outbox email %s to %s failed, retry in %ss: %s', email.id, email.to, delay, error)
+    OutboxEmail.objects.filter(id=email.id).update(
+        status=status, attempts=attempts, last_error=str(error), claim='',
+        next_attempt_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+def _deliver_in_background():
+    '''запустить отправку в пуле потоков, не задерживая ответ'''
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.EMAIL_OUTBOX_THREADS,
+            thread_name_prefix='outbox',
+        )
+    _executor.submit(_deliver_and_close_connections)
+
+def _deliver_and_close_connections():
+    '''отправка в фоновом потоке: у потока свое соединение с базой'''
+    try:
+        deliver_pending()
+        _schedule_next_delivery()
+    except Exception:
+        logger.exception('outbox delivery failed')
+    finally:
+        connections.close_all()
+
+def _schedule_next_delivery():
+    '''завести таймер на ближайшую попытку из очереди: повтор после
+    паузы, конец аренды или следующий пакет
+
+    Без него в режиме thread отложенные письма уходили бы только после
+    нового enqueue. Письма, оставшиеся в очереди от прошлого запуска
+    процесса, ждут первого enqueue (или manage.py send_outbox --once).
+    '''
+    global _timer, _timer_due
+    due = OutboxEmail.objects.filter(status=OutboxEmail.PENDING).aggregate(
+        due=Min('next_attempt_at')
+    )['due']
+    if due is None:
+        return
+    with _timer_lock:
+        if _timer is not None and _timer.is_alive() and _timer_due <= due:
+            return
+        if _timer is not None:
+            _timer.cancel()
+        delay = max((due - timezone.now()).total_seconds(), 0)
+        _timer = threading.Timer(delay, _deliver_in_background)
+        _timer.daemon = True
+        _timer_due = due
+        _timer.start()
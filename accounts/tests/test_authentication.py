@@ -1,6 +1,9 @@
-from django.test import TestCase
+from datetime import timedelta
+from django.test import TestCase, override_settings
+from django.utils import timezone
 from django.contrib.auth import get_user_model
-from accounts.authentication import PasswordlessAuthenticationBackend
+from django.core.cache import caches
+from accounts.authentication import PasswordlessAuthenticationBackend, user_cache
 from accounts.models import Token
 
 
@@ -35,9 +38,33 @@ class AuthenticationTest(TestCase):
         user = PasswordlessAuthenticationBackend().authenticate(None, token.uid)
         self.assertEqual(user, existing_user)
 
+    def test_token_can_be_used_only_once(self):
+        '''тест: маркер можно использовать только один раз'''
+        token = Token.objects.create(email='klim@example.com')
+        backend = PasswordlessAuthenticationBackend()
+        self.assertIsNotNone(backend.authenticate(None, token.uid))
+        self.assertIsNone(backend.authenticate(None, token.uid))
+        self.assertFalse(Token.objects.exists())
+
+    @override_settings(LOGIN_TOKEN_TTL=60)
+    def test_returns_None_if_token_expired(self):
+        '''тест: возвращает None, если маркер просрочен'''
+        token = Token.objects.create(
+            email='klim@example.com',
+            created_at=timezone.now() - timedelta(seconds=61),
+        )
+        self.assertIsNone(
+            PasswordlessAuthenticationBackend().authenticate(None, token.uid)
+        )
+        self.assertFalse(User.objects.exists())
+
 class GetUserTest(TestCase):
     '''тест получения пользователя'''
 
+    def setUp(self):
+        '''установка'''
+        user_cache.clear()
+
     def test_gets_user_by_email(self):
         '''тест: получает пользователя по адресу электронной почты'''
         User.objects.create(email='another@example.com')
@@ -52,4 +79,55 @@ class GetUserTest(TestCase):
             пользователь с таким email'''
         self.assertIsNone(
             PasswordlessAuthenticationBackend().get_user('klim@example.com')
-        )
\ No newline at end of file
+        )
+
+    def test_repeated_lookups_do_not_query_database(self):
+        '''тест: повторный поиск пользователя не обращается к базе данных'''
+        User.objects.create(email='klim@example.com')
+        backend = PasswordlessAuthenticationBackend()
+        backend.get_user('klim@example.com')
+        with self.assertNumQueries(0):
+            user = backend.get_user('klim@example.com')
+        self.assertEqual(user, User.objects.get(email='klim@example.com'))
+        self.assertEqual(user_cache.stats()['hits'], 1)
+        self.assertEqual(user_cache.stats()['misses'], 1)
+
+    def test_cache_is_invalidated_when_user_created_on_login(self):
+        '''тест: кэш сбрасывается, когда пользователь создается при входе'''
+        backend = PasswordlessAuthenticationBackend()
+        self.assertIsNone(backend.get_user('klim@example.com'))
+        token = Token.objects.create(email='klim@example.com')
+        backend.authenticate(None, token.uid)
+        self.assertIsNotNone(backend.get_user('klim@example.com'))
+
+    @override_settings(USER_CACHE_TTL=-1)
+    def test_expired_entries_are_reloaded(self):
+        '''тест: просроченные записи загружаются заново'''
+        User.objects.create(email='klim@example.com')
+        backend = PasswordlessAuthenticationBackend()
+        backend.get_user('klim@example.com')
+        with self.assertNumQueries(1):
+            backend.get_user('klim@example.com')
+
+    @override_settings(USER_CACHE_SIZE=1)
+    def test_least_recently_used_entries_are_evicted(self):
+        '''тест: давно не использованные записи вытесняются'''
+        User.objects.create(email='a@example.com')
+        User.objects.create(email='b@example.com')
+        backend = PasswordlessAuthenticationBackend()
+        backend.get_user('a@example.com')
+        backend.get_user('b@example.com')
+        with self.assertNumQueries(1):
+            backend.get_user('a@example.com')
+
+    @override_settings(USER_CACHE_ALIAS='default')
+    def test_uses_shared_cache_after_local_miss(self):
+        '''тест: после промаха локального кэша используется общий'''
+        self.addCleanup(caches['default'].clear)
+        User.objects.create(email='klim@example.com')
+        backend = PasswordlessAuthenticationBackend()
+        backend.get_user('klim@example.com')
+        user_cache.clear()
+        with self.assertNumQueries(0):
+            self.assertIsNotNone(backend.get_user('klim@example.com'))
+        self.assertEqual(user_cache.stats()['shared_hits'], 1)
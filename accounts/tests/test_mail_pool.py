@@ -0,0 +1,97 @@
+import smtplib
+from unittest import TestCase
+from django.core import mail
+from django.core.mail import EmailMessage
+from django.core.mail.backends.locmem import EmailBackend
+from accounts.mail_pool import SMTPConnectionPool
+
+
+class CountingBackend(EmailBackend):
+    '''почтовый сервер в памяти, считающий открытые соединения'''
+    opened = 0
+    failures = []
+    open_failures = []
+
+    def open(self):
+        if CountingBackend.open_failures:
+            raise CountingBackend.open_failures.pop(0)
+        CountingBackend.opened += 1
+        return True
+
+    def send_messages(self, messages):
+        failure = CountingBackend.failures.pop(0) if CountingBackend.failures else None
+        if failure is not None:
+            raise failure
+        return super().send_messages(messages)
+
+
+BACKEND = 'accounts.tests.test_mail_pool.CountingBackend'
+
+
+class SMTPConnectionPoolTest(TestCase):
+    '''тест пула SMTP-соединений'''
+
+    def setUp(self):
+        '''установка'''
+        mail.outbox = []
+        CountingBackend.opened = 0
+        CountingBackend.failures = []
+        CountingBackend.open_failures = []
+        self.pool = SMTPConnectionPool(size=2, max_idle=30, backend=BACKEND)
+
+    def messages(self, count):
+        '''письма для отправки'''
+        return [
+            EmailMessage('subject', 'body', 'from@example.com', [f'to{i}@example.com'])
+            for i in range(count)
+        ]
+
+    def test_sends_batch_over_one_connection(self):
+        '''тест: пакет отправляется через одно соединение'''
+        errors = self.pool.send_batch(self.messages(5))
+        self.assertEqual(errors, [None] * 5)
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertEqual(CountingBackend.opened, 1)
+
+    def test_reuses_connection_between_batches(self):
+        '''тест: соединение используется повторно между пакетами'''
+        self.pool.send_batch(self.messages(2))
+        self.pool.send_batch(self.messages(2))
+        self.assertEqual(CountingBackend.opened, 1)
+
+    def test_reconnects_and_resends_after_stale_connection(self):
+        '''тест: после обрыва соединение открывается заново, письмо отправляется'''
+        CountingBackend.failures = [smtplib.SMTPServerDisconnected('gone')]
+        errors = self.pool.send_batch(self.messages(2))
+        self.assertEqual(errors, [None, None])
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(CountingBackend.opened, 2)
+        self.assertEqual(self.pool.stats.snapshot()['reconnects'], 1)
+
+    def test_failed_reconnect_reports_only_unsent_messages(self):
+        '''тест: если после обрыва соединение не открылось, ошибку получают
+        только неотправленные письма пакета'''
+        self.pool.send_batch(self.messages(1))  # соединение уже открыто
+        down = OSError('smtp is down')
+        CountingBackend.failures = [None, smtplib.SMTPServerDisconnected('gone')]
+        CountingBackend.open_failures = [down]
+        mail.outbox = []
+        errors = self.pool.send_batch(self.messages(3))
+        self.assertEqual(errors, [None, down, down])
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_reports_error_for_rejected_message(self):
+        '''тест: для отклоненного письма возвращается ошибка'''
+        rejected = smtplib.SMTPRecipientsRefused({})
+        CountingBackend.failures = [rejected]
+        errors = self.pool.send_batch(self.messages(2))
+        self.assertEqual(errors, [rejected, None])
+        self.assertEqual(CountingBackend.opened, 1)
+
+    def test_reports_rate_and_latency(self):
+        '''тест: сообщает скорость и задержку отправки'''
+        self.pool.send_batch(self.messages(3))
+        stats = self.pool.stats.snapshot()
+        self.assertEqual(stats['sent'], 3)
+        self.assertGreater(stats['messages_per_second'], 0)
+        self.assertGreaterEqual(stats['latency_p95_ms'], stats['latency_p50_ms'])
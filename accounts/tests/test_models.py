@@ -1,5 +1,6 @@
 from django.test import TestCase
 from django.contrib import auth
+from django.db import IntegrityError
 
 from accounts.models import Token
 
@@ -35,5 +36,15 @@ class TokenModelTest(TestCase):
         token1 = Token.objects.create(email='a@b.com')
         token2 = Token.objects.create(email='a@b.com')
         self.assertNotEqual(token1.uid, token2.uid)
-    
-    
\ No newline at end of file
+
+    def test_uid_is_unique(self):
+        """тест: uid маркера уникален"""
+        token = Token.objects.create(email='a@b.com')
+        with self.assertRaises(IntegrityError):
+            Token.objects.create(email='c@d.com', uid=token.uid)
+
+    def test_use_returns_email_and_deletes_token(self):
+        """тест: use возвращает email и удаляет маркер"""
+        token = Token.objects.create(email='a@b.com')
+        self.assertEqual(Token.use(token.uid), 'a@b.com')
+        self.assertFalse(Token.objects.filter(pk=token.pk).exists())
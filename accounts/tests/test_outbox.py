@@ -0,0 +1,143 @@
+import smtplib
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+from django.core import mail
+from django.core.mail import get_connection
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from accounts import outbox
+from accounts.mail_pool import SMTPConnectionPool
+from accounts.models import OutboxEmail
+
+
+LOCMEM = 'django.core.mail.backends.locmem.EmailBackend'
+
+
+@override_settings(
+    EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    EMAIL_OUTBOX_RETRY_DELAY=10, EMAIL_OUTBOX_MAX_ATTEMPTS=2,
+)
+class OutboxTest(TestCase):
+    '''тест очереди исходящих писем'''
+
+    def enqueue(self, to='klim@example.com'):
+        '''поставить письмо в очередь'''
+        return outbox.enqueue('subject', 'body', 'from@example.com', to)
+
+    def test_deliver_pending_sends_queued_email(self):
+        '''тест: deliver_pending отправляет письмо из очереди'''
+        self.enqueue()
+        self.assertEqual(outbox.deliver_pending(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['klim@example.com'])
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.status, OutboxEmail.SENT)
+        self.assertIsNotNone(email.sent_at)
+
+    def test_sent_email_is_not_sent_again(self):
+        '''тест: отправленное письмо не отправляется повторно'''
+        self.enqueue()
+        outbox.deliver_pending()
+        self.assertEqual(outbox.deliver_pending(), (0, 0))
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_claimed_email_is_skipped_by_other_workers(self):
+        '''тест: забранное письмо пропускают другие обработчики'''
+        self.enqueue()
+        self.assertEqual(len(outbox.claim_batch(10)), 1)
+        self.assertEqual(outbox.claim_batch(10), [])
+
+    def test_future_email_waits(self):
+        '''тест: письмо с будущим временем попытки ждет'''
+        email = self.enqueue()
+        OutboxEmail.objects.filter(id=email.id).update(
+            next_attempt_at=timezone.now() + timedelta(minutes=1)
+        )
+        self.assertEqual(outbox.deliver_pending(), (0, 0))
+
+    @patch('django.core.mail.backends.locmem.EmailBackend.send_messages')
+    def test_failed_email_is_retried_with_backoff(self, mock_send_messages):
+        '''тест: неудачное письмо повторяется позже с растущей паузой'''
+        mock_send_messages.side_effect = OSError('smtp is down')
+        email = self.enqueue()
+        self.assertEqual(outbox.deliver_pending(), (0, 1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboxEmail.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertEqual(email.last_error, 'smtp is down')
+        self.assertGreater(email.next_attempt_at, timezone.now() + timedelta(seconds=9))
+
+    @patch('django.core.mail.backends.locmem.EmailBackend.send_messages')
+    def test_email_fails_after_max_attempts(self, mock_send_messages):
+        '''тест: письмо помечается неудачным после предела попыток'''
+        mock_send_messages.side_effect = OSError('smtp is down')
+        email = self.enqueue()
+        OutboxEmail.objects.filter(id=email.id).update(attempts=1)
+        outbox.deliver_pending()
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutboxEmail.FAILED)
+
+    def test_failed_reconnect_does_not_retry_sent_emails(self):
+        '''тест: если после обрыва соединение не открылось, повторяются
+        только неотправленные письма, отправленные не уходят второй раз'''
+        first, second, third = [self.enqueue(f'to{i}@example.com') for i in range(3)]
+        pool = SMTPConnectionPool(size=1, backend=LOCMEM)
+        sent = []
+        def send_messages(messages):
+            if sent:
+                raise smtplib.SMTPServerDisconnected('gone')
+            sent.extend(messages)
+            return len(messages)
+        connection = get_connection(LOCMEM)
+        connection.send_messages = send_messages
+        with patch('accounts.outbox.get_pool', return_value=pool), \
+                patch.object(pool, '_open', side_effect=[connection, OSError('smtp is down')]):
+            self.assertEqual(outbox.deliver_pending(), (1, 2))
+        statuses = dict(OutboxEmail.objects.values_list('id', 'status'))
+        self.assertEqual(statuses, {
+            first.id: OutboxEmail.SENT,
+            second.id: OutboxEmail.PENDING, third.id: OutboxEmail.PENDING,
+        })
+        self.assertEqual(OutboxEmail.objects.get(id=first.id).attempts, 0)
+
+    @patch('accounts.outbox.threading.Timer')
+    def test_retry_is_scheduled_for_next_attempt_time(self, mock_timer):
+        '''тест: после отложенной попытки заводится таймер на ее время,
+        письмо уйдет и без нового enqueue'''
+        mock_timer.return_value.is_alive.return_value = False
+        self.addCleanup(setattr, outbox, '_timer', None)
+        email = self.enqueue()
+        OutboxEmail.objects.filter(id=email.id).update(
+            next_attempt_at=timezone.now() + timedelta(seconds=30)
+        )
+        outbox._schedule_next_delivery()
+        delay, callback = mock_timer.call_args[0]
+        self.assertAlmostEqual(delay, 30, delta=1)
+        self.assertEqual(callback, outbox._deliver_in_background)
+        mock_timer.return_value.start.assert_called_once_with()
+
+    @patch('accounts.outbox.threading.Timer')
+    def test_no_timer_without_pending_email(self, mock_timer):
+        '''тест: без писем в очереди таймер не заводится'''
+        outbox._schedule_next_delivery()
+        self.assertFalse(mock_timer.called)
+
+    @override_settings(EMAIL_OUTBOX_DELIVERY='thread')
+    def test_thread_mode_schedules_delivery_after_commit(self):
+        '''тест: режим thread запускает отправку после фиксации транзакции'''
+        with patch('accounts.outbox.transaction.on_commit') as mock_on_commit:
+            self.enqueue()
+        mock_on_commit.assert_called_once_with(outbox._deliver_in_background)
+
+    @override_settings(EMAIL_OUTBOX_DELIVERY='command')
+    def test_command_mode_leaves_delivery_to_send_outbox(self):
+        '''тест: в режиме command письма отправляет команда send_outbox'''
+        with patch('accounts.outbox.transaction.on_commit') as mock_on_commit:
+            self.enqueue()
+        self.assertFalse(mock_on_commit.called)
+        out = StringIO()
+        call_command('send_outbox', '--once', stdout=out)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIn('sent 1, failed 0', out.getvalue())
@@ -0,0 +1,54 @@
+from datetime import timedelta
+from io import StringIO
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from accounts.models import Token
+
+
+@override_settings(LOGIN_TOKEN_TTL=60)
+class PurgeExpiredCommandTest(TestCase):
+    '''тест команды удаления просроченных маркеров и сеансов'''
+
+    def purge(self, *args):
+        '''запустить команду без пауз'''
+        out = StringIO()
+        call_command('purge_expired', '--pause', '0', *args, stdout=out)
+        return out.getvalue()
+
+    def create_expired_tokens(self, count):
+        '''создать просроченные маркеры'''
+        created_at = timezone.now() - timedelta(seconds=120)
+        Token.objects.bulk_create([
+            Token(email=f'user{i}@example.com', uid=f'expired-{i}', created_at=created_at)
+            for i in range(count)
+        ])
+
+    def test_deletes_only_expired_tokens(self):
+        '''тест: удаляет только просроченные маркеры'''
+        self.create_expired_tokens(3)
+        fresh = Token.objects.create(email='a@b.com')
+        self.purge()
+        self.assertEqual(list(Token.objects.all()), [fresh])
+
+    def test_deletes_in_batches(self):
+        '''тест: удаляет пакетами заданного размера'''
+        self.create_expired_tokens(5)
+        output = self.purge('--batch-size', '2')
+        self.assertFalse(Token.objects.exists())
+        self.assertIn('tokens: deleted 5 in 3 batches', output)
+
+    def test_deletes_only_expired_sessions(self):
+        '''тест: удаляет только просроченные сеансы'''
+        expired = SessionStore()
+        expired.set_expiry(-1)
+        expired.save()
+        fresh = SessionStore()
+        fresh.save()
+        output = self.purge()
+        self.assertEqual(
+            list(Session.objects.values_list('pk', flat=True)), [fresh.session_key]
+        )
+        self.assertIn('sessions: deleted 1 in 1 batches', output)
@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from accounts.models import Token
+from lists.models import List
+from superlists.query_budgets import QueryBudgetMixin
+
+
+User = get_user_model()
+
+
+class AccountsQueryBudgetTest(QueryBudgetMixin, TestCase):
+    '''тест бюджетов запросов страниц входа и выхода'''
+
+    def user_with_lists(self, size):
+        '''вспомогательная функция: пользователь с size списками
+        и size неиспользованными маркерами'''
+        email = f'user{size}@example.com'
+        user = User.objects.create(email=email)
+        for i in range(size):
+            List.create_new(first_item_text=f'item {i}', owner=user)
+        Token.objects.bulk_create(Token(email=email) for _ in range(size))
+        return user
+
+    def test_send_login_email(self):
+        '''тест: отправка ссылки для входа'''
+        def make_request(size):
+            user = self.user_with_lists(size)
+            return lambda: self.client.post(
+                '/accounts/send_login_email/', data={'email': user.email}
+            )
+        self.assertQueryBudget('send_login_email', make_request)
+
+    def test_login(self):
+        '''тест: вход по ссылке из письма'''
+        def make_request(size):
+            user = self.user_with_lists(size)
+            token = Token.objects.create(email=user.email)
+            return lambda: self.client.get(f'/accounts/login/?token={token.uid}')
+        self.assertQueryBudget('login', make_request)
+
+    def test_logout(self):
+        '''тест: выход'''
+        def make_request(size):
+            self.client.force_login(self.user_with_lists(size))
+            return lambda: self.client.get('/accounts/logout/')
+        self.assertQueryBudget('logout', make_request)
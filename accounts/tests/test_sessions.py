@@ -0,0 +1,26 @@
+from django.conf import settings
+from django.test import TestCase, override_settings
+from functional_tests.management.commands.create_session import (
+    create_pre_authenticated_session
+)
+
+
+class SessionModesTest(TestCase):
+    '''тест: вход через заранее созданный сеанс работает во всех режимах'''
+
+    def assert_logged_in_with_pre_authenticated_session(self):
+        '''проверить, что сеанс из create_session аутентифицирует запрос'''
+        session_key = create_pre_authenticated_session('klim@example.com')
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+        response = self.client.get('/')
+        self.assertEqual(response.context['user'].email, 'klim@example.com')
+
+    def test_every_session_mode_supports_pre_authenticated_sessions(self):
+        '''тест: каждый режим хранения сеансов поддерживает create_session'''
+        for mode, engine in settings.SESSION_ENGINES.items():
+            with self.subTest(mode=mode), override_settings(
+                SESSION_ENGINE=engine, SESSION_CACHE_ALIAS='default'
+            ):
+                # SessionMiddleware запоминает хранилище при создании
+                self.client = self.client_class()
+                self.assert_logged_in_with_pre_authenticated_session()
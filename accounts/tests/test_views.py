@@ -1,7 +1,9 @@
 import accounts.views
-from django.test import TestCase
+from django.core import mail
+from django.test import TestCase, override_settings
 from unittest.mock import patch, call
-from accounts.models import Token
+from accounts import outbox
+from accounts.models import OutboxEmail, Token
 
 
 class SendLoginEmailViewTest(TestCase):
@@ -15,18 +17,32 @@ class SendLoginEmailViewTest(TestCase):
         })
         self.assertRedirects(response, '/')
 
-    @patch('accounts.views.send_mail')
-    def test_sends_mail_to_address_from_post(self, mock_send_mail):
-        '''тест: отправляет сообщение на адрес из метода post'''
+    def test_queues_mail_to_address_from_post(self):
+        '''тест: ставит в очередь сообщение на адрес из метода post'''
         self.client.post('/accounts/send_login_email/', data={
             'email': 'klim@example.com'
         })
 
-        self.assertEqual(mock_send_mail.called, True)
-        (subject, body, from_email, to_list), kwargs = mock_send_mail.call_args
-        self.assertEqual(subject, "Your login link for Superlists")
-        self.assertEqual(from_email, 'klimrus61@yandex.ru')
-        self.assertEqual(to_list, ['klim@example.com'])
+        email = OutboxEmail.objects.get()
+        self.assertEqual(email.subject, "Your login link for Superlists")
+        self.assertEqual(email.from_email, 'klimrus61@yandex.ru')
+        self.assertEqual(email.to, 'klim@example.com')
+        self.assertEqual(email.status, OutboxEmail.PENDING)
+
+    @override_settings(EMAIL_OUTBOX_DELIVERY='thread')
+    def test_does_not_send_mail_during_request(self):
+        '''тест: не отправляет почту во время обработки запроса, письмо
+        уходит, когда очередь разберет фоновая доставка'''
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.post('/accounts/send_login_email/', data={
+                'email': 'klim@example.com'
+            })
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(callbacks, [outbox._deliver_in_background])
+
+        outbox.deliver_pending()  # работа фоновой доставки
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['klim@example.com'])
 
     def test_adds_success_message(self):
         '''тест: добавляется сообщение об успехе'''
@@ -63,8 +79,7 @@ class SendLoginEmailViewTest(TestCase):
         token = Token.objects.first()
         self.assertEqual(token.email, 'klim@example.com')
 
-    @patch('accounts.views.send_mail')
-    def test_sends_link_to_login_using_token_uid(self, mock_send_mail):
+    def test_sends_link_to_login_using_token_uid(self):
         '''тест: отсылается ссылка на вход в систему, испульзуя uid token'''
         self.client.post('/accounts/send_login_email/', data={
             'email': 'klim@example.com'
@@ -72,8 +87,7 @@ class SendLoginEmailViewTest(TestCase):
 
         token = Token.objects.first()
         expected_url = f'http://testserver/accounts/login/?token={token.uid}'
-        (subject, body, from_email, to_list), kwargs = mock_send_mail.call_args
-        self.assertIn(expected_url, body)
+        self.assertIn(expected_url, OutboxEmail.objects.get().body)
 
 @patch('accounts.views.auth') # Импортируется модуль djnago.contrib.auth как mock
 class LoginViewTest(TestCase):
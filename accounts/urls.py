@@ -1,10 +1,10 @@
 from django.urls import path
 from accounts import views
 from django.contrib.auth.views import logout_then_login
-
+from superlists.db_threads import asgi_view
 
 urlpatterns = [
-    path('send_login_email/', views.send_login_email, name='send_login_email'),
-    path('login/', views.login, name='login'),
-    path('logout/', logout_then_login, name='logout')
+    path('send_login_email/', asgi_view(views.send_login_email), name='send_login_email'),
+    path('login/', asgi_view(views.login), name='login'),
+    path('logout/', asgi_view(logout_then_login), name='logout')
 ]
@@ -1,8 +1,8 @@
 from django.shortcuts import render, redirect
-from django.core.mail import send_mail
 from django.contrib import messages, auth
 from django.urls import reverse
 
+from accounts import outbox
 from accounts.models import Token
 
 
@@ -14,11 +14,11 @@ def send_login_email(request):
         reverse('login') + '?token=' + str(token.uid)
     )
     message_body = f'Use this link to log in:\n\n{url}'
-    send_mail(
+    outbox.enqueue(
         'Your login link for Superlists',
         message_body,
         'klimrus61@yandex.ru',
-        [email],
+        email,
     )
     messages.success(
         request,
@@ -0,0 +1,184 @@
+'''Сравнение синхронного (WSGI) и асинхронного (ASGI) запуска.
+
+Поднимаются два сервера с одним рабочим процессом каждый: gunicorn с
+синхронным обработчиком (superlists.wsgi) и gunicorn с обработчиком
+uvicorn (superlists.asgi, асинхронные представления). Для каждого:
+
+* сколько медленных клиентов (соединение открыто, заголовки запроса
+  еще не дошли) процесс держит, продолжая отвечать остальным: задержка
+  обычного запроса страницы списка при таких соединениях;
+* задержки домашней страницы и страницы списка, пока другое соединение
+  держит блокировку записи в базе, а запрос API на добавление элементов
+  ждет ее (до busy_timeout);
+* запросы в секунду и задержки страницы списка при параллельных клиентах.
+
+    python benchmarks/asgi_concurrency.py [--requests 50] [--concurrency 1,20]
+'''
+import argparse
+import http.client
+import json
+import socket
+import sqlite3
+import threading
+import time
+from common import (
+    SERVERS, free_port, percentile, print_table, setup_django, start_server,
+    test_database,
+)
+
+setup_django()
+
+from django.db import connection
+from lists.models import Item, List
+
+NAMES = {'wsgi': 'wsgi (sync)', 'asgi': 'asgi (uvicorn)'}
+PROBE_TIMEOUT = 3
+
+
+def get(port, url, timeout=PROBE_TIMEOUT):
+    '''GET-запрос; вернуть задержку в секундах или None при тайм-ауте'''
+    started = time.perf_counter()
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=timeout)
+    try:
+        conn.request('GET', url, headers={'Host': 'localhost'})
+        response = conn.getresponse()
+        response.read()
+        assert response.status == 200, response.status
+        return time.perf_counter() - started
+    except socket.timeout:
+        return None
+    finally:
+        conn.close()
+
+
+def probe_with_slow_clients(port, url, count):
+    '''задержка запроса, пока count клиентов держат недописанные запросы'''
+    slow = []
+    try:
+        for _ in range(count):
+            sock = socket.create_connection(('127.0.0.1', port))
+            sock.sendall(b'GET / HTTP/1.1\r\nHost: localhost\r\n')
+            slow.append(sock)
+        time.sleep(0.2)
+        return get(port, url)
+    finally:
+        for sock in slow:
+            sock.close()
+        time.sleep(0.2)
+
+
+def post_items(port, list_, results):
+    '''запрос API на добавление элемента; в results - статус и время'''
+    started = time.perf_counter()
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    try:
+        conn.request(
+            'POST', f'/lists/api/lists/{list_.id}/items/',
+            json.dumps({'items': ['written under lock']}),
+            headers={'Host': 'localhost', 'Content-Type': 'application/json'},
+        )
+        response = conn.getresponse()
+        response.read()
+        results.append((response.status, time.perf_counter() - started))
+    finally:
+        conn.close()
+
+
+def probe_with_locked_database(port, list_, urls):
+    '''задержки запросов urls, пока база заблокирована на запись, а запрос
+    API ждет блокировку; вернуть их и (статус, время) запроса API'''
+    lock = sqlite3.connect(connection.settings_dict['NAME'], isolation_level=None)
+    lock.execute('BEGIN EXCLUSIVE')
+    results = []
+    writer = threading.Thread(target=post_items, args=(port, list_, results))
+    try:
+        writer.start()
+        time.sleep(0.2)
+        return [get(port, url) for url in urls], results
+    finally:
+        lock.execute('ROLLBACK')
+        lock.close()
+        writer.join()
+
+
+def throughput(port, url, concurrency, requests):
+    '''запросов в секунду и задержки при concurrency параллельных клиентах'''
+    latencies = []
+    lock = threading.Lock()
+
+    def client():
+        for _ in range(requests):
+            latency = get(port, url, timeout=30)
+            with lock:
+                latencies.append(latency)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return len(latencies) / elapsed, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=50)
+    parser.add_argument('--concurrency', default='1,20')
+    parser.add_argument('--slow-clients', default='0,1,10,100')
+    args = parser.parse_args()
+    concurrency = [int(value) for value in args.concurrency.split(',')]
+    slow_clients = [int(value) for value in args.slow_clients.split(',')]
+
+    with test_database():
+        list_ = List.create_new(first_item_text='item 0')
+        Item.objects.bulk_create(
+            Item(list=list_, text=f'item {i}') for i in range(1, 50)
+        )
+        url = list_.get_absolute_url()
+        urls = ['/', url]
+        slow_rows, lock_rows, load_rows = [], [], []
+        for kind, server_args in SERVERS.items():
+            name = NAMES[kind]
+            port = free_port()
+            server = start_server(server_args, port)
+            try:
+                get(port, url)  # прогрев
+                for count in slow_clients:
+                    latency = probe_with_slow_clients(port, url, count)
+                    slow_rows.append([
+                        name, count,
+                        f'{latency * 1000:.1f}' if latency is not None
+                        else f'> {PROBE_TIMEOUT * 1000} (timeout)',
+                    ])
+                latencies, posts = probe_with_locked_database(port, list_, urls)
+                (status, post_time), = posts
+                lock_rows.append([name] + [
+                    f'{latency * 1000:.1f}' if latency is not None
+                    else f'> {PROBE_TIMEOUT * 1000} (timeout)'
+                    for latency in latencies
+                ] + [f'{status} after {post_time * 1000:.0f}'])
+                for clients in concurrency:
+                    rate, latencies = throughput(port, url, clients, args.requests)
+                    load_rows.append([
+                        name, clients, f'{rate:.0f}',
+                        f'{percentile(latencies, 0.5):.1f}',
+                        f'{percentile(latencies, 0.95):.1f}',
+                    ])
+            finally:
+                server.terminate()
+                server.wait()
+
+    print('slow clients held open while serving a list page:')
+    print_table(['server', 'slow clients', 'probe ms'], slow_rows)
+    print()
+    print('database locked for writing, an API POST waiting for the lock:')
+    print_table(['server', 'home ms', 'list page ms', 'API POST ms'], lock_rows)
+    print()
+    print(f'list page, {args.requests} requests per client:')
+    print_table(['server', 'clients', 'req/s', 'p50 ms', 'p95 ms'], load_rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+'''Общая подготовка для скриптов нагрузочных замеров.
+
+Скрипты запускаются из корня репозитория, например:
+
+    python benchmarks/session_modes.py
+
+Они поднимают Django с настройками проекта и работают с отдельной
+временной базой данных, не трогая рабочую.
+'''
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCHMARKS = os.path.join(ROOT, 'benchmarks')
+
+# аргументы gunicorn для запуска сайта синхронно (WSGI) и через ASGI
+SERVERS = {
+    'wsgi': ['superlists.wsgi:application'],
+    'asgi': [
+        '--worker-class', 'uvicorn.workers.UvicornWorker',
+        'superlists.asgi:application',
+    ],
+}
+
+
+def setup_django():
+    '''настроить Django с настройками проекта'''
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'superlists.settings')
+    import django
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    '''временная база данных на время замера: файл во временном каталоге
+    (его открывают и серверы замера), а не тестовая база в памяти'''
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+    setup_test_environment()
+    old_name = connection.settings_dict['NAME']
+    directory = tempfile.TemporaryDirectory()
+    connection.settings_dict['TEST']['NAME'] = os.path.join(directory.name, 'bench.sqlite3')
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        directory.cleanup()
+        teardown_test_environment()
+
+
+def timed(fn, repeat):
+    '''выполнить fn repeat раз; вернуть затраченное время в секундах'''
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return time.perf_counter() - started
+
+
+def percentile(values, p):
+    '''процентиль в миллисекундах (values - секунды)'''
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p * len(values)))] * 1000
+
+
+def free_port():
+    '''свободный локальный порт'''
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, port, workers=1, env=None):
+    '''запустить gunicorn на временной базе замера (server_settings);
+    args - обработчик и приложение, например ['superlists.wsgi:application']'''
+    from django.db import connection
+    server_env = dict(
+        os.environ,
+        DJANGO_SETTINGS_MODULE='server_settings',
+        BENCH_DATABASE=str(connection.settings_dict['NAME']),
+        PYTHONPATH=os.pathsep.join([ROOT, BENCHMARKS]),
+    )
+    server_env.pop('ASYNC_VIEWS', None)
+    server_env.update(env or {})
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--workers', str(workers),
+         '--bind', f'127.0.0.1:{port}', '--log-level', 'warning'] + args,
+        cwd=ROOT, env=server_env,
+    )
+    deadline = time.monotonic() + 20
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+def print_table(headers, rows):
+    '''вывести результаты таблицей'''
+    widths = [
+        max(len(str(value)) for value in column)
+        for column in zip(headers, *rows)
+    ]
+    for row in [headers, ['-' * width for width in widths]] + list(rows):
+        print('  '.join(str(value).ljust(width) for value, width in zip(row, widths)))
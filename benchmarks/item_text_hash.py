@@ -0,0 +1,124 @@
+'''Уникальность элементов по хэшу текста против индекса по самому тексту.
+
+Для каждой длины текста (--lengths) и каждой схемы на свежей временной
+базе в --lists списков добавляются --items элементов случайного текста
+той же длины через ExistingListItemForm (как view_list POST), затем
+--duplicates раз повторяется уже существующий текст. Схема "text" -
+прежний уникальный индекс (list_id, text), схема "hash" - текущий
+(list_id, text_hash, text_hash_ordinal).
+
+Выводятся размер уникального индекса и всей базы, вставки в секунду с
+задержками и скорость отказов на повторах (при хэше отказ стоит еще
+одного SELECT, чтобы отличить повтор от совпадения хэшей).
+
+    python benchmarks/item_text_hash.py [--items 20000] [--lengths 100 1000 4000]
+'''
+import argparse
+import os
+import random
+import string
+import time
+from common import percentile, print_table, setup_django, test_database
+
+setup_django()
+
+from django.db import connection
+from lists.forms import ExistingListItemForm
+from lists.models import Item, List
+
+SCHEMAS = ('text', 'hash')
+
+
+def use_text_index():
+    '''заменить уникальный индекс по хэшу прежним индексом по тексту'''
+    table = Item._meta.db_table
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+        for name, info in constraints.items():
+            if info['unique'] and info['columns'] == [
+                'list_id', 'text_hash', 'text_hash_ordinal'
+            ]:
+                cursor.execute(f'DROP INDEX "{name}"')
+        cursor.execute(
+            f'CREATE UNIQUE INDEX "item_list_text_uniq" ON "{table}" ("list_id", "text")'
+        )
+
+
+def unique_index_size():
+    '''байт в страницах уникального индекса по list_id (dbstat)'''
+    table = Item._meta.db_table
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+        names = [
+            name for name, info in constraints.items()
+            if info['unique'] and info['index'] and info['columns'][0] == 'list_id'
+        ]
+        cursor.execute(
+            'SELECT COALESCE(SUM(pgsize), 0) FROM dbstat WHERE name = %s', names
+        )
+        return cursor.fetchone()[0]
+
+
+def add_item(list_, text):
+    '''добавить элемент так же, как view_list POST; True - сохранен'''
+    form = ExistingListItemForm(for_list=list_, data={'text': text}, check_unique=False)
+    form.is_valid()
+    return form.save() is not None
+
+
+def run(schema, length, args):
+    '''одна схема, одна длина текста; вернуть строку таблицы'''
+    rng = random.Random(length)
+    letters = string.ascii_letters + ' '
+    with test_database():
+        if schema == 'text':
+            use_text_index()
+        lists = [List.create_new(first_item_text=f'list {i}') for i in range(args.lists)]
+        texts = [
+            (lists[number % args.lists], ''.join(rng.choices(letters, k=length)))
+            for number in range(args.items)
+        ]
+        latencies = []
+        started = time.perf_counter()
+        for list_, text in texts:
+            began = time.perf_counter()
+            add_item(list_, text)
+            latencies.append(time.perf_counter() - began)
+        inserts_per_second = len(texts) / (time.perf_counter() - started)
+
+        repeats = rng.sample(texts, args.duplicates)
+        started = time.perf_counter()
+        rejected = sum(not add_item(list_, text) for list_, text in repeats)
+        rejects_per_second = len(repeats) / (time.perf_counter() - started)
+        assert rejected == len(repeats)
+
+        index_size = unique_index_size()
+        database_size = os.path.getsize(connection.settings_dict['NAME'])
+        connection.close()
+    return [
+        length, schema,
+        round(index_size / 2**20, 2), round(database_size / 2**20, 1),
+        round(inserts_per_second), round(percentile(latencies, 0.50), 2),
+        round(percentile(latencies, 0.99), 2), round(rejects_per_second),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--items', type=int, default=20000)
+    parser.add_argument('--lists', type=int, default=50)
+    parser.add_argument('--duplicates', type=int, default=2000)
+    parser.add_argument('--lengths', type=int, nargs='+', default=[100, 1000, 4000])
+    args = parser.parse_args()
+
+    rows = [run(schema, length, args) for length in args.lengths for schema in SCHEMAS]
+    print(f'{args.items} items in {args.lists} lists, {args.duplicates} duplicates:')
+    print_table(
+        ['text chars', 'unique index', 'index MiB', 'db MiB', 'inserts/s',
+         'p50 ms', 'p99 ms', 'dup rejects/s'],
+        rows,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+'''Нагрузочный тест сайта по HTTP: задержки p50/p95/p99 и запросы в секунду.
+
+Виртуальные пользователи (--clients) параллельно и в течение --duration
+секунд (после --warmup секунд прогрева) выполняют смесь действий, как на настоящем сайте: домашняя
+страница, новый список, просмотр списка и добавление в него элемента,
+"Мои списки" и вход по ссылке из письма. Доли действий задает MIX.
+
+По умолчанию сайт запускается локально (gunicorn, --server wsgi или
+asgi) на временной базе данных. Если задана переменная окружения
+STAGING_SERVER (как для functional_tests), нагрузка идет на этот сервер;
+ссылки для входа из писем там недоступны, поэтому сеансы создаются
+командой create_session через fabric, а замеряется только отправка
+письма.
+
+Результаты можно сохранить как эталон и сравнить с ним после изменений:
+
+    python benchmarks/load_test.py --save baseline.json
+    python benchmarks/load_test.py --compare baseline.json [--threshold 20]
+
+При сравнении код возврата 1, если p95 какой-либо страницы выросла или
+запросы в секунду упали больше чем на --threshold процентов.
+'''
+import argparse
+import http.client
+import json
+import os
+import random
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode
+from common import (
+    ROOT, SERVERS, free_port, percentile, print_table, setup_django, start_server,
+    test_database,
+)
+
+setup_django()
+
+from accounts.models import Token
+
+# доли действий виртуального пользователя
+MIX = {
+    'home': 20,
+    'new_list': 10,
+    'view_list GET': 35,
+    'view_list POST': 15,
+    'my_lists': 10,
+    'login': 10,
+}
+
+
+class VirtualUser:
+    '''виртуальный пользователь: свои cookie (сеанс, CSRF) и списки'''
+
+    def __init__(self, host, port, number, stats, login_link):
+        self.host, self.port = host, port
+        self.number = number
+        self.email = f'load{number}@example.com'
+        self.stats = stats
+        self.login_link = login_link
+        self.cookies = {}
+        self.lists = []
+        self.counter = 0
+        self.rng = random.Random(number)
+
+    def request(self, name, method, path, data=None):
+        '''выполнить запрос и записать его задержку под именем name'''
+        headers = {'Host': self.host}
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        body = None
+        if data is not None:
+            data = dict(data, csrfmiddlewaretoken=self.cookies.get('csrftoken', ''))
+            body = urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        started = time.perf_counter()
+        conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+        except OSError:
+            self.stats.record(name, time.perf_counter() - started, error=True)
+            return None
+        finally:
+            conn.close()
+        self.stats.record(
+            name, time.perf_counter() - started, error=response.status >= 400
+        )
+        for header in response.headers.get_all('Set-Cookie') or []:
+            for morsel in SimpleCookie(header).values():
+                self.cookies[morsel.key] = morsel.value
+        return response
+
+    def unique_text(self):
+        '''текст элемента, которого еще не было у этого пользователя'''
+        self.counter += 1
+        return f'item {self.number}-{self.counter}'
+
+    def home(self):
+        self.request('home', 'GET', '/')
+
+    def new_list(self):
+        response = self.request(
+            'new_list', 'POST', '/lists/new', {'text': self.unique_text()}
+        )
+        if response is not None and response.status == 302:
+            self.lists.append(response.headers['Location'])
+
+    def view_list_get(self):
+        if not self.lists:
+            return self.new_list()
+        self.request('view_list GET', 'GET', self.rng.choice(self.lists))
+
+    def view_list_post(self):
+        if not self.lists:
+            return self.new_list()
+        self.request(
+            'view_list POST', 'POST', self.rng.choice(self.lists),
+            {'text': self.unique_text()},
+        )
+
+    def my_lists(self):
+        self.request('my_lists', 'GET', f'/lists/users/{self.email}/')
+
+    def login(self):
+        self.request(
+            'send_login_email', 'POST', '/accounts/send_login_email/',
+            {'email': self.email},
+        )
+        self.login_link(self)
+
+    def run(self, deadline):
+        '''выполнять действия смеси MIX до истечения срока'''
+        self.home()  # CSRF-cookie
+        self.login()
+        actions = {
+            'home': self.home,
+            'new_list': self.new_list,
+            'view_list GET': self.view_list_get,
+            'view_list POST': self.view_list_post,
+            'my_lists': self.my_lists,
+            'login': self.login,
+        }
+        names, weights = list(MIX), list(MIX.values())
+        while time.monotonic() < deadline:
+            actions[self.rng.choices(names, weights)[0]]()
+
+
+class Stats:
+    '''задержки и ошибки по страницам, общие для всех пользователей'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.started = None
+
+    def start(self):
+        '''начать запись: запросы во время прогрева не учитываются'''
+        self.started = time.monotonic()
+
+    def record(self, name, latency, error=False):
+        if self.started is None:
+            return
+        with self.lock:
+            self.latencies[name].append(latency)
+            if error:
+                self.errors[name] += 1
+
+    def summary(self):
+        '''сводка: страница -> запросы, ошибки, запросов в секунду, p50/p95/p99'''
+        elapsed = time.monotonic() - self.started
+        result = {}
+        everything = []
+        for name in sorted(self.latencies):
+            latencies = self.latencies[name]
+            everything.extend(latencies)
+            result[name] = _summarize(latencies, self.errors[name], elapsed)
+        result['total'] = _summarize(everything, sum(self.errors.values()), elapsed)
+        return result
+
+
+def _summarize(latencies, errors, elapsed):
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50': round(percentile(latencies, 0.50), 1),
+        'p95': round(percentile(latencies, 0.95), 1),
+        'p99': round(percentile(latencies, 0.99), 1),
+    }
+
+
+def local_login_link(user):
+    '''вход по ссылке из письма: маркер читается из временной базы'''
+    uid = Token.objects.filter(email=user.email).order_by('-id').values_list(
+        'uid', flat=True
+    ).first()
+    if uid is not None:
+        user.request('login', 'GET', f'/accounts/login/?token={uid}')
+
+
+def staging_login_link(host):
+    '''вход на промежуточном сервере: сеанс создает create_session'''
+    from functional_tests.server_tools import create_session_on_server
+
+    def login_link(user):
+        user.cookies['sessionid'] = create_session_on_server(host, user.email)
+    return login_link
+
+
+def run_load(host, port, clients, duration, warmup, login_link):
+    '''нагрузить сайт; вернуть сводку результатов после прогрева'''
+    stats = Stats()
+    deadline = time.monotonic() + warmup + duration
+    threads = [
+        threading.Thread(
+            target=VirtualUser(host, port, number, stats, login_link).run,
+            args=(deadline,),
+        )
+        for number in range(clients)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(warmup)
+    stats.start()
+    for thread in threads:
+        thread.join()
+    return stats.summary()
+
+
+def print_results(results):
+    print_table(
+        ['page', 'requests', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms'],
+        [
+            [name, r['requests'], r['errors'], r['rps'], r['p50'], r['p95'], r['p99']]
+            for name, r in results.items()
+        ],
+    )
+
+
+def compare(results, baseline, threshold):
+    '''сравнить с эталоном; вернуть список ухудшений больше threshold %'''
+    rows, regressions = [], []
+    for name, current in results.items():
+        before = baseline['results'].get(name)
+        if before is None:
+            continue
+        p95_change = _change(before['p95'], current['p95'])
+        rps_change = _change(before['rps'], current['rps'])
+        rows.append([
+            name, before['p95'], current['p95'], f'{p95_change:+.0f}%',
+            before['rps'], current['rps'], f'{rps_change:+.0f}%',
+        ])
+        if p95_change > threshold or rps_change < -threshold:
+            regressions.append(name)
+    print_table(
+        ['page', 'p95 before', 'p95 now', 'change', 'req/s before', 'req/s now',
+         'change'],
+        rows,
+    )
+    return regressions
+
+
+def _change(before, now):
+    return (now - before) / before * 100 if before else 0.0
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT,
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=20)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--warmup', type=float, default=2)
+    parser.add_argument('--server', choices=sorted(SERVERS), default='wsgi')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--save', metavar='FILE')
+    parser.add_argument('--compare', metavar='FILE')
+    parser.add_argument('--threshold', type=float, default=20)
+    args = parser.parse_args()
+
+    staging_server = os.environ.get('STAGING_SERVER')
+    if staging_server:
+        target = staging_server
+        results = run_load(
+            staging_server, 80, args.clients, args.duration, args.warmup,
+            staging_login_link(staging_server),
+        )
+    else:
+        target = f'local {args.server} x{args.workers}'
+        with test_database():
+            port = free_port()
+            server = start_server(
+                SERVERS[args.server], port, workers=args.workers,
+                env={'EMAIL_OUTBOX_DELIVERY': 'command'},
+            )
+            try:
+                results = run_load(
+                    'localhost', port, args.clients, args.duration, args.warmup,
+                    local_login_link,
+                )
+            finally:
+                server.terminate()
+                server.wait()
+
+    print(f'{target}, {args.clients} clients, {args.duration:g} s:')
+    print_results(results)
+    report = {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'target': target,
+        'clients': args.clients,
+        'duration': args.duration,
+        'results': results,
+    }
+    if args.save:
+        with open(args.save, 'w') as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        print()
+        print(f"compared with {baseline['commit']} ({baseline['target']}):")
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"regressed by more than {args.threshold:g}%: {', '.join(regressions)}")
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
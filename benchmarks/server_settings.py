@@ -0,0 +1,13 @@
+'''Настройки Django для серверов, которые запускают скрипты замеров:
+рабочая база подменяется временной, ее путь передается в BENCH_DATABASE.
+BENCH_SQLITE_PRAGMAS (JSON) заменяет SQLITE_PRAGMAS.
+'''
+import json
+import os
+
+from superlists.settings import *  # noqa: F401,F403
+
+DATABASES['default']['NAME'] = os.environ['BENCH_DATABASE']  # noqa: F405
+ALLOWED_HOSTS = ['localhost']
+if 'BENCH_SQLITE_PRAGMAS' in os.environ:
+    SQLITE_PRAGMAS = json.loads(os.environ['BENCH_SQLITE_PRAGMAS'])
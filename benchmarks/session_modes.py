@@ -0,0 +1,69 @@
+'''Сравнение режимов хранения сеансов (SESSION_MODE).
+
+Для каждого режима создается заранее аутентифицированный сеанс (как в
+create_session), и вошедший пользователь выполняет типичные запросы:
+домашняя страница, страница списка и "Мои списки", плюс отправка ссылки
+для входа (messages.success). Выводятся запросы в секунду и число
+запросов к базе данных на один HTTP-запрос.
+
+    python benchmarks/session_modes.py [--requests 500]
+'''
+import argparse
+from common import print_table, setup_django, test_database, timed
+
+setup_django()
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from functional_tests.management.commands.create_session import (
+    create_pre_authenticated_session
+)
+from lists.models import List
+
+
+def benchmark_mode(engine, requests):
+    '''замерить один режим; вернуть (запросов в секунду, запросов к БД на запрос)'''
+    with override_settings(
+        SESSION_ENGINE=engine, SESSION_CACHE_ALIAS='default',
+        EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    ):
+        client = Client()
+        client.cookies[settings.SESSION_COOKIE_NAME] = (
+            create_pre_authenticated_session('bench@example.com')
+        )
+        owner = get_user_model().objects.get(email='bench@example.com')
+        list_ = List.create_new(first_item_text='bench', owner=owner)
+        urls = ['/', list_.get_absolute_url(), '/lists/users/bench@example.com/']
+
+        def page_views():
+            for url in urls:
+                client.get(url)
+
+        def login_email():
+            client.post('/accounts/send_login_email/', {'email': 'bench@example.com'})
+
+        page_views()  # прогрев
+        with CaptureQueriesContext(connection) as queries:
+            elapsed = timed(page_views, requests)
+            elapsed += timed(login_email, requests)
+        total = requests * (len(urls) + 1)
+        return total / elapsed, len(queries) / total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=300)
+    args = parser.parse_args()
+    rows = []
+    with test_database():
+        for mode, engine in settings.SESSION_ENGINES.items():
+            rps, queries = benchmark_mode(engine, args.requests)
+            rows.append([mode, f'{rps:.0f}', f'{queries:.2f}'])
+    print_table(['mode', 'req/s', 'db queries/req'], rows)
+
+
+if __name__ == '__main__':
+    main()
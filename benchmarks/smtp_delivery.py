@@ -0,0 +1,78 @@
+'''Сравнение отправки писем: новое соединение на письмо и пул соединений.
+
+Письма уходят на локальную SMTP-заглушку (benchmarks/smtp_stub.py),
+у которой установка соединения стоит --handshake-ms миллисекунд, как
+TLS и вход у настоящего сервера. Выводятся писем в секунду и задержка
+на одно письмо.
+
+    python benchmarks/smtp_delivery.py [--messages 200] [--handshake-ms 50]
+'''
+import argparse
+import time
+from common import percentile, print_table, setup_django
+
+setup_django()
+
+from django.conf import settings
+from django.core.mail import EmailMessage, send_mail
+from django.test import override_settings
+from accounts.mail_pool import SMTPConnectionPool
+from smtp_stub import SMTPStub
+
+
+def per_message_connection(count):
+    '''как было: send_mail открывает соединение на каждое письмо'''
+    latencies = []
+    for i in range(count):
+        started = time.perf_counter()
+        send_mail('subject', 'body', 'from@example.com', [f'to{i}@example.com'])
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def pooled(count, batch_size):
+    '''пул соединений и отправка пакетами'''
+    pool = SMTPConnectionPool(size=1, max_idle=30)
+    latencies = []
+    messages = [
+        EmailMessage('subject', 'body', 'from@example.com', [f'to{i}@example.com'])
+        for i in range(count)
+    ]
+    for start in range(0, count, batch_size):
+        batch = messages[start:start + batch_size]
+        started = time.perf_counter()
+        pool.send_batch(batch)
+        elapsed = time.perf_counter() - started
+        latencies.extend([elapsed / len(batch)] * len(batch))
+    pool.close()
+    return latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--handshake-ms', type=float, default=50)
+    args = parser.parse_args()
+    rows = []
+    with SMTPStub(handshake_delay=args.handshake_ms / 1000) as stub, override_settings(
+        EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+        EMAIL_HOST='127.0.0.1', EMAIL_PORT=stub.port,
+        EMAIL_USE_SSL=False, EMAIL_USE_TLS=False,
+        EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+    ):
+        for name, run in [
+            ('connection per message', lambda: per_message_connection(args.messages)),
+            ('pooled, batches of 50', lambda: pooled(args.messages, settings.EMAIL_OUTBOX_BATCH_SIZE)),
+        ]:
+            started = time.perf_counter()
+            latencies = run()
+            elapsed = time.perf_counter() - started
+            rows.append([
+                name, f'{len(latencies) / elapsed:.0f}',
+                f'{percentile(latencies, 0.5):.2f}', f'{percentile(latencies, 0.95):.2f}',
+            ])
+    print_table(['mode', 'msg/s', 'p50 ms', 'p95 ms'], rows)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+'''Минимальный локальный SMTP-сервер для замеров отправки почты.
+
+Принимает и выбрасывает письма. Задержка приветствия имитирует
+стоимость установки соединения с настоящим сервером (TCP, TLS, вход).
+'''
+import socketserver
+import threading
+import time
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    '''обработчик одного SMTP-соединения'''
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        time.sleep(self.server.handshake_delay)
+        self.reply('220 stub ESMTP')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line[:4].upper()
+            if command in (b'EHLO', b'HELO'):
+                self.wfile.write(b'250-stub\r\n250 8BITMIME\r\n')
+            elif command == b'DATA':
+                self.reply('354 end with .')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                self.server.received += 1
+                self.reply('250 queued')
+            elif command == b'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class SMTPStub(socketserver.ThreadingTCPServer):
+    '''SMTP-заглушка, работающая в фоновом потоке'''
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, handshake_delay=0.0):
+        super().__init__(('127.0.0.1', 0), _SMTPHandler)
+        self.handshake_delay = handshake_delay
+        self.received = 0
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def __enter__(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,189 @@
+'''Сравнение SQLite с настройками по умолчанию и с SQLITE_PRAGMAS.
+
+Для каждого профиля на свежей временной базе поднимается gunicorn с
+несколькими рабочими процессами (--workers), и параллельные клиенты
+(--clients) в течение --duration секунд читают страницы списков
+(view_list GET) и добавляют в них элементы (view_list POST) в доле
+--write-share. Выводятся чтения и записи в секунду, задержки и ошибки
+(в том числе "database is locked", которые видны как ответы 500).
+
+Вторая таблица - те же чтения и записи напрямую через ORM из --workers
+процессов, без HTTP и шаблонов: видно, сколько времени занимает сама
+база данных, когда процессор не занят остальной обработкой запроса.
+
+    python benchmarks/sqlite_pragmas.py [--workers 4] [--clients 16]
+'''
+import argparse
+import json
+import multiprocessing
+import random
+import threading
+import time
+from common import (
+    SERVERS, free_port, percentile, print_table, setup_django, start_server,
+    test_database,
+)
+
+setup_django()
+
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from lists.models import Item, List
+from lists.views import _item_page
+from load_test import Stats, VirtualUser
+
+PROFILES = {
+    'default': {},
+    'tuned': settings.SQLITE_PRAGMAS,
+}
+
+
+def client(user, lists, write_share, deadline):
+    '''читать и дописывать списки до истечения срока'''
+    rng = random.Random(user.number)
+    user.request('warmup', 'GET', lists[0])  # CSRF-cookie
+    while time.monotonic() < deadline:
+        url = rng.choice(lists)
+        if rng.random() < write_share:
+            user.request('view_list POST', 'POST', url, {'text': user.unique_text()})
+        else:
+            user.request('view_list GET', 'GET', url)
+
+
+def run_profile(pragmas, args):
+    '''нагрузить сервер с профилем pragmas; вернуть сводку Stats'''
+    with test_database():
+        with connection.cursor() as cursor:
+            # режим журнала хранится в файле базы: задается явно
+            cursor.execute(f"PRAGMA journal_mode = {pragmas.get('journal_mode', 'delete')}")
+        lists = [
+            List.create_new(first_item_text=f'item {i}').get_absolute_url()
+            for i in range(args.lists)
+        ]
+        connection.close()
+        port = free_port()
+        server = start_server(
+            SERVERS['wsgi'], port, workers=args.workers,
+            env={'BENCH_SQLITE_PRAGMAS': json.dumps(pragmas)},
+        )
+        try:
+            stats = Stats()
+            deadline = time.monotonic() + args.warmup + args.duration
+            threads = [
+                threading.Thread(target=client, args=(
+                    VirtualUser('localhost', port, number, stats, None),
+                    lists, args.write_share, deadline,
+                ))
+                for number in range(args.clients)
+            ]
+            for thread in threads:
+                thread.start()
+            time.sleep(args.warmup)
+            stats.start()
+            for thread in threads:
+                thread.join()
+            return stats.summary()
+        finally:
+            server.terminate()
+            server.wait()
+
+
+def orm_worker(number, pragmas, list_ids, write_share, deadline, results):
+    '''процесс: чтения и записи через ORM; результат - в очередь results'''
+    settings.SQLITE_PRAGMAS = pragmas
+    rng = random.Random(number)
+    latencies = {'read': [], 'write': []}
+    errors = {'read': 0, 'write': 0}
+    counter = 0
+    while time.monotonic() < deadline:
+        list_id = rng.choice(list_ids)
+        kind = 'write' if rng.random() < write_share else 'read'
+        started = time.perf_counter()
+        try:
+            if kind == 'write':
+                counter += 1
+                with transaction.atomic():
+                    Item.objects.create(
+                        list=List.objects.get(id=list_id), text=f'{number}-{counter}'
+                    )
+            else:
+                _item_page(List.objects.get(id=list_id), 0)
+        except OperationalError:
+            errors[kind] += 1
+        latencies[kind].append(time.perf_counter() - started)
+    results.put((latencies, errors))
+
+
+def run_orm_profile(pragmas, args):
+    '''то же напрямую через ORM; вернуть {вид: (в секунду, p50, p95, p99, ошибки)}'''
+    with test_database():
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA journal_mode = {pragmas.get('journal_mode', 'delete')}")
+        list_ids = [
+            List.create_new(first_item_text=f'item {i}').id for i in range(args.lists)
+        ]
+        connection.close()
+        results = multiprocessing.Queue()
+        deadline = time.monotonic() + args.duration
+        workers = [
+            multiprocessing.Process(target=orm_worker, args=(
+                number, pragmas, list_ids, args.write_share, deadline, results,
+            ))
+            for number in range(args.workers)
+        ]
+        for worker in workers:
+            worker.start()
+        collected = [results.get() for _ in workers]
+        for worker in workers:
+            worker.join()
+    summary = {}
+    for kind in ('read', 'write'):
+        latencies = [value for got, _ in collected for value in got[kind]]
+        summary[kind] = (
+            round(len(latencies) / args.duration, 1),
+            round(percentile(latencies, 0.50), 2),
+            round(percentile(latencies, 0.95), 2),
+            round(percentile(latencies, 0.99), 2),
+            sum(errors[kind] for _, errors in collected),
+        )
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--warmup', type=float, default=1)
+    parser.add_argument('--lists', type=int, default=20)
+    parser.add_argument('--write-share', type=float, default=0.3)
+    args = parser.parse_args()
+
+    rows, orm_rows = [], []
+    for name, pragmas in PROFILES.items():
+        for kind, values in run_orm_profile(pragmas, args).items():
+            orm_rows.append([name, kind, *values])
+        results = run_profile(pragmas, args)
+        for page in ('view_list GET', 'view_list POST'):
+            r = results.get(page)
+            if r:
+                rows.append([
+                    name, page, r['rps'], r['p50'], r['p95'], r['p99'], r['errors'],
+                ])
+    print(
+        f'{args.workers} workers, {args.clients} clients, '
+        f'{args.write_share:.0%} writes, {args.duration:g} s:'
+    )
+    print_table(
+        ['profile', 'page', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'errors'], rows
+    )
+    print()
+    print(f'ORM only, {args.workers} processes:')
+    print_table(
+        ['profile', 'operation', 'ops/s', 'p50 ms', 'p95 ms', 'p99 ms', 'errors'],
+        orm_rows,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,173 @@
+'''Замер групповой фиксации записей элементов (ITEM_WRITE_BATCHING).
+
+Первая таблица - запись напрямую через форму ExistingListItemForm из
+--threads потоков одного процесса в течение --duration секунд: вставки
+и фиксации транзакций в секунду, задержки и полученные ошибки повтора
+(доля --duplicate-share записей повторяет уже добавленный элемент, и
+каждая такая запись должна получить свою ошибку, а не чужую).
+
+Вторая таблица - то же по HTTP: gunicorn с --workers процессами по
+--threads потоков, клиенты добавляют элементы в списки (view_list POST).
+
+    python benchmarks/write_batching.py [--threads 16] [--synchronous full]
+'''
+import argparse
+import json
+import random
+import threading
+import time
+from common import (
+    SERVERS, free_port, percentile, print_table, setup_django, start_server,
+    test_database,
+)
+
+setup_django()
+
+from django.conf import settings
+from django.db import connection
+from lists import write_queue
+from lists.forms import ExistingListItemForm
+from lists.models import List
+from load_test import Stats, VirtualUser
+
+
+def orm_worker(number, lists, args, deadline, results):
+    '''поток: добавлять элементы через форму до истечения срока'''
+    rng = random.Random(number)
+    latencies, duplicates, wrong = [], 0, 0
+    counter = 0
+    while time.monotonic() < deadline:
+        list_ = rng.choice(lists)
+        duplicate = rng.random() < args.duplicate_share
+        counter += 1
+        text = 'item 0' if duplicate else f'{number}-{counter}'
+        form = ExistingListItemForm(
+            for_list=list_, data={'text': text}, check_unique=False
+        )
+        started = time.perf_counter()
+        saved = form.is_valid() and form.save() is not None
+        latencies.append(time.perf_counter() - started)
+        if not saved:
+            duplicates += 1
+        if saved == duplicate:
+            wrong += 1  # повтор сохранился или новый элемент получил ошибку
+    connection.close()
+    results.append((latencies, duplicates, wrong))
+
+
+def run_orm(batching, args):
+    '''записи из потоков процесса; вернуть строку таблицы'''
+    settings.ITEM_WRITE_BATCHING = batching
+    write_queue._queue = None
+    with test_database():
+        _set_synchronous(args.synchronous)
+        lists = [List.create_new(first_item_text='item 0') for _ in range(args.lists)]
+        connection.close()
+        results = []
+        deadline = time.monotonic() + args.duration
+        threads = [
+            threading.Thread(target=orm_worker, args=(number, lists, args, deadline, results))
+            for number in range(args.threads)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    latencies = [value for got, _, _ in results for value in got]
+    writes = len(latencies)
+    commits = write_queue._queue.commits if batching else writes
+    return [
+        'on' if batching else 'off',
+        round((writes - sum(d for _, d, _ in results)) / args.duration, 1),
+        round(commits / args.duration, 1),
+        round(writes / commits, 1) if commits else 0,
+        round(percentile(latencies, 0.50), 2),
+        round(percentile(latencies, 0.95), 2),
+        round(percentile(latencies, 0.99), 2),
+        sum(d for _, d, _ in results),
+        sum(w for _, _, w in results),
+    ]
+
+
+def http_client(user, lists, deadline):
+    '''клиент: добавлять элементы в списки до истечения срока'''
+    rng = random.Random(user.number)
+    user.request('warmup', 'GET', lists[0])  # CSRF-cookie
+    while time.monotonic() < deadline:
+        user.request('view_list POST', 'POST', rng.choice(lists), {'text': user.unique_text()})
+
+
+def run_http(batching, args):
+    '''записи по HTTP; вернуть строку таблицы'''
+    with test_database():
+        _set_synchronous(args.synchronous)
+        lists = [
+            List.create_new(first_item_text='item 0').get_absolute_url()
+            for _ in range(args.lists)
+        ]
+        connection.close()
+        port = free_port()
+        pragmas = dict(settings.SQLITE_PRAGMAS, synchronous=args.synchronous)
+        server = start_server(
+            ['--threads', str(args.threads)] + SERVERS['wsgi'], port,
+            workers=args.workers, env={
+                'ITEM_WRITE_BATCHING': '1' if batching else '0',
+                'BENCH_SQLITE_PRAGMAS': json.dumps(pragmas),
+            },
+        )
+        try:
+            stats = Stats()
+            deadline = time.monotonic() + args.warmup + args.duration
+            threads = [
+                threading.Thread(target=http_client, args=(
+                    VirtualUser('localhost', port, number, stats, None), lists, deadline,
+                ))
+                for number in range(args.clients)
+            ]
+            for thread in threads:
+                thread.start()
+            time.sleep(args.warmup)
+            stats.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            server.terminate()
+            server.wait()
+    r = stats.summary()['view_list POST']
+    return ['on' if batching else 'off', r['rps'], r['p50'], r['p95'], r['p99'], r['errors']]
+
+
+def _set_synchronous(value):
+    '''режим журнала хранится в файле базы, synchronous - в соединении'''
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA journal_mode = wal')
+    settings.SQLITE_PRAGMAS = dict(settings.SQLITE_PRAGMAS, synchronous=value)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--warmup', type=float, default=1)
+    parser.add_argument('--lists', type=int, default=20)
+    parser.add_argument('--duplicate-share', type=float, default=0.05)
+    parser.add_argument('--synchronous', default=settings.SQLITE_PRAGMAS['synchronous'])
+    args = parser.parse_args()
+
+    orm_rows = [run_orm(batching, args) for batching in (False, True)]
+    http_rows = [run_http(batching, args) for batching in (False, True)]
+    print(f'ORM, {args.threads} threads, synchronous={args.synchronous}, {args.duration:g} s:')
+    print_table([
+        'batching', 'inserts/s', 'commits/s', 'writes/commit', 'p50 ms', 'p95 ms',
+        'p99 ms', 'duplicates', 'wrong results',
+    ], orm_rows)
+    print()
+    print(f'HTTP view_list POST, {args.workers} workers x {args.threads} threads, '
+          f'{args.clients} clients:')
+    print_table(['batching', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms', 'errors'], http_rows)
+
+
+if __name__ == '__main__':
+    main()
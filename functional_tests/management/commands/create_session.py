@@ -1,6 +1,6 @@
+from importlib import import_module
 from django.conf import settings
 from django.contrib.auth import BACKEND_SESSION_KEY, SESSION_KEY, get_user_model
-from django.contrib.sessions.backends.db import SessionStore
 from django.core.management.base import BaseCommand
 
 
@@ -22,6 +22,9 @@ class Command(BaseCommand):
 def create_pre_authenticated_session(email):
     '''создать предварительно аутентифицированный сеанс'''
     user = User.objects.get_or_create(email=email)[0]
+    # хранилище берется из настроек: для signed_cookies ключом сеанса
+    # становится само подписанное значение cookie
+    SessionStore = import_module(settings.SESSION_ENGINE).SessionStore
     session = SessionStore()
     session[SESSION_KEY] = user.pk
     session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
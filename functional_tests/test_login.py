@@ -60,13 +60,19 @@ class LoginTest(FunctionalTest):
         # Вышла из системы
         self.wait_to_be_logged_out(email=test_email)
     
+    @FunctionalTest.wait
+    def wait_for_django_email(self, test_email, subject):
+        '''ожидать письмо в mail.outbox: его отправляет фоновая доставка'''
+        self.assertTrue(mail.outbox, 'no email sent yet')
+        django_mail = mail.outbox[0]
+        self.assertIn(test_email, django_mail.to)
+        self.assertEqual(django_mail.subject, subject)
+        return django_mail.body
+
     def wait_for_email(self, test_email, subject):
         '''ожидать электронные письма'''
         if not self.staging_server:
-            django_mail = mail.outbox[0]
-            self.assertIn(test_email, django_mail.to)
-            self.assertEqual(django_mail.subject, subject)
-            return django_mail.body
+            return self.wait_for_django_email(test_email, subject)
         
 
         mail_pass = os.environ['EMAIL_PASSWORD']
@@ -0,0 +1,98 @@
+import json
+from django.conf import settings
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_http_methods, require_POST
+from lists.forms import ExistingListItemsForm, NewListForm
+from lists.models import MAX_ID, List
+from lists.sharding import shard_for_list
+
+
+JSON_CONTENT_TYPE_ERROR = 'Content-Type must be application/json'
+
+
+def _read_json(request):
+    '''тело запроса в виде JSON или None, если его не разобрать'''
+    try:
+        return json.loads(request.body)
+    except ValueError:
+        return None
+
+def _error(errors, status=400):
+    '''ответ с ошибками'''
+    return JsonResponse({'errors': errors}, status=status)
+
+def _list_or_none(list_id):
+    '''список по id или None'''
+    return List.objects.using(shard_for_list(list_id)).filter(id=list_id).first()
+
+@require_POST
+def new_list(request):
+    '''API: создать список из первого элемента
+
+    Владелец списка берется из сеанса, поэтому запрос проходит проверку
+    CSRF, как формы сайта (заголовок X-CSRFToken).
+    '''
+    if request.content_type != 'application/json':
+        return _error({'__all__': [JSON_CONTENT_TYPE_ERROR]}, status=415)
+    data = _read_json(request)
+    if not isinstance(data, dict):
+        return _error({'__all__': ['Invalid JSON']})
+    form = NewListForm(data={'text': data.get('text', '')})
+    if not form.is_valid():
+        return _error(form.errors)
+    list_ = form.save(owner=request.user)
+    return JsonResponse({
+        'id': list_.id, 'name': list_.name, 'url': list_.get_absolute_url(),
+    }, status=201)
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+def list_items(request, list_id):
+    '''API: элементы списка (GET) или добавление пакета элементов (POST)
+
+    Без проверки CSRF: сеанс здесь не используется, а тело принимается
+    только как application/json, которое межсайтовая форма отправить
+    не может.
+    '''
+    list_ = _list_or_none(list_id)
+    if list_ is None:
+        return _error({'__all__': ['List not found']}, status=404)
+    if request.method == 'POST':
+        return _add_items(request, list_)
+    return _get_items(request, list_)
+
+def _get_items(request, list_):
+    '''страница элементов по курсору ?after=<id>&limit=<n>'''
+    try:
+        after = max(int(request.GET.get('after', 0)), 0)
+        limit = int(request.GET.get('limit', settings.API_ITEMS_PAGE_LIMIT))
+    except ValueError:
+        return _error({'__all__': ['after and limit must be integers']})
+    if after > MAX_ID:
+        return _error({'__all__': [f'after must be at most {MAX_ID}']})
+    limit = min(max(limit, 1), settings.API_ITEMS_PAGE_LIMIT)
+    items = list(
+        list_.item_set.filter(id__gt=after).values('id', 'text')[:limit + 1]
+    )
+    next_cursor = items[limit - 1]['id'] if len(items) > limit else None
+    return JsonResponse({
+        'list': list_.id, 'items': items[:limit], 'next_cursor': next_cursor,
+    })
+
+def _add_items(request, list_):
+    '''добавить пакет элементов: {"items": ["текст", ...]}'''
+    if request.content_type != 'application/json':
+        return _error({'__all__': [JSON_CONTENT_TYPE_ERROR]}, status=415)
+    data = _read_json(request)
+    texts = data.get('items') if isinstance(data, dict) else None
+    if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+        return _error({'__all__': ['Expected {"items": [<text>, ...]}']})
+    if len(texts) > settings.API_MAX_ITEMS_PER_REQUEST:
+        return _error({'__all__': [
+            f'At most {settings.API_MAX_ITEMS_PER_REQUEST} items per request'
+        ]})
+    form = ExistingListItemsForm(for_list=list_, texts=texts)
+    if not form.is_valid() or form.save() is None:
+        return _error(form.errors)
+    return JsonResponse({'list': list_.id, 'created': len(texts)}, status=201)
@@ -1,10 +1,14 @@
 from django import forms
 from django.core.exceptions import ValidationError
-from .models import Item, List
+from django.db import IntegrityError, transaction
+from . import write_queue
+from .models import Item, List, text_hash
 
 
 EMPTY_ITEM_ERROR = "You can't have an empty list item"
 DUPLICATE_ITEM_ERROR = "You've already got this in your list"
+# сколько раз вставлять элемент снова, если его хэш занят другим текстом
+HASH_COLLISION_RETRIES = 5
 
 
 class ItemForm(forms.models.ModelForm):
@@ -30,21 +34,104 @@ class NewListForm(ItemForm):
     
     def save(self, owner):
         if owner.is_authenticated:
-            return List.create_new(first_item_text=self.cleaned_data['text'], owner=owner)
+            return write_queue.submit(lambda: List.create_new(
+                first_item_text=self.cleaned_data['text'], owner=owner
+            ))
         else:
-            return List.create_new(first_item_text=self.cleaned_data['text'])
+            return write_queue.submit(lambda: List.create_new(
+                first_item_text=self.cleaned_data['text']
+            ))
 
 
 class ExistingListItemForm(ItemForm):
     '''форма для элемента существующего списка'''
-    def __init__(self, for_list, *args, **kwargs):
+    def __init__(self, for_list, *args, check_unique=True, **kwargs):
         super().__init__(*args, **kwargs)
         self.instance.list = for_list
+        self.check_unique = check_unique
 
     def validate_unique(self):
         """проверка уникальности"""
+        if not self.check_unique:
+            return
         try:
             self.instance.validate_unique()
         except ValidationError as e:
             e.error_dict = {'text': [DUPLICATE_ITEM_ERROR]}
             self._update_errors(e)
+
+    def save(self):
+        '''сохранить; при повторе вернуть None и добавить ошибку формы'''
+        for _ in range(HASH_COLLISION_RETRIES + 1):
+            try:
+                return write_queue.submit(self._save_item)
+            except IntegrityError:
+                ordinal = self.instance.next_hash_ordinal()
+                if ordinal is None:
+                    self.add_error('text', DUPLICATE_ITEM_ERROR)
+                    return None
+                if ordinal <= self.instance.text_hash_ordinal:
+                    # строк с этим хэшем нет: ошибка не из-за совпадения
+                    raise
+                # тот же хэш у другого текста
+                self.instance.text_hash_ordinal = ordinal
+        raise IntegrityError(
+            f'no free text_hash_ordinal after {HASH_COLLISION_RETRIES} retries'
+        )
+
+    def _save_item(self):
+        with transaction.atomic():
+            return super().save()
+
+
+class ExistingListItemsForm(object):
+    '''форма для пакета элементов существующего списка'''
+
+    def __init__(self, for_list, texts):
+        self.list = for_list
+        self.texts = texts
+        self.errors = {}
+
+    def is_valid(self):
+        '''проверить пакет; ошибки собираются по номеру элемента'''
+        self.errors = {}
+        cleaned = []
+        for index, text in enumerate(self.texts):
+            form = ItemForm(data={'text': text})
+            if form.is_valid():
+                cleaned.append((index, form.cleaned_data['text']))
+            else:
+                self.errors[index] = list(form.errors['text'])
+        hashes = {text: text_hash(text) for _, text in cleaned}
+        taken = {}  # хэш -> {текст: text_hash_ordinal}
+        for text, hash_, ordinal in self.list.item_set.filter(
+            text_hash__in=set(hashes.values())
+        ).order_by().values_list('text', 'text_hash', 'text_hash_ordinal'):
+            taken.setdefault(hash_, {})[text] = ordinal
+        self.cleaned_items = []
+        for index, text in cleaned:
+            texts = taken.setdefault(hashes[text], {})
+            if text in texts:
+                self.errors[index] = [DUPLICATE_ITEM_ERROR]
+                continue
+            texts[text] = max(texts.values(), default=-1) + 1
+            self.cleaned_items.append((text, texts[text]))
+        return not self.errors
+
+    def save(self):
+        '''сохранить все элементы одной транзакцией'''
+        items = [
+            Item(list=self.list, text=text, text_hash_ordinal=ordinal)
+            for text, ordinal in self.cleaned_items
+        ]
+        using = self.list._state.db  # шард, из которого прочитан список
+        try:
+            with transaction.atomic(using=using):
+                Item.objects.using(using).bulk_create(items)
+                if items:
+                    self.list.mark_changed(items[0].text)
+        except IntegrityError:
+            # повтор, вставленный другим запросом после проверки
+            self.errors['items'] = [DUPLICATE_ITEM_ERROR]
+            return None
+        return items
@@ -0,0 +1,145 @@
+import csv
+import json
+import sys
+import time
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import F, Max
+from django.utils import timezone
+from lists.models import Item, List
+from lists.sharding import sharding_enabled
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    '''потоковый импорт списков и элементов из JSONL или CSV
+
+    Каждая строка входа: list (внешний ключ списка), text и необязательный
+    owner (email). Строки читаются потоком и пишутся пакетами через
+    bulk_create; повторы (list, text) отбрасывает сама база
+    (ignore_conflicts по хэшу текста), без запроса на каждую строку.
+    Другой текст с тем же 64-битным хэшем в том же списке тоже был бы
+    отброшен; при импорте такой шанс не стоит запроса на каждую строку.
+    В памяти держится текущий пакет, а также соответствие внешних ключей
+    id списков и уже созданные владельцы: они растут с числом разных
+    списков и владельцев (около 120 байт на каждый), но не с числом строк.
+    '''
+
+    help = (
+        'Import lists and items from a JSONL or CSV file ("-" for stdin). '
+        'Memory stays constant in the number of rows but grows with the '
+        'number of distinct list keys and owners, about 120 bytes each '
+        '(roughly 120 MB per million lists).'
+    )
+
+    def add_arguments(self, parser):
+        '''добавить аргументы'''
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['jsonl', 'csv'])
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        '''Обработать'''
+        if sharding_enabled():
+            # id списков здесь назначаются по максимуму основной базы,
+            # в обход каталога шардов
+            raise CommandError(
+                'import_lists writes to the default database only: import before '
+                'enabling LIST_SHARDS, then run rebalance_lists'
+            )
+        fmt = options['format'] or ('csv' if options['path'].endswith('.csv') else 'jsonl')
+        self.list_ids = {}
+        self.known_owners = set()
+        self.rows = self.skipped = 0
+        self.started = time.monotonic()
+        stream = sys.stdin if options['path'] == '-' else open(options['path'], encoding='utf-8')
+        try:
+            batch = []
+            for row in self._read_rows(stream, fmt):
+                batch.append(row)
+                if len(batch) >= options['batch_size']:
+                    self._import_batch(batch)
+                    batch = []
+            if batch:
+                self._import_batch(batch)
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+        self._report(final=True)
+
+    def _read_rows(self, stream, fmt):
+        '''строки входа в виде словарей'''
+        if fmt == 'csv':
+            yield from csv.DictReader(stream)
+            return
+        for line_number, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                raise CommandError(f'line {line_number}: invalid JSON')
+
+    @transaction.atomic
+    def _import_batch(self, batch):
+        '''записать пакет строк одной транзакцией'''
+        rows = []
+        for row in batch:
+            text = (row.get('text') or '').strip()
+            if not text or not row.get('list'):
+                self.skipped += 1
+                continue
+            rows.append((str(row['list']), text, row.get('owner') or None))
+        self._create_owners({owner for _, _, owner in rows if owner})
+        self._create_lists(rows)
+        Item.objects.bulk_create(
+            [Item(list_id=self.list_ids[key], text=text) for key, text, _ in rows],
+            batch_size=settings.IMPORT_INSERT_CHUNK_SIZE,
+            ignore_conflicts=True,
+        )
+        List.objects.filter(id__in={self.list_ids[key] for key, _, _ in rows}).update(
+            version=F('version') + 1, updated_at=timezone.now()
+        )
+        self.rows += len(batch)
+        self._report()
+
+    def _create_owners(self, emails):
+        '''создать недостающих владельцев одним запросом'''
+        new_emails = emails - self.known_owners
+        if new_emails:
+            User.objects.bulk_create(
+                [User(email=email) for email in new_emails], ignore_conflicts=True
+            )
+            self.known_owners |= new_emails
+
+    def _create_lists(self, rows):
+        '''создать списки для новых внешних ключей пакета'''
+        new_lists = {}
+        for key, text, owner in rows:
+            if key not in self.list_ids and key not in new_lists:
+                new_lists[key] = List(name=text, owner_id=owner)
+        if not new_lists:
+            return
+        if not connection.features.can_return_rows_from_bulk_insert:
+            # SQLite не возвращает id из bulk_create: назначаем их сами
+            # внутри транзакции пакета, начиная с текущего максимума
+            next_id = (List.objects.aggregate(max_id=Max('id'))['max_id'] or 0) + 1
+            for offset, list_ in enumerate(new_lists.values()):
+                list_.id = next_id + offset
+        List.objects.bulk_create(new_lists.values(), batch_size=settings.IMPORT_INSERT_CHUNK_SIZE)
+        for key, list_ in new_lists.items():
+            self.list_ids[key] = list_.id
+
+    def _report(self, final=False):
+        '''вывести скорость импорта'''
+        elapsed = time.monotonic() - self.started
+        rate = self.rows / elapsed if elapsed else 0
+        prefix = 'Imported' if final else 'Processed'
+        self.stdout.write(
+            f'{prefix} {self.rows} rows ({self.skipped} skipped, '
+            f'{len(self.list_ids)} lists) in {elapsed:.1f}s: {rate:.0f} rows/s'
+        )
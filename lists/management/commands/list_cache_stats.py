@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from lists.table_cache import counters_are_shared, get_stats
+
+
+class Command(BaseCommand):
+    '''показать статистику кэша таблиц списков'''
+
+    def handle(self, *args, **options):
+        '''Обработать'''
+        if not counters_are_shared():
+            raise CommandError(
+                'The list table cache is local to each process (locmem), so '
+                'its hits and misses are not visible here. Set '
+                'LIST_CACHE_BACKEND=file or LIST_CACHE_BACKEND=memcached '
+                'for the site to collect them.'
+            )
+        stats = get_stats()
+        self.stdout.write(
+            f"hits: {stats['hits']}  misses: {stats['misses']}  "
+            f"hit rate: {stats['hit_rate']:.1%}"
+        )
@@ -0,0 +1,100 @@
+import math
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Count
+from lists.models import List, ListShard
+from lists.sharding import move_list, sharding_enabled
+
+
+class Command(BaseCommand):
+    '''перенос списков между шардами (lists/sharding.py)
+
+    --register записывает в каталог шардов списки основной базы, которых
+    там еще нет: это нужно один раз перед включением шардирования.
+    --list и --to переносят один список. Без них команда выравнивает
+    число списков: с шардов, где их больше среднего, самые новые списки
+    переносятся туда, где меньше. Каждый перенос держит блокировку записи
+    шарда недолго, а между переносами есть пауза, поэтому команду можно
+    запускать на работающем сайте.
+    '''
+
+    help = 'Move lists between shards, or register existing lists in the shard directory'
+
+    def add_arguments(self, parser):
+        '''добавить аргументы'''
+        parser.add_argument('--register', action='store_true')
+        parser.add_argument('--list', type=int, dest='list_id')
+        parser.add_argument('--to', dest='target')
+        parser.add_argument('--dry-run', action='store_true', help='only print the moves')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--pause', type=float, default=0.05,
+            help='seconds to sleep between moves',
+        )
+
+    def handle(self, *args, **options):
+        '''Обработать'''
+        if options['register']:
+            self._register(options['batch_size'])
+            return
+        if not sharding_enabled():
+            raise CommandError('LIST_SHARDS has a single database: nothing to rebalance')
+        if options['list_id'] is not None or options['target'] is not None:
+            if options['list_id'] is None or options['target'] not in settings.LIST_SHARDS:
+                raise CommandError(f'--list needs --to, one of {settings.LIST_SHARDS}')
+            moves = [(options['list_id'], options['target'])]
+        else:
+            moves = self._plan()
+        started = time.monotonic()
+        moved = 0
+        for list_id, target in moves:
+            if options['dry_run']:
+                self.stdout.write(f'list {list_id} -> {target}')
+                continue
+            if move_list(list_id, target):
+                moved += 1
+                time.sleep(options['pause'])
+        if not options['dry_run']:
+            self.stdout.write(f'Moved {moved} lists in {time.monotonic() - started:.1f}s')
+
+    def _register(self, batch_size):
+        '''записать в каталог списки основной базы пакетами по id'''
+        registered = 0
+        last_id = 0
+        while True:
+            ids = list(
+                List.objects.using(DEFAULT_DB_ALIAS).filter(id__gt=last_id)
+                .order_by('id').values_list('id', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            ListShard.objects.bulk_create(
+                [ListShard(id=list_id, shard=DEFAULT_DB_ALIAS) for list_id in ids],
+                ignore_conflicts=True,
+            )
+            registered += len(ids)
+            last_id = ids[-1]
+        self.stdout.write(f'Registered {registered} lists')
+
+    def _plan(self):
+        '''переносы, после которых на каждом шарде не больше среднего'''
+        counts = dict.fromkeys(settings.LIST_SHARDS, 0)
+        for row in ListShard.objects.values('shard').annotate(count=Count('id')):
+            if row['shard'] in counts:
+                counts[row['shard']] = row['count']
+        limit = math.ceil(sum(counts.values()) / len(counts))
+        free = [
+            shard for shard, count in counts.items() for _ in range(limit - count)
+        ]
+        moves = []
+        for shard, count in counts.items():
+            if count <= limit:
+                continue
+            newest = ListShard.objects.filter(shard=shard).order_by('-id').values_list(
+                'id', flat=True
+            )[:count - limit]
+            for list_id in newest:
+                moves.append((list_id, free.pop()))
+        return moves
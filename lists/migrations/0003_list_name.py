@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+
+def fill_list_names(apps, schema_editor):
+    '''заполнить имена существующих списков текстом первого элемента'''
+    List = apps.get_model('lists', 'List')
+    Item = apps.get_model('lists', 'Item')
+    first_items = Item.objects.filter(
+        list=models.OuterRef('pk')
+    ).order_by('id').values('text')[:1]
+    List.objects.filter(name='').update(
+        name=models.functions.Coalesce(models.Subquery(first_items), models.Value(''))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lists', '0002_list_owner'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='list',
+            name='name',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(fill_list_names, migrations.RunPython.noop),
+    ]
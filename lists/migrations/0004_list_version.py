@@ -0,0 +1,18 @@
+# Generated by Django 3.2.3 on 2026-10-18 10:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lists', '0003_list_name'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='list',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
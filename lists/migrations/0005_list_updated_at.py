@@ -0,0 +1,23 @@
+# Generated by Django 3.2.3 on 2026-10-18 10:26
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lists', '0004_list_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='list',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='list',
+            index=models.Index(fields=['owner', 'updated_at'], name='lists_list_owner_i_d6b96b_idx'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 3.2.3 on 2026-10-18 11:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lists', '0005_list_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.CharField(max_length=100)),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.3 on 2026-10-18 14:02
+
+from django.db import migrations, models
+import lists.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lists', '0006_listshard'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='item',
+            name='text_hash',
+            field=lists.models.TextHashField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='item',
+            name='text_hash_ordinal',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+    ]
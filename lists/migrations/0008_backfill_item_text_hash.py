@@ -0,0 +1,53 @@
+from django.db import migrations, transaction
+from django.db.models import Count
+from lists.models import text_hash
+
+BATCH_SIZE = 2000
+
+
+def fill_text_hashes(apps, schema_editor):
+    '''заполнить хэши текстов существующих элементов пакетами по id
+    (каждый пакет - своя транзакция), затем пронумеровать тексты
+    с одинаковым хэшем в одном списке'''
+    Item = apps.get_model('lists', 'Item')
+    items = Item.objects.using(schema_editor.connection.alias)
+    table = schema_editor.quote_name(Item._meta.db_table)
+    last_id = 0
+    while True:
+        batch = list(
+            items.filter(id__gt=last_id, text_hash__isnull=True)
+            .order_by('id').values_list('id', 'text')[:BATCH_SIZE]
+        )
+        if not batch:
+            break
+        # executemany вместо bulk_update: тот строит CASE на весь пакет
+        with transaction.atomic(using=schema_editor.connection.alias):
+            with schema_editor.connection.cursor() as cursor:
+                cursor.executemany(
+                    f'UPDATE {table} SET text_hash = %s WHERE id = %s',
+                    [(text_hash(text), item_id) for item_id, text in batch],
+                )
+        last_id = batch[-1][0]
+    collisions = items.values('list_id', 'text_hash').annotate(
+        count=Count('id')
+    ).filter(count__gt=1).order_by()
+    for row in collisions:
+        same_hash = items.filter(
+            list_id=row['list_id'], text_hash=row['text_hash']
+        ).order_by('id')
+        for ordinal, item_id in enumerate(same_hash.values_list('id', flat=True)):
+            items.filter(id=item_id).update(text_hash_ordinal=ordinal)
+
+
+class Migration(migrations.Migration):
+    # без общей транзакции: пакеты фиксируются по одному и не держат
+    # блокировку записи всей таблицы до конца заполнения
+    atomic = False
+
+    dependencies = [
+        ('lists', '0007_item_text_hash'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_text_hashes, migrations.RunPython.noop),
+    ]
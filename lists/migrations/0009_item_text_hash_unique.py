@@ -0,0 +1,23 @@
+# Generated by Django 3.2.3 on 2026-10-18 14:05
+
+from django.db import migrations
+import lists.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('lists', '0008_backfill_item_text_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='item',
+            name='text_hash',
+            field=lists.models.TextHashField(editable=False),
+        ),
+        migrations.AlterUniqueTogether(
+            name='item',
+            unique_together={('list', 'text_hash', 'text_hash_ordinal')},
+        ),
+    ]
@@ -1,34 +1,137 @@
-from django.db import models
+import hashlib
+from django.core.exceptions import NON_FIELD_ERRORS, ValidationError
+from django.db import models, router
+from django.db.models import Case, F, Value, When
 from django.urls import reverse
 from django.conf import settings
+from django.utils import timezone
+from lists import sharding
+
+# наибольший id (INTEGER в SQLite): курсоры больше него база не принимает
+MAX_ID = 2 ** 63 - 1
 
 
 class List(models.Model):
     '''Список'''
     owner = models.ForeignKey(settings.AUTH_USER_MODEL, blank=True, null=True, on_delete=models.CASCADE)
+    # имя хранится в таблице, чтобы "Мои списки" не делали запрос на каждый список
+    name = models.TextField(default='', blank=True)
+    # номер версии содержимого: растет при каждой записи элемента,
+    # по нему строятся ключи кэша таблицы списка
+    version = models.PositiveIntegerField(default=0, editable=False)
+    # время последнего изменения: входит в ETag "Моих списков"
+    updated_at = models.DateTimeField(default=timezone.now, editable=False)
+
+    class Meta:
+        indexes = [models.Index(fields=['owner', 'updated_at'])]
 
     def get_absolute_url(self):
         return reverse("view_list", args=[self.id])
     
-    @property
-    def name(self):
-        return self.item_set.first().text
-    
+    def mark_changed(self, item_text):
+        '''отметить запись элементов: новая версия, время и имя списка'''
+        changes = {'version': F('version') + 1, 'updated_at': timezone.now()}
+        if not self.name:
+            self.name = item_text
+            changes['name'] = Case(
+                When(name='', then=Value(item_text)), default=F('name'),
+                output_field=models.TextField(),
+            )
+        using = router.db_for_write(List, instance=self)
+        List.objects.using(using).filter(pk=self.pk).update(**changes)
+        self.version += 1
+        self.updated_at = changes['updated_at']
+
     @staticmethod
     def create_new(first_item_text, owner=None):
-        '''создать новый'''
-        list_ = List.objects.create(owner=owner)
-        Item.objects.create(text=first_item_text, list=list_)
+        '''создать новый (при шардировании - на выбранном шарде)'''
+        shard = sharding.choose_shard()
+        if shard is None:
+            list_ = List.objects.create(owner=owner, name=first_item_text)
+        else:
+            if owner is not None:
+                sharding.copy_owner(owner.email, shard)
+            list_ = List.objects.using(shard).create(
+                id=sharding.allocate_list_id(shard), owner=owner, name=first_item_text
+            )
+        Item.objects.using(shard).create(text=first_item_text, list=list_)
         return list_
     
+def text_hash(text):
+    '''первые 8 байт SHA-256 текста как знаковое 64-битное целое'''
+    digest = hashlib.sha256(text.encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big', signed=True)
+
+
+class TextHashField(models.BigIntegerField):
+    '''хэш текстового поля source (text_hash); пересчитывается при
+    каждом сохранении, в том числе в bulk_create'''
+
+    def __init__(self, *args, source='text', **kwargs):
+        self.source = source
+        kwargs.setdefault('editable', False)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if self.source != 'text':
+            kwargs['source'] = self.source
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        value = text_hash(getattr(model_instance, self.source))
+        setattr(model_instance, self.attname, value)
+        return value
+
+
 class Item(models.Model):
     """элемент списка"""
     text = models.TextField(default='')
     list = models.ForeignKey(List, default=None, on_delete=models.CASCADE)
+    text_hash = TextHashField()
+    text_hash_ordinal = models.PositiveSmallIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ('id',)
-        unique_together = ('list', 'text')
+        unique_together = ('list', 'text_hash', 'text_hash_ordinal')
 
     def __str__(self):
-        return self.text
\ No newline at end of file
+        return self.text
+
+    def next_hash_ordinal(self):
+        '''свободный text_hash_ordinal для текста элемента в его списке;
+        None, если такой текст в списке уже есть'''
+        using = router.db_for_write(Item, instance=self)
+        taken = Item.objects.using(using).filter(
+            list_id=self.list_id, text_hash=text_hash(self.text)
+        ).exclude(pk=self.pk).order_by().values_list('text', 'text_hash_ordinal')
+        ordinals = []
+        for text, ordinal in taken:
+            if text == self.text:
+                return None
+            ordinals.append(ordinal)
+        return max(ordinals) + 1 if ordinals else 0
+
+    def validate_unique(self, exclude=None):
+        '''проверка уникальности, включая повтор текста в списке
+        (ограничение в базе построено по хэшу, а не по тексту)'''
+        super().validate_unique(exclude)
+        exclude = exclude or []
+        if (
+            'list' not in exclude and 'text' not in exclude
+            and self.list_id is not None and self.next_hash_ordinal() is None
+        ):
+            raise ValidationError({
+                NON_FIELD_ERRORS: [self.unique_error_message(Item, ('list', 'text'))]
+            })
+
+    def save(self, *args, **kwargs):
+        '''сохранить; первый элемент задает имя списка,
+        каждая запись увеличивает версию списка'''
+        super().save(*args, **kwargs)
+        self.list.mark_changed(self.text)
+
+
+class ListShard(models.Model):
+    '''каталог шардов: в какой базе лежит список (id записи - id списка)'''
+    shard = models.CharField(max_length=100)
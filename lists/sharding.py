@@ -0,0 +1,148 @@
+'''Шардирование списков по нескольким базам данных.
+
+Когда в LIST_SHARDS больше одной базы, каждый список вместе со своими
+элементами хранится в одной из них (шарде). Каталог ListShard в
+основной базе помнит шард каждого списка и выдает id новых списков,
+поэтому id уникальны во всех шардах. Список без записи в каталоге
+лежит в основной базе.
+
+List.create_new выбирает шард для нового списка, представления находят
+список через shard_for_list, а ShardRouter направляет запросы элементов
+и самого списка в базу, из которой список прочитан. "Мои списки"
+опрашивают все шарды (shards) и объединяют результаты.
+
+Перед включением шардирования существующие списки нужно записать в
+каталог (manage.py rebalance_lists --register), иначе новые id совпадут
+с их id. Команда rebalance_lists переносит списки между шардами.
+Реплики для чтения (superlists/db_router.py) относятся только к
+основной базе.
+'''
+import random
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+from django.utils import timezone
+
+SHARDED_MODELS = ('lists.list', 'lists.item')
+
+
+def sharding_enabled():
+    '''списки распределяются по нескольким базам'''
+    return len(settings.LIST_SHARDS) > 1
+
+
+def shards():
+    '''базы, которые надо опросить, чтобы найти все списки; [None]
+    без шардирования (базу выбирают маршрутизаторы, как обычно)'''
+    return list(settings.LIST_SHARDS) if sharding_enabled() else [None]
+
+
+def shard_for_list(list_id):
+    '''база списка по каталогу; None без шардирования'''
+    if not sharding_enabled():
+        return None
+    from lists.models import ListShard
+    shard = ListShard.objects.filter(id=list_id).values_list('shard', flat=True).first()
+    return shard or DEFAULT_DB_ALIAS
+
+
+def choose_shard():
+    '''шард для нового списка; None без шардирования'''
+    if not sharding_enabled():
+        return None
+    return random.choice(settings.LIST_SHARDS)
+
+
+def allocate_list_id(shard):
+    '''записать в каталог новый список на шарде shard и вернуть его id'''
+    from lists.models import ListShard
+    return ListShard.objects.create(shard=shard).id
+
+
+def copy_owner(email, shard):
+    '''строка владельца на шарде, чтобы на нее мог ссылаться список
+    (пользователи хранятся в основной базе)'''
+    from accounts.models import User
+    if shard != DEFAULT_DB_ALIAS:
+        User.objects.using(shard).get_or_create(email=email)
+
+
+def move_list(list_id, target):
+    '''перенести список с элементами на шард target; False, если он уже там
+
+    Сначала в списке на старом шарде увеличивается версия: эта запись
+    держит блокировку записи старого шарда, пока список копируется,
+    каталог переключается и старая копия удаляется. Новая версия
+    заодно сбрасывает кэши и ETag страницы списка. Элементы получают на
+    новом шарде новые id в прежнем порядке.
+    '''
+    from lists.models import Item, List, ListShard
+    source = shard_for_list(list_id)
+    if source == target:
+        return False
+    with transaction.atomic(using=source):
+        List.objects.using(source).filter(id=list_id).update(
+            version=F('version') + 1, updated_at=timezone.now()
+        )
+        list_ = List.objects.using(source).get(id=list_id)
+        items = list(
+            Item.objects.using(source).filter(list_id=list_id)
+            .order_by('id').values_list('text', 'text_hash_ordinal')
+        )
+        with transaction.atomic(using=target):
+            if list_.owner_id:
+                copy_owner(list_.owner_id, target)
+            List.objects.using(target).bulk_create([List(
+                id=list_.id, owner_id=list_.owner_id, name=list_.name,
+                version=list_.version, updated_at=list_.updated_at,
+            )])
+            Item.objects.using(target).bulk_create(
+                [
+                    Item(list_id=list_id, text=text, text_hash_ordinal=ordinal)
+                    for text, ordinal in items
+                ],
+                batch_size=settings.IMPORT_INSERT_CHUNK_SIZE,
+            )
+        ListShard.objects.update_or_create(id=list_id, defaults={'shard': target})
+        List.objects.using(source).filter(id=list_id).delete()
+    return True
+
+
+class ShardRouter:
+    '''списки и элементы - в базу своего шарда
+
+    Запросы без указания базы, связанные со списком или элементом
+    (item_set, item.list, сохранение элемента), идут в базу этого
+    списка. Остальные запросы к спискам должны указывать базу сами
+    (using(shard_for_list(...))).
+    '''
+
+    def db_for_read(self, model, **hints):
+        return self._shard(model, hints.get('instance'))
+
+    def db_for_write(self, model, **hints):
+        return self._shard(model, hints.get('instance'))
+
+    def allow_relation(self, obj1, obj2, **hints):
+        '''владелец (основная база) и список (шард) могут быть связаны'''
+        if not sharding_enabled():
+            return None
+        databases = {DEFAULT_DB_ALIAS, *settings.LIST_SHARDS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def _shard(self, model, instance):
+        if not sharding_enabled():
+            return None
+        if model._meta.label_lower == 'lists.listshard':
+            return DEFAULT_DB_ALIAS
+        if (
+            model._meta.label_lower not in SHARDED_MODELS or instance is None
+            or instance._meta.label_lower not in SHARDED_MODELS
+        ):
+            return None
+        if instance._state.db in settings.LIST_SHARDS:
+            return instance._state.db
+        list_id = instance.pk if instance._meta.label_lower == 'lists.list' else instance.list_id
+        return shard_for_list(list_id) if list_id else None
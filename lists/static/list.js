@@ -3,6 +3,22 @@ window.Superlists.initialize = function () {
     $('input[name="text"]').on('keypress', function () {
         $('.has-error').hide();
     });
+    $('#id_load_more').on('click', function (event) {
+        event.preventDefault();
+        var link = $(this);
+        var query = {after: link.data('cursor'), n: link.data('offset')};
+        $.get(link.data('fragment-url'), query, function (rows, status, xhr) {
+            $('#id_list_table').append(rows);
+            var nextCursor = xhr.getResponseHeader('X-Next-Cursor');
+            var nextOffset = xhr.getResponseHeader('X-Next-Offset');
+            if (nextCursor) {
+                link.data({cursor: nextCursor, offset: nextOffset})
+                    .attr('href', '?after=' + nextCursor + '&n=' + nextOffset);
+            } else {
+                link.remove();
+            }
+        });
+    });
 };
 
-console.log('list.js loaded');
\ No newline at end of file
+console.log('list.js loaded');
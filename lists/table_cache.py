@@ -0,0 +1,58 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+
+
+HITS_KEY = 'list-table:hits'
+MISSES_KEY = 'list-table:misses'
+
+
+def _cache():
+    '''кэш отрисованных таблиц списков'''
+    return caches[settings.LIST_TABLE_CACHE_ALIAS]
+
+def table_cache_key(list_, after, offset=None):
+    '''ключ кэша страницы таблицы: список, его версия, курсор и номер
+    строки перед ним (от него зависят номера строк)'''
+    return f'list-table:{list_.id}:{list_.version}:{after}:{offset}'
+
+def get_table_page(list_, after, offset, render_page):
+    '''получить страницу таблицы из кэша или отрисовать и сохранить
+
+    Ключ включает версию списка, поэтому после записи элемента старые
+    записи просто перестают запрашиваться и со временем вытесняются.
+    '''
+    cache = _cache()
+    key = table_cache_key(list_, after, offset)
+    page = cache.get(key)
+    if page is None:
+        _count(cache, MISSES_KEY)
+        page = render_page()
+        cache.set(key, page, settings.LIST_TABLE_CACHE_TIMEOUT)
+    else:
+        _count(cache, HITS_KEY)
+    return page
+
+def counters_are_shared():
+    '''видны ли счетчики всем процессам: у locmem они свои в каждом'''
+    return not isinstance(_cache(), LocMemCache)
+
+def get_stats():
+    '''счетчики попаданий и промахов кэша'''
+    counters = _cache().get_many([HITS_KEY, MISSES_KEY])
+    hits = counters.get(HITS_KEY, 0)
+    misses = counters.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else 0.0,
+    }
+
+def _count(cache, key):
+    '''увеличить счетчик в самом кэше, чтобы его видели все процессы'''
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key)
@@ -0,0 +1,184 @@
+import json
+from unittest.mock import patch
+from django.test import Client, TestCase
+from django.contrib.auth import get_user_model
+from lists.forms import DUPLICATE_ITEM_ERROR, EMPTY_ITEM_ERROR
+from lists.models import Item, List
+
+
+User = get_user_model()
+
+
+class ApiTestCase(TestCase):
+    '''базовый класс тестов JSON API'''
+
+    def post_json(self, url, data):
+        '''отправить JSON методом POST'''
+        return self.client.post(
+            url, data=json.dumps(data), content_type='application/json'
+        )
+
+
+class NewListApiTest(ApiTestCase):
+    '''тест API создания списка'''
+
+    def test_creates_list_with_first_item(self):
+        '''тест: создает список с первым элементом'''
+        response = self.post_json('/lists/api/lists/', {'text': 'first'})
+        self.assertEqual(response.status_code, 201)
+        list_ = List.objects.get()
+        self.assertEqual(response.json(), {
+            'id': list_.id, 'name': 'first', 'url': f'/lists/{list_.id}/',
+        })
+        self.assertEqual(list_.item_set.get().text, 'first')
+
+    def test_saves_owner_if_user_is_authenticated(self):
+        '''тест: сохраняет владельца, если пользователь аутентифицирован'''
+        user = User.objects.create(email='a@b.com')
+        self.client.force_login(user)
+        self.post_json('/lists/api/lists/', {'text': 'first'})
+        self.assertEqual(List.objects.get().owner, user)
+
+    def test_empty_item_is_rejected(self):
+        '''тест: пустой элемент отклоняется'''
+        response = self.post_json('/lists/api/lists/', {'text': ''})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'errors': {'text': [EMPTY_ITEM_ERROR]}})
+        self.assertEqual(List.objects.count(), 0)
+
+    def test_invalid_json_is_rejected(self):
+        '''тест: неразбираемый JSON отклоняется'''
+        response = self.client.post(
+            '/lists/api/lists/', data='{', content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+    def test_cross_site_post_cannot_create_list_for_logged_in_user(self):
+        '''тест: межсайтовая форма text/plain не создает список
+        от имени вошедшего пользователя'''
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(User.objects.create(email='victim@b.com'))
+        response = client.post(
+            '/lists/api/lists/', data='{"text": "spam"}', content_type='text/plain'
+        )
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(List.objects.count(), 0)
+
+    def test_requires_csrf_token(self):
+        '''тест: JSON без CSRF-токена отклоняется'''
+        client = Client(enforce_csrf_checks=True)
+        response = client.post(
+            '/lists/api/lists/', data='{"text": "first"}',
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_rejects_other_content_types(self):
+        '''тест: тело не application/json отклоняется'''
+        response = self.client.post(
+            '/lists/api/lists/', data='{"text": "first"}', content_type='text/plain'
+        )
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(List.objects.count(), 0)
+
+class ListItemsApiTest(ApiTestCase):
+    '''тест API элементов списка'''
+
+    def test_adds_many_items_in_one_request(self):
+        '''тест: добавляет много элементов одним запросом'''
+        list_ = List.create_new(first_item_text='first')
+        texts = [f'item {i}' for i in range(100)]
+        with self.assertNumQueries(6):
+            response = self.post_json(
+                f'/lists/api/lists/{list_.id}/items/', {'items': texts}
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {'list': list_.id, 'created': 100})
+        self.assertEqual(list_.item_set.count(), 101)
+
+    def test_bulk_insert_changes_list_version(self):
+        '''тест: пакетная вставка меняет версию списка'''
+        list_ = List.create_new(first_item_text='first')
+        self.post_json(f'/lists/api/lists/{list_.id}/items/', {'items': ['a', 'b']})
+        self.assertEqual(List.objects.get(id=list_.id).version, list_.version + 1)
+
+    def test_duplicates_reject_whole_batch(self):
+        '''тест: повторы отклоняют весь пакет'''
+        list_ = List.create_new(first_item_text='first')
+        response = self.post_json(
+            f'/lists/api/lists/{list_.id}/items/',
+            {'items': ['new', 'first', '', 'new']},
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'errors': {
+            '1': [DUPLICATE_ITEM_ERROR],
+            '2': [EMPTY_ITEM_ERROR],
+            '3': [DUPLICATE_ITEM_ERROR],
+        }})
+        self.assertEqual(list_.item_set.count(), 1)
+
+    def test_texts_with_same_hash_get_next_ordinals(self):
+        '''тест: тексты с одинаковым хэшем получают следующие номера'''
+        list_ = List.create_new(first_item_text='first')
+        with patch('lists.models.text_hash', return_value=42), \
+                patch('lists.forms.text_hash', return_value=42):
+            Item.objects.filter(list=list_).update(text_hash=42)
+            response = self.post_json(
+                f'/lists/api/lists/{list_.id}/items/', {'items': ['a', 'b']}
+            )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            list(list_.item_set.values_list('text', 'text_hash_ordinal')),
+            [('first', 0), ('a', 1), ('b', 2)],
+        )
+
+    def test_rejects_malformed_payload(self):
+        '''тест: отклоняет неправильный формат данных'''
+        list_ = List.create_new(first_item_text='first')
+        response = self.post_json(
+            f'/lists/api/lists/{list_.id}/items/', {'items': 'not a list'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_rejects_other_content_types(self):
+        '''тест: пакет не в application/json отклоняется'''
+        list_ = List.create_new(first_item_text='first')
+        response = Client(enforce_csrf_checks=True).post(
+            f'/lists/api/lists/{list_.id}/items/',
+            data='{"items": ["new"]}', content_type='text/plain',
+        )
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(list_.item_set.count(), 1)
+
+    def test_unknown_list_returns_404(self):
+        '''тест: несуществующий список возвращает 404'''
+        response = self.client.get('/lists/api/lists/999/items/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_reads_items_with_cursor(self):
+        '''тест: читает элементы постранично по курсору'''
+        list_ = List.objects.create()
+        items = [Item.objects.create(list=list_, text=f'item {i}') for i in range(5)]
+        response = self.client.get(f'/lists/api/lists/{list_.id}/items/?limit=2')
+        self.assertEqual(response.json(), {
+            'list': list_.id,
+            'items': [{'id': item.id, 'text': item.text} for item in items[:2]],
+            'next_cursor': items[1].id,
+        })
+        response = self.client.get(
+            f'/lists/api/lists/{list_.id}/items/?limit=2&after={items[3].id}'
+        )
+        self.assertEqual(response.json()['items'], [{'id': items[4].id, 'text': 'item 4'}])
+        self.assertIsNone(response.json()['next_cursor'])
+
+    def test_rejects_out_of_range_cursor(self):
+        '''тест: курсор больше наибольшего id отклоняется'''
+        list_ = List.create_new(first_item_text='first')
+        response = self.client.get(
+            f'/lists/api/lists/{list_.id}/items/?after={2 ** 63}'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.json(), {'errors': {'__all__': [f'after must be at most {2 ** 63 - 1}']}}
+        )
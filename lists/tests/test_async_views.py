@@ -0,0 +1,150 @@
+from asgiref.sync import sync_to_async
+from urllib.parse import urlencode
+from django.core.cache import caches
+from django.test import TransactionTestCase, override_settings
+from django.urls import include, path
+from accounts import views as accounts_views
+from accounts.models import OutboxEmail
+from lists import views
+from lists.forms import ItemForm
+from lists.models import Item, List
+from superlists.db_threads import async_view
+from superlists.test_databases import FileDatabaseMixin
+
+
+# адреса как под ASGI: основные страницы - в пуле потоков (async_view)
+urlpatterns = [
+    path('', async_view(views.home_page), name='home'),
+    path('lists/<int:list_id>/', async_view(views.view_list), name='view_list'),
+    path('lists/new', async_view(views.new_list), name='new_list'),
+    path(
+        'accounts/send_login_email/', async_view(accounts_views.send_login_email),
+        name='send_login_email',
+    ),
+    path('', include('superlists.urls')),
+]
+
+
+@override_settings(ROOT_URLCONF=__name__, ASYNC_VIEWS=True)
+class AsyncViewsTest(FileDatabaseMixin, TransactionTestCase):
+    '''тест асинхронных версий представлений: они обращаются к базе
+    из пула потоков, поэтому основная база - в файле'''
+
+    def setUp(self):
+        '''установка'''
+        caches['lists'].clear()
+
+    async def test_home_page_uses_item_form(self):
+        '''тест: домашняя страница использует форму для элемента'''
+        response = await self.async_client.get('/')
+        self.assertTemplateUsed(response, 'home.html')
+        self.assertIsInstance(response.context['form'], ItemForm)
+
+    async def test_list_page_displays_items(self):
+        '''тест: страница списка отображает его элементы'''
+        list_ = await _create_list('itemey 1')
+        response = await self.async_client.get(f'/lists/{list_.id}/')
+        self.assertTemplateUsed(response, 'list.html')
+        self.assertContains(response, 'itemey 1')
+
+    async def test_unchanged_list_returns_304(self):
+        '''тест: для неизмененного списка возвращается 304'''
+        list_ = await _create_list('item')
+        await self.async_client.get(f'/lists/{list_.id}/')  # получаем CSRF-cookie
+        response = await self.async_client.get(f'/lists/{list_.id}/')
+        self.assertFalse(response.has_header('Last-Modified'))
+        response = await self.async_client.get(
+            f'/lists/{list_.id}/', **{'If-None-Match': response['ETag']}
+        )
+        self.assertEqual(response.status_code, 304)
+
+    async def test_POST_saves_item_and_redirects(self):
+        '''тест: POST сохраняет элемент и переадресует на список'''
+        list_ = await _create_list('item')
+        response = await _form_post(
+            self.async_client, f'/lists/{list_.id}/', 'text', 'new item'
+        )
+        self.assertRedirects(
+            response, f'/lists/{list_.id}/', fetch_redirect_response=False
+        )
+        texts = await _item_texts(list_)
+        self.assertEqual(texts, ['item', 'new item'])
+
+    async def test_duplicate_item_shows_error_on_page(self):
+        '''тест: повторяющийся элемент показывает ошибку на странице'''
+        list_ = await _create_list('item')
+        response = await _form_post(
+            self.async_client, f'/lists/{list_.id}/', 'text', 'item'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'already')
+
+    async def test_stream_mode_sends_all_items(self):
+        '''тест: потоковый режим отдает все элементы'''
+        list_ = await _create_list('item 0')
+        response = await self.async_client.get(f'/lists/{list_.id}/?stream=1')
+        self.assertTrue(response.streaming)
+        page = b''.join(response.streaming_content).decode()
+        self.assertIn('1: item 0', page)
+
+    @override_settings(LIST_STREAM_SPOOL_SIZE=16, LIST_STREAM_CHUNK_SIZE=2)
+    async def test_export_spools_large_list_through_temporary_file(self):
+        '''тест: выгрузка больше LIST_STREAM_SPOOL_SIZE проходит через
+        временный файл целиком и без искажений'''
+        list_ = await _create_list('элемент 0')
+        await sync_to_async(Item.objects.bulk_create)(
+            [Item(list=list_, text=f'элемент {i}') for i in range(1, 50)]
+        )
+        response = await self.async_client.get(f'/lists/{list_.id}/export/')
+        self.assertTrue(response.streaming)
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 50)
+        self.assertEqual(lines[-1], '50: элемент 49')
+
+    async def test_new_list_redirects_to_new_list(self):
+        '''тест: новый список создается с переадресацией на него'''
+        response = await _form_post(self.async_client, '/lists/new', 'text', 'A')
+        list_ = await _first_list()
+        self.assertRedirects(
+            response, f'/lists/{list_.id}/', fetch_redirect_response=False
+        )
+
+    async def test_new_list_invalid_input_renders_home_template(self):
+        '''тест: недопустимый ввод отображает домашний шаблон'''
+        response = await _form_post(self.async_client, '/lists/new', 'text', '')
+        self.assertTemplateUsed(response, 'home.html')
+
+    async def test_send_login_email_queues_mail(self):
+        '''тест: письмо для входа ставится в очередь'''
+        response = await _form_post(
+            self.async_client, '/accounts/send_login_email/',
+            'email', 'klim@example.com',
+        )
+        self.assertRedirects(response, '/', fetch_redirect_response=False)
+        email = await sync_to_async(OutboxEmail.objects.get)()
+        self.assertEqual(email.to, 'klim@example.com')
+
+
+def _form_post(client, url, field, value):
+    '''вспомогательная функция: POST формы (application/x-www-form-urlencoded)'''
+    return client.post(
+        url, urlencode({field: value}),
+        content_type='application/x-www-form-urlencoded',
+    )
+
+
+async def _create_list(text):
+    '''вспомогательная функция: создать список с элементом'''
+    return await sync_to_async(List.create_new)(first_item_text=text)
+
+
+async def _first_list():
+    '''вспомогательная функция: единственный список в базе'''
+    return await sync_to_async(List.objects.get)()
+
+
+async def _item_texts(list_):
+    '''вспомогательная функция: тексты элементов списка'''
+    return await sync_to_async(
+        lambda: list(Item.objects.filter(list=list_).values_list('text', flat=True))
+    )()
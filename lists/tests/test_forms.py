@@ -1,11 +1,15 @@
 from unittest import TestCase as UnitTestCase
 from unittest.mock import patch, Mock
-from django.test import TestCase
+import threading
+from itertools import count
+from django.db import IntegrityError, connection
+from django.test import TestCase, TransactionTestCase
 from lists.forms import (
-    DUPLICATE_ITEM_ERROR, EMPTY_ITEM_ERROR,
+    DUPLICATE_ITEM_ERROR, EMPTY_ITEM_ERROR, HASH_COLLISION_RETRIES,
     ExistingListItemForm, ItemForm, NewListForm
 )
 from lists.models import Item, List
+from superlists.test_databases import FileDatabaseMixin
 
 
 class ItemFormTest(TestCase):
@@ -59,6 +63,116 @@ class ExistingListItemFormTest(TestCase):
         new_item = form.save()
         self.assertEqual(new_item, Item.objects.first())
 
+    def test_deferred_unique_check_reports_duplicate_on_save(self):
+        '''тест: отложенная проверка уникальности сообщает о повторе при сохранении'''
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='no twins!')
+        form = ExistingListItemForm(
+            for_list=list_, data={'text': 'no twins!'}, check_unique=False
+        )
+        self.assertTrue(form.is_valid())
+        self.assertIsNone(form.save())
+        self.assertEqual(form.errors['text'], [DUPLICATE_ITEM_ERROR])
+        self.assertEqual(Item.objects.count(), 1)
+
+    @patch('lists.models.text_hash', return_value=42)
+    def test_save_gives_next_ordinal_to_text_with_same_hash(self, mock_text_hash):
+        '''тест: текст с уже занятым хэшем сохраняется со следующим
+        номером, а повтор текста по-прежнему дает ошибку'''
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='first')
+        form = ExistingListItemForm(
+            for_list=list_, data={'text': 'second'}, check_unique=False
+        )
+        self.assertTrue(form.is_valid())
+        self.assertEqual(form.save().text_hash_ordinal, 1)
+        form = ExistingListItemForm(
+            for_list=list_, data={'text': 'first'}, check_unique=False
+        )
+        self.assertTrue(form.is_valid())
+        self.assertIsNone(form.save())
+        self.assertEqual(form.errors['text'], [DUPLICATE_ITEM_ERROR])
+        self.assertEqual(
+            list(list_.item_set.values_list('text', 'text_hash_ordinal')),
+            [('first', 0), ('second', 1)],
+        )
+
+    @patch('lists.forms.write_queue.submit', side_effect=IntegrityError('FOREIGN KEY'))
+    def test_save_reraises_integrity_error_without_hash_collision(self, mock_submit):
+        '''тест: IntegrityError без строк с тем же хэшем поднимается
+        дальше, без повторов и без ошибки повтора'''
+        list_ = List.objects.create()
+        form = ExistingListItemForm(
+            for_list=list_, data={'text': 'foo'}, check_unique=False
+        )
+        self.assertTrue(form.is_valid())
+        with self.assertRaises(IntegrityError):
+            form.save()
+        self.assertEqual(mock_submit.call_count, 1)
+        self.assertNotIn('text', form.errors)
+
+    @patch('lists.forms.Item.next_hash_ordinal', side_effect=count(1))
+    def test_save_gives_up_after_hash_collision_retries(self, mock_next_hash_ordinal):
+        '''тест: число повторных вставок при совпадении хэшей ограничено'''
+        list_ = List.objects.create()
+        form = ExistingListItemForm(
+            for_list=list_, data={'text': 'foo'}, check_unique=False
+        )
+        self.assertTrue(form.is_valid())
+        with patch('lists.forms.write_queue.submit', side_effect=IntegrityError) as submit:
+            with self.assertRaises(IntegrityError):
+                form.save()
+        self.assertEqual(submit.call_count, HASH_COLLISION_RETRIES + 1)
+
+    def test_deferred_unique_check_does_not_query_before_insert(self):
+        '''тест: отложенная проверка уникальности не делает SELECT перед вставкой'''
+        list_ = List.objects.create()
+        form = ExistingListItemForm(
+            for_list=list_, data={'text': 'foo'}, check_unique=False
+        )
+        with self.assertNumQueries(0):
+            self.assertTrue(form.is_valid())
+
+
+class ConcurrentDuplicateItemTest(FileDatabaseMixin, TransactionTestCase):
+    '''стресс-тест одновременной отправки одного и того же элемента'''
+
+    THREADS = 8
+
+    def test_concurrent_duplicates_save_one_row_and_report_errors(self):
+        '''тест: из одновременных повторов сохраняется одна строка,
+        остальные получают понятную ошибку'''
+        list_ = List.objects.create()
+        barrier = threading.Barrier(self.THREADS)
+        results = []
+
+        def add_item():
+            try:
+                form = ExistingListItemForm(
+                    for_list=List.objects.get(id=list_.id),
+                    data={'text': 'same item'}, check_unique=False,
+                )
+                form.is_valid()
+                barrier.wait()
+                item = form.save()
+                results.append(form.errors.get('text') if item is None else 'saved')
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=add_item) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(Item.objects.filter(list=list_).count(), 1)
+        self.assertEqual(results.count('saved'), 1)
+        self.assertEqual(
+            [r for r in results if r != 'saved'],
+            [[DUPLICATE_ITEM_ERROR]] * (self.THREADS - 1)
+        )
+
+
 class NewListFormTest(UnitTestCase):
     '''тест форм для нового списка'''
 
@@ -0,0 +1,88 @@
+import json
+import os
+import tempfile
+from io import StringIO
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from lists.models import Item, List
+
+
+User = get_user_model()
+
+
+class ImportListsCommandTest(TestCase):
+    '''тест команды импорта списков'''
+
+    def write_input(self, content, suffix):
+        '''записать входной файл'''
+        fd, path = tempfile.mkstemp(suffix=suffix)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(content)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def import_rows(self, rows, **options):
+        '''импортировать строки в формате JSONL'''
+        path = self.write_input(
+            ''.join(json.dumps(row) + '\n' for row in rows), '.jsonl'
+        )
+        out = StringIO()
+        call_command('import_lists', path, stdout=out, **options)
+        return out.getvalue()
+
+    def test_creates_lists_and_items_from_jsonl(self):
+        '''тест: создает списки и элементы из JSONL'''
+        self.import_rows([
+            {'list': 'a', 'text': 'first'},
+            {'list': 'a', 'text': 'second'},
+            {'list': 'b', 'text': 'other'},
+        ])
+        self.assertEqual(
+            sorted(List.objects.values_list('name', flat=True)), ['first', 'other']
+        )
+        list_a = List.objects.get(name='first')
+        self.assertEqual(
+            [item.text for item in list_a.item_set.all()], ['first', 'second']
+        )
+
+    def test_keeps_list_across_batches(self):
+        '''тест: строки одного списка попадают в него и в разных пакетах'''
+        self.import_rows(
+            [{'list': 'a', 'text': f'item {i}'} for i in range(5)], batch_size=2
+        )
+        self.assertEqual(List.objects.count(), 1)
+        self.assertEqual(Item.objects.count(), 5)
+
+    def test_skips_duplicate_and_empty_rows(self):
+        '''тест: пропускает повторяющиеся и пустые строки'''
+        self.import_rows([
+            {'list': 'a', 'text': 'same'},
+            {'list': 'a', 'text': 'same'},
+            {'list': 'a', 'text': ''},
+            {'list': 'a', 'text': 'same'},
+        ], batch_size=2)
+        self.assertEqual(Item.objects.count(), 1)
+
+    def test_sets_owner(self):
+        '''тест: устанавливает владельца списка'''
+        self.import_rows([{'list': 'a', 'text': 'item', 'owner': 'a@b.com'}])
+        self.assertEqual(List.objects.get().owner, User.objects.get(email='a@b.com'))
+
+    def test_imports_csv(self):
+        '''тест: импортирует CSV'''
+        path = self.write_input('list,text,owner\na,first,\na,second,\n', '.csv')
+        call_command('import_lists', path, stdout=StringIO())
+        self.assertEqual(List.objects.get().item_set.count(), 2)
+
+    def test_appends_after_existing_lists(self):
+        '''тест: новые списки не пересекаются с существующими'''
+        existing = List.create_new(first_item_text='existing')
+        self.import_rows([{'list': 'a', 'text': 'imported'}])
+        self.assertEqual(existing.item_set.count(), 1)
+        self.assertEqual(List.objects.count(), 2)
+
+    def test_reports_rows_per_second(self):
+        '''тест: выводит число строк в секунду'''
+        output = self.import_rows([{'list': 'a', 'text': 'item'}])
+        self.assertIn('rows/s', output)
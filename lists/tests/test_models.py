@@ -1,4 +1,5 @@
-from lists.models import Item, List
+from unittest.mock import patch
+from lists.models import Item, List, text_hash
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
@@ -33,6 +34,26 @@ class ListAndItemModelsTest(TestCase):
             item = Item(list=list_, text='foo')
             item.full_clean()
 
+    def test_item_stores_hash_of_text(self):
+        '''тест: элемент хранит хэш текста, в том числе после bulk_create'''
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='foo')
+        Item.objects.bulk_create([Item(list=list_, text='bar')])
+        self.assertEqual(
+            sorted(Item.objects.values_list('text_hash', flat=True)),
+            sorted([text_hash('foo'), text_hash('bar')]),
+        )
+
+    @patch('lists.models.text_hash', return_value=42)
+    def test_different_texts_with_same_hash_are_valid(self, mock_text_hash):
+        '''тест: разные тексты с одинаковым хэшем допустимы,
+        а повтор текста - нет'''
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='foo')
+        Item(list=list_, text='bar').full_clean() # не должен поднять исключение
+        with self.assertRaises(ValidationError):
+            Item(list=list_, text='foo').full_clean()
+
     def test_CAN_save_same_item_to_different_lists(self):
         '''тест: МОЖЕТ сохранить тот же элемент в разные списки'''
         list1 = List.objects.create()
@@ -109,4 +130,23 @@ class ListModelTest(TestCase):
         list_ = List.objects.create()
         first_item = Item.objects.create(list=list_, text='first item')
         Item.objects.create(list=list_, text='second item')
-        self.assertEqual(list_.name, first_item.text)
\ No newline at end of file
+        self.assertEqual(list_.name, first_item.text)
+
+    def test_create_new_stores_list_name(self):
+        '''тест: create_new сохраняет имя списка в базе данных'''
+        List.create_new(first_item_text='new item text')
+        self.assertEqual(List.objects.values_list('name', flat=True).get(), 'new item text')
+
+    def test_list_name_does_not_query_items(self):
+        '''тест: чтение имени списка не обращается к элементам'''
+        List.create_new(first_item_text='first item')
+        list_ = List.objects.first()
+        with self.assertNumQueries(0):
+            self.assertEqual(list_.name, 'first item')
+
+    def test_saving_item_increments_list_version(self):
+        '''тест: сохранение элемента увеличивает версию списка'''
+        list_ = List.create_new(first_item_text='first')
+        Item.objects.create(list=list_, text='second')
+        list_.refresh_from_db()
+        self.assertEqual(list_.version, 2)
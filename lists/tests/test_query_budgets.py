@@ -0,0 +1,126 @@
+import json
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import URLPattern, URLResolver, get_resolver
+from lists.models import Item, List
+from superlists.query_budgets import QUERY_BUDGETS, QueryBudgetMixin
+
+
+User = get_user_model()
+
+
+class QueryBudgetsTest(TestCase):
+    '''тест таблицы бюджетов запросов'''
+
+    def test_every_url_name_has_a_budget(self):
+        '''тест: у каждого именованного url есть бюджет запросов'''
+        names = set(_url_names(get_resolver().url_patterns))
+        self.assertEqual(names - set(QUERY_BUDGETS), set())
+
+
+class ListsQueryBudgetTest(QueryBudgetMixin, TestCase):
+    '''тест бюджетов запросов страниц списков'''
+
+    def owner_with_lists(self, size):
+        '''вспомогательная функция: вошедший владелец size списков
+        по size элементов; вернуть его последний список'''
+        owner = User.objects.create(email=f'owner{size}@example.com')
+        for i in range(size):
+            list_ = List.create_new(first_item_text=f'{size}-{i} item 0', owner=owner)
+            Item.objects.bulk_create(
+                Item(list=list_, text=f'item {n}') for n in range(1, size)
+            )
+        self.client.force_login(owner)
+        self.client.get('/')  # получаем CSRF-cookie
+        return list_
+
+    def test_home(self):
+        '''тест: домашняя страница'''
+        def make_request(size):
+            self.owner_with_lists(size)
+            return lambda: self.client.get('/')
+        self.assertQueryBudget('home', make_request)
+
+    def test_view_list_GET(self):
+        '''тест: страница списка'''
+        def make_request(size):
+            list_ = self.owner_with_lists(size)
+            return lambda: self.client.get(f'/lists/{list_.id}/')
+        self.assertQueryBudget('view_list', make_request)
+
+    def test_view_list_POST(self):
+        '''тест: добавление элемента в список'''
+        def make_request(size):
+            list_ = self.owner_with_lists(size)
+            return lambda: self.client.post(
+                f'/lists/{list_.id}/', data={'text': 'new item'}
+            )
+        self.assertQueryBudget('view_list', make_request)
+
+    def test_list_items(self):
+        '''тест: фрагмент таблицы со следующей страницей'''
+        def make_request(size):
+            list_ = self.owner_with_lists(size)
+            after = list_.item_set.first().id
+            return lambda: self.client.get(f'/lists/{list_.id}/items/?after={after}')
+        self.assertQueryBudget('list_items', make_request)
+
+    def test_export_list(self):
+        '''тест: выгрузка списка'''
+        def make_request(size):
+            list_ = self.owner_with_lists(size)
+            return lambda: b''.join(
+                self.client.get(f'/lists/{list_.id}/export/').streaming_content
+            )
+        self.assertQueryBudget('export_list', make_request)
+
+    def test_new_list(self):
+        '''тест: новый список'''
+        def make_request(size):
+            self.owner_with_lists(size)
+            return lambda: self.client.post('/lists/new', data={'text': 'new list'})
+        self.assertQueryBudget('new_list', make_request)
+
+    def test_my_lists(self):
+        '''тест: "Мои списки"'''
+        def make_request(size):
+            self.owner_with_lists(size)
+            return lambda: self.client.get(f'/lists/users/owner{size}@example.com/')
+        self.assertQueryBudget('my_lists', make_request)
+
+    def test_api_new_list(self):
+        '''тест: API создания списка'''
+        def make_request(size):
+            self.owner_with_lists(size)
+            return lambda: self.client.post(
+                '/lists/api/lists/', data=json.dumps({'text': 'new list'}),
+                content_type='application/json',
+            )
+        self.assertQueryBudget('api_new_list', make_request)
+
+    def test_api_list_items_GET(self):
+        '''тест: API чтения элементов списка'''
+        def make_request(size):
+            list_ = self.owner_with_lists(size)
+            return lambda: self.client.get(f'/lists/api/lists/{list_.id}/items/')
+        self.assertQueryBudget('api_list_items', make_request)
+
+    def test_api_list_items_POST(self):
+        '''тест: API добавления элементов пакетом размера size'''
+        def make_request(size):
+            list_ = self.owner_with_lists(size)
+            texts = [f'new item {n}' for n in range(size)]
+            return lambda: self.client.post(
+                f'/lists/api/lists/{list_.id}/items/',
+                data=json.dumps({'items': texts}), content_type='application/json',
+            )
+        self.assertQueryBudget('api_list_items', make_request)
+
+
+def _url_names(patterns):
+    '''имена всех url, включая вложенные через include'''
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            yield from _url_names(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            yield pattern.name
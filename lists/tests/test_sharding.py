@@ -0,0 +1,137 @@
+import json
+from io import StringIO
+from unittest.mock import patch
+from django.core.cache import caches
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from accounts.models import User
+from lists.forms import DUPLICATE_ITEM_ERROR
+from lists.models import Item, List, ListShard
+from lists.sharding import shard_for_list
+from superlists.test_databases import ExtraDatabasesMixin
+
+SHARDS = ['default', 'test_shard1', 'test_shard2']
+
+
+@override_settings(LIST_SHARDS=SHARDS)
+class ShardingTest(ExtraDatabasesMixin, TransactionTestCase):
+    '''тест шардирования списков: три базы SQLite'''
+
+    extra_databases = ('test_shard1', 'test_shard2')
+
+    def setUp(self):
+        '''установка: кэш таблиц пуст'''
+        caches['lists'].clear()
+
+    def create_list(self, shard, text, owner=None):
+        '''вспомогательная функция: новый список на шарде shard'''
+        with patch('lists.sharding.random.choice', return_value=shard):
+            return List.create_new(first_item_text=text, owner=owner)
+
+    def test_new_lists_get_unique_ids_across_shards(self):
+        '''тест: новые списки на разных шардах получают разные id'''
+        first = self.create_list('test_shard1', 'first')
+        second = self.create_list('test_shard2', 'second')
+        self.assertNotEqual(first.id, second.id)
+        self.assertEqual(shard_for_list(first.id), 'test_shard1')
+        self.assertEqual(shard_for_list(second.id), 'test_shard2')
+        self.assertEqual(Item.objects.using('test_shard1').get().text, 'first')
+        self.assertFalse(List.objects.using('default').exists())
+
+    def test_list_page_reads_and_writes_list_shard(self):
+        '''тест: страница списка читает и дописывает его шард'''
+        list_ = self.create_list('test_shard2', 'first')
+        self.client.post(f'/lists/{list_.id}/', data={'text': 'second'})
+        response = self.client.get(f'/lists/{list_.id}/')
+        self.assertContains(response, 'first')
+        self.assertContains(response, 'second')
+        self.assertEqual(
+            list(Item.objects.using('test_shard2').values_list('text', flat=True)),
+            ['first', 'second'],
+        )
+        self.assertEqual(List.objects.using('test_shard2').get().version, 2)
+
+    def test_duplicate_item_error_on_shard(self):
+        '''тест: повтор элемента на шарде дает обычную ошибку'''
+        list_ = self.create_list('test_shard1', 'first')
+        response = self.client.post(f'/lists/{list_.id}/', data={'text': 'first'})
+        self.assertContains(response, DUPLICATE_ITEM_ERROR.replace("'", '&#x27;'))
+        self.assertEqual(Item.objects.using('test_shard1').count(), 1)
+
+    def test_api_adds_items_to_list_shard(self):
+        '''тест: пакет элементов через API пишется в шард списка'''
+        list_ = self.create_list('test_shard2', 'first')
+        response = self.client.post(
+            f'/lists/api/lists/{list_.id}/items/',
+            data=json.dumps({'items': ['second', 'third']}),
+            content_type='application/json',
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(
+            list(Item.objects.using('test_shard2').values_list('text', flat=True)),
+            ['first', 'second', 'third'],
+        )
+        self.assertFalse(Item.objects.using('default').exists())
+        self.assertEqual(List.objects.using('test_shard2').get().version, 2)
+
+    def test_my_lists_merges_all_shards(self):
+        '''тест: "Мои списки" собирают списки владельца со всех шардов по id'''
+        owner = User.objects.create(email='a@b.com')
+        for number, shard in enumerate(SHARDS * 2):
+            self.create_list(shard, f'list {number}', owner=owner)
+        self.create_list('test_shard1', 'not mine')
+        with self.settings(MY_LISTS_PAGE_SIZE=4):
+            response = self.client.get('/lists/users/a@b.com/')
+            names = [list_.name for list_ in response.context['lists']]
+            self.assertEqual(names, ['list 0', 'list 1', 'list 2', 'list 3'])
+            response = self.client.get(
+                f"/lists/users/a@b.com/?after={response.context['next_cursor']}"
+            )
+        self.assertEqual(
+            [list_.name for list_ in response.context['lists']], ['list 4', 'list 5']
+        )
+
+    def test_rebalance_moves_list_with_items(self):
+        '''тест: перенос списка вместе с элементами в прежнем порядке'''
+        owner = User.objects.create(email='a@b.com')
+        list_ = self.create_list('test_shard1', 'item 1', owner=owner)
+        for text in ('item 2', 'item 3'):
+            Item.objects.using('test_shard1').create(list=list_, text=text)
+
+        call_command(
+            'rebalance_lists', list_id=list_.id, target='test_shard2', stdout=StringIO()
+        )
+
+        self.assertEqual(shard_for_list(list_.id), 'test_shard2')
+        self.assertFalse(List.objects.using('test_shard1').exists())
+        self.assertFalse(Item.objects.using('test_shard1').exists())
+        moved = List.objects.using('test_shard2').get(id=list_.id)
+        self.assertEqual(moved.owner_id, 'a@b.com')
+        self.assertEqual(moved.version, list_.version + 1)
+        self.assertEqual(
+            list(moved.item_set.values_list('text', flat=True)),
+            ['item 1', 'item 2', 'item 3'],
+        )
+        response = self.client.get(f'/lists/{list_.id}/')
+        self.assertContains(response, 'item 3')
+
+    def test_rebalance_evens_out_shards(self):
+        '''тест: без --list выравнивает число списков по шардам'''
+        for number in range(6):
+            self.create_list('test_shard1', f'list {number}')
+        call_command('rebalance_lists', stdout=StringIO())
+        for shard in SHARDS:
+            self.assertEqual(List.objects.using(shard).count(), 2)
+            self.assertEqual(ListShard.objects.filter(shard=shard).count(), 2)
+
+    @override_settings(LIST_SHARDS=['default'])
+    def test_register_adds_existing_lists_to_directory(self):
+        '''тест: --register записывает в каталог списки основной базы,
+        после чего новые id не совпадают с ними'''
+        old = List.create_new(first_item_text='old')
+        call_command('rebalance_lists', register=True, stdout=StringIO())
+        self.assertEqual(ListShard.objects.get().id, old.id)
+        with self.settings(LIST_SHARDS=SHARDS):
+            self.assertEqual(shard_for_list(old.id), 'default')
+            new = self.create_list('test_shard1', 'new')
+        self.assertGreater(new.id, old.id)
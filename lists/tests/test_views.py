@@ -1,6 +1,17 @@
-from django.test import TestCase
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import CommandError, call_command
+from django.utils import timezone
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils.html import escape
+from django.utils.http import http_date
 from django.contrib.auth import get_user_model
 from lists.models import Item, List
 from lists.forms import (
@@ -11,6 +22,7 @@ from unittest import TestCase as UnitTestCase, skip
 from unittest.mock import patch, Mock
 from django.http import HttpRequest
 from lists.views import new_list
+from lists.table_cache import get_stats
 
 
 
@@ -33,6 +45,10 @@ class HomePageTest(TestCase):
 class ListViewTest(TestCase):
     '''тест: представления списка'''
 
+    def setUp(self):
+        '''установка'''
+        caches['lists'].clear()
+
     def post_invalid_input(self):
         """вспомогательная функция: отправляет недопустимый ввод"""
         list_ = List.objects.create()
@@ -142,6 +158,260 @@ class ListViewTest(TestCase):
         self.assertIsInstance(response.context["form"], ExistingListItemForm)
         self.assertContains(response, 'name="text"')
 
+    @override_settings(LIST_ITEMS_PAGE_SIZE=2)
+    def test_displays_only_first_page_of_items(self):
+        '''тест: отображается только первая страница элементов'''
+        list_ = List.objects.create()
+        items = [Item.objects.create(list=list_, text=f'item {i}') for i in range(3)]
+        response = self.client.get(f'/lists/{list_.id}/')
+        self.assertContains(response, '2: item 1')
+        self.assertNotContains(response, 'item 2')
+        self.assertContains(response, f'?after={items[1].id}')
+
+    @override_settings(LIST_ITEMS_PAGE_SIZE=2)
+    def test_item_numbers_continue_on_next_page(self):
+        '''тест: нумерация элементов продолжается на следующей странице'''
+        list_ = List.objects.create()
+        items = [Item.objects.create(list=list_, text=f'item {i}') for i in range(3)]
+        response = self.client.get(f'/lists/{list_.id}/?after={items[1].id}')
+        self.assertContains(response, '3: item 2')
+        self.assertNotContains(response, 'Load more')
+
+    def test_out_of_range_cursor_is_ignored(self):
+        '''тест: курсор и номер строки больше наибольшего id не учитываются'''
+        list_ = List.create_new(first_item_text='item')
+        huge = 2 ** 63
+        response = self.client.get(f'/lists/{list_.id}/?after={huge}&n={huge}')
+        self.assertContains(response, '1: item')
+
+    @override_settings(LIST_ITEMS_PAGE_SIZE=2)
+    def test_next_page_link_carries_row_number(self):
+        '''тест: ссылка на следующую страницу несет номер строки перед курсором'''
+        list_ = List.objects.create()
+        items = [Item.objects.create(list=list_, text=f'item {i}') for i in range(5)]
+        response = self.client.get(f'/lists/{list_.id}/?after={items[1].id}&n=2')
+        self.assertContains(response, f'?after={items[3].id}&n=4')
+
+    @override_settings(LIST_ITEMS_PAGE_SIZE=2)
+    def test_row_number_from_link_is_not_recounted(self):
+        '''тест: номер строки из ссылки используется без подсчета строк до курсора'''
+        list_ = List.objects.create()
+        items = [Item.objects.create(list=list_, text=f'item {i}') for i in range(3)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/lists/{list_.id}/?after={items[1].id}&n=2')
+        self.assertContains(response, '3: item 2')
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries))
+
+    @override_settings(LIST_ITEMS_PAGE_SIZE=2, LIST_STREAM_CHUNK_SIZE=2)
+    def test_streaming_mode_sends_all_items_in_chunks(self):
+        '''тест: потоковый режим отдает все элементы порциями'''
+        list_ = List.objects.create()
+        for i in range(5):
+            Item.objects.create(list=list_, text=f'item {i}')
+        response = self.client.get(f'/lists/{list_.id}/?stream=1')
+        self.assertTrue(response.streaming)
+        chunks = [chunk.decode() for chunk in response.streaming_content]
+        page = ''.join(chunks)
+        self.assertEqual(len(chunks), 5)
+        self.assertTrue(chunks[0].startswith('<html>'))
+        self.assertIn('1: item 0', page)
+        self.assertIn('5: item 4', page)
+        self.assertIn('name="text"', page)
+        self.assertNotIn('Load more', page)
+        self.assertTrue(page.rstrip().endswith('</html>'))
+
+
+class ConditionalGetTest(TestCase):
+    '''тест условных GET-запросов (ETag)'''
+
+    def setUp(self):
+        '''установка'''
+        caches['lists'].clear()
+
+    def test_list_page_has_etag_without_last_modified(self):
+        '''тест: у страницы списка есть ETag, но нет Last-Modified
+        (страница зависит от зрителя, а время изменения - нет)'''
+        list_ = List.create_new(first_item_text='item')
+        response = self.client.get(f'/lists/{list_.id}/')
+        self.assertTrue(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+
+    def test_if_modified_since_does_not_hide_login(self):
+        '''тест: If-Modified-Since без ETag не дает 304 после входа'''
+        list_ = List.create_new(first_item_text='item')
+        self.client.get(f'/lists/{list_.id}/')
+        self.client.force_login(User.objects.create(email='a@b.com'))
+        response = self.client.get(
+            f'/lists/{list_.id}/',
+            HTTP_IF_MODIFIED_SINCE=http_date(time.time() + 60),
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_unchanged_list_returns_304_with_one_query(self):
+        '''тест: для неизмененного списка возвращается 304 за один запрос'''
+        list_ = List.create_new(first_item_text='item')
+        self.client.get(f'/lists/{list_.id}/')  # получаем CSRF-cookie
+        etag = self.client.get(f'/lists/{list_.id}/')['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                f'/lists/{list_.id}/', HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_item_changes_list_etag(self):
+        '''тест: новый элемент меняет ETag списка'''
+        list_ = List.create_new(first_item_text='item')
+        etag = self.client.get(f'/lists/{list_.id}/')['ETag']
+        Item.objects.create(list=list_, text='another item')
+        response = self.client.get(f'/lists/{list_.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'another item')
+
+    def test_new_item_updates_list_modification_time(self):
+        '''тест: новый элемент обновляет время изменения списка'''
+        list_ = List.create_new(first_item_text='item')
+        List.objects.filter(id=list_.id).update(
+            updated_at=timezone.now() - timedelta(days=1)
+        )
+        before = List.objects.get(id=list_.id).updated_at
+        Item.objects.create(list=list_, text='another item')
+        self.assertGreater(List.objects.get(id=list_.id).updated_at, before)
+
+    def test_etag_depends_on_session(self):
+        '''тест: ETag зависит от сеанса пользователя'''
+        list_ = List.create_new(first_item_text='item')
+        etag = self.client.get(f'/lists/{list_.id}/')['ETag']
+        self.client.force_login(User.objects.create(email='a@b.com'))
+        response = self.client.get(f'/lists/{list_.id}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_unchanged_my_lists_returns_304_with_one_query(self):
+        '''тест: неизмененные "Мои списки" возвращают 304 за один запрос'''
+        owner = User.objects.create(email='a@b.com')
+        List.create_new(first_item_text='item', owner=owner)
+        self.client.get('/lists/users/a@b.com/')  # получаем CSRF-cookie
+        etag = self.client.get('/lists/users/a@b.com/')['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                '/lists/users/a@b.com/', HTTP_IF_NONE_MATCH=etag
+            )
+        self.assertEqual(response.status_code, 304)
+
+    def test_new_list_changes_my_lists_etag(self):
+        '''тест: новый список меняет ETag "Моих списков"'''
+        owner = User.objects.create(email='a@b.com')
+        List.create_new(first_item_text='item', owner=owner)
+        etag = self.client.get('/lists/users/a@b.com/')['ETag']
+        List.create_new(first_item_text='second list', owner=owner)
+        response = self.client.get('/lists/users/a@b.com/', HTTP_IF_NONE_MATCH=etag)
+        self.assertContains(response, 'second list')
+
+
+class ListTableCacheTest(TestCase):
+    '''тест кэша отрисованной таблицы списка'''
+
+    def setUp(self):
+        '''установка'''
+        caches['lists'].clear()
+
+    def test_repeated_get_does_not_query_items(self):
+        '''тест: повторный GET не запрашивает элементы списка'''
+        list_ = List.create_new(first_item_text='cached item')
+        self.client.get(f'/lists/{list_.id}/')
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/lists/{list_.id}/')
+        self.assertContains(response, '1: cached item')
+
+    def test_new_item_makes_cached_table_stale(self):
+        '''тест: новый элемент делает кэшированную таблицу устаревшей'''
+        list_ = List.create_new(first_item_text='first')
+        self.client.get(f'/lists/{list_.id}/')
+        self.client.post(f'/lists/{list_.id}/', data={'text': 'second'})
+        response = self.client.get(f'/lists/{list_.id}/')
+        self.assertContains(response, '2: second')
+
+    def test_counts_hits_and_misses(self):
+        '''тест: считаются попадания и промахи кэша'''
+        list_ = List.create_new(first_item_text='first')
+        self.client.get(f'/lists/{list_.id}/')
+        self.client.get(f'/lists/{list_.id}/')
+        self.client.get(f'/lists/{list_.id}/')
+        stats = get_stats()
+        self.assertEqual((stats['hits'], stats['misses']), (2, 1))
+        self.assertAlmostEqual(stats['hit_rate'], 2 / 3)
+
+    def test_stats_command_refuses_per_process_cache(self):
+        '''тест: команда статистики отказывается читать счетчики locmem'''
+        with self.assertRaisesRegex(CommandError, 'LIST_CACHE_BACKEND'):
+            call_command('list_cache_stats', stdout=StringIO())
+
+    def test_stats_command_reads_shared_cache(self):
+        '''тест: команда статистики показывает счетчики общего кэша'''
+        list_ = List.create_new(first_item_text='first')
+        with tempfile.TemporaryDirectory() as directory:
+            file_cache = {
+                'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': directory,
+            }
+            with self.settings(CACHES=dict(settings.CACHES, lists=file_cache)):
+                self.client.get(f'/lists/{list_.id}/')
+                self.client.get(f'/lists/{list_.id}/')
+                output = StringIO()
+                call_command('list_cache_stats', stdout=output)
+        self.assertEqual(
+            output.getvalue(), 'hits: 1  misses: 1  hit rate: 50.0%\n'
+        )
+
+
+class ExportListTest(TestCase):
+    '''тест выгрузки списка'''
+
+    def test_exports_numbered_items_as_text(self):
+        '''тест: выгружает пронумерованные элементы текстом'''
+        list_ = List.create_new(first_item_text='first')
+        Item.objects.create(list=list_, text='second')
+        response = self.client.get(f'/lists/{list_.id}/export/')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/plain; charset=utf-8')
+        self.assertEqual(
+            b''.join(response.streaming_content).decode(),
+            '1: first\n2: second\n'
+        )
+
+
+class ListItemsFragmentTest(TestCase):
+    '''тест фрагмента таблицы элементов списка'''
+
+    def setUp(self):
+        '''установка'''
+        caches['lists'].clear()
+
+    @override_settings(LIST_ITEMS_PAGE_SIZE=2)
+    def test_returns_next_page_rows_with_numbers(self):
+        '''тест: возвращает строки следующей страницы с правильными номерами'''
+        list_ = List.objects.create()
+        items = [Item.objects.create(list=list_, text=f'item {i}') for i in range(5)]
+        response = self.client.get(f'/lists/{list_.id}/items/?after={items[1].id}')
+        self.assertContains(response, '3: item 2')
+        self.assertContains(response, '4: item 3')
+        self.assertNotContains(response, 'item 4')
+        self.assertEqual(response['X-Next-Cursor'], str(items[3].id))
+        self.assertEqual(response['X-Next-Offset'], '4')
+
+    def test_last_page_has_no_next_cursor(self):
+        '''тест: у последней страницы нет следующего курсора'''
+        list_ = List.objects.create()
+        Item.objects.create(list=list_, text='only item')
+        response = self.client.get(f'/lists/{list_.id}/items/')
+        self.assertContains(response, '1: only item')
+        self.assertFalse(response.has_header('X-Next-Cursor'))
+
+    def test_out_of_range_cursor_is_ignored(self):
+        '''тест: курсор больше наибольшего id не учитывается'''
+        list_ = List.create_new(first_item_text='item')
+        response = self.client.get(f'/lists/{list_.id}/items/?after={2 ** 63}')
+        self.assertContains(response, '1: item')
+
 
 class NewListViewIntegratedTest(TestCase):
     '''тест нового списка'''
@@ -206,6 +476,61 @@ class MyListsTest(TestCase):
         response = self.client.get('/lists/users/a@b.com/')
         self.assertEqual(response.context['owner'], correct_user)
 
+    def test_displays_list_names(self):
+        '''тест: отображаются имена списков владельца'''
+        owner = User.objects.create(email='a@b.com')
+        list_ = List.create_new(first_item_text='Купить молоко', owner=owner)
+        response = self.client.get('/lists/users/a@b.com/')
+        self.assertContains(response, 'Купить молоко')
+        self.assertContains(response, list_.get_absolute_url())
+
+    def test_number_of_queries_does_not_depend_on_number_of_lists(self):
+        '''тест: число запросов не зависит от количества списков'''
+        owner = User.objects.create(email='a@b.com')
+        for list_count in (1, 20):
+            for i in range(list_count):
+                List.create_new(first_item_text=f'item {list_count}-{i}', owner=owner)
+            # проверка условного GET, владелец, страница списков
+            with self.assertNumQueries(3):
+                self.client.get('/lists/users/a@b.com/')
+
+    def test_displays_item_counts(self):
+        '''тест: отображается количество элементов в списках'''
+        owner = User.objects.create(email='a@b.com')
+        list_ = List.create_new(first_item_text='first', owner=owner)
+        Item.objects.create(list=list_, text='second')
+        response = self.client.get('/lists/users/a@b.com/')
+        self.assertEqual(response.context['lists'][0].item_count, 2)
+
+    @override_settings(MY_LISTS_PAGE_SIZE=2)
+    def test_lists_are_paginated_by_cursor(self):
+        '''тест: списки выводятся постранично по курсору'''
+        owner = User.objects.create(email='a@b.com')
+        lists = [
+            List.create_new(first_item_text=f'list {i}', owner=owner)
+            for i in range(5)
+        ]
+        response = self.client.get('/lists/users/a@b.com/')
+        self.assertEqual(list(response.context['lists']), lists[:2])
+        self.assertEqual(response.context['next_cursor'], lists[1].id)
+
+        response = self.client.get(
+            f'/lists/users/a@b.com/?after={lists[3].id}'
+        )
+        self.assertEqual(list(response.context['lists']), lists[4:])
+        self.assertIsNone(response.context['next_cursor'])
+
+    @override_settings(MY_LISTS_PAGE_SIZE=2)
+    def test_page_cursor_link_is_shown_when_there_are_more_lists(self):
+        '''тест: ссылка на следующую страницу показывается, если есть еще списки'''
+        owner = User.objects.create(email='a@b.com')
+        lists = [
+            List.create_new(first_item_text=f'list {i}', owner=owner)
+            for i in range(3)
+        ]
+        response = self.client.get('/lists/users/a@b.com/')
+        self.assertContains(response, f'?after={lists[1].id}')
+
 
 @patch('lists.views.NewListForm')
 class NewListViewUnitTest(UnitTestCase):
@@ -0,0 +1,101 @@
+import threading
+from unittest.mock import patch
+from django.db import IntegrityError, connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from lists import write_queue
+from lists.forms import DUPLICATE_ITEM_ERROR, ExistingListItemForm
+from lists.models import Item, List
+from superlists.test_databases import FileDatabaseMixin
+from lists.write_queue import WriteQueue
+
+
+class WriteQueueTest(FileDatabaseMixin, TransactionTestCase):
+    '''тест групповой фиксации записей'''
+
+    def submit_concurrently(self, queue, operations):
+        '''вспомогательная функция: выполнить записи из отдельных потоков;
+        вернуть результат или исключение каждой'''
+        outcomes = [None] * len(operations)
+
+        def worker(index, operation):
+            try:
+                outcomes[index] = queue.submit(operation)
+            except Exception as error:
+                outcomes[index] = error
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=worker, args=(index, operation))
+            for index, operation in enumerate(operations)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return outcomes
+
+    def test_commits_concurrent_writes_together(self):
+        '''тест: параллельные записи фиксируются одной транзакцией,
+        каждая получает свой результат'''
+        list_ = List.create_new(first_item_text='first')
+        queue = WriteQueue(window=5, size=3)
+        outcomes = self.submit_concurrently(queue, [
+            lambda text=text: Item.objects.create(list=list_, text=text)
+            for text in ('a', 'b', 'c')
+        ])
+        self.assertEqual(sorted(item.text for item in outcomes), ['a', 'b', 'c'])
+        self.assertEqual((queue.commits, queue.writes), (1, 3))
+        self.assertEqual(list_.item_set.count(), 4)
+
+    def test_error_goes_only_to_its_write(self):
+        '''тест: ошибка записи (повтор) достается только ее потоку,
+        остальные записи группы сохраняются'''
+        list_ = List.create_new(first_item_text='first')
+        queue = WriteQueue(window=5, size=3)
+        outcomes = self.submit_concurrently(queue, [
+            lambda text=text: Item.objects.create(list=list_, text=text)
+            for text in ('a', 'first', 'b')
+        ])
+        self.assertIsInstance(outcomes[1], IntegrityError)
+        self.assertEqual(outcomes[0].text, 'a')
+        self.assertEqual(outcomes[2].text, 'b')
+        self.assertEqual(queue.commits, 1)
+        self.assertEqual(
+            sorted(list_.item_set.values_list('text', flat=True)), ['a', 'b', 'first']
+        )
+
+    def test_single_write_waits_at_most_the_window(self):
+        '''тест: одиночная запись не ждет больше окна'''
+        queue = WriteQueue(window=0.01, size=10)
+        list_ = queue.submit(lambda: List.create_new(first_item_text='alone'))
+        self.assertEqual(list_.item_set.get().text, 'alone')
+        self.assertEqual(queue.commits, 1)
+
+    @override_settings(ITEM_WRITE_BATCHING=True)
+    def test_form_reports_duplicate_from_group(self):
+        '''тест: форма показывает ошибку повтора, полученную из группы'''
+        list_ = List.create_new(first_item_text='first')
+        form = ExistingListItemForm(
+            for_list=list_, data={'text': 'first'}, check_unique=False
+        )
+        self.assertTrue(form.is_valid())
+        self.assertIsNone(form.save())
+        self.assertEqual(form.errors['text'], [DUPLICATE_ITEM_ERROR])
+
+
+@patch('lists.write_queue.get_queue')
+class SubmitTest(TestCase):
+    '''тест выбора между группой и записью сразу'''
+
+    @override_settings(ITEM_WRITE_BATCHING=False)
+    def test_writes_directly_when_disabled(self, mock_get_queue):
+        '''тест: без ITEM_WRITE_BATCHING запись выполняется сразу'''
+        self.assertEqual(write_queue.submit(lambda: 42), 42)
+        self.assertFalse(mock_get_queue.called)
+
+    @override_settings(ITEM_WRITE_BATCHING=True)
+    def test_writes_directly_inside_transaction(self, mock_get_queue):
+        '''тест: внутри открытой транзакции запись выполняется сразу'''
+        self.assertEqual(write_queue.submit(lambda: 42), 42)
+        self.assertFalse(mock_get_queue.called)
@@ -1,9 +1,18 @@
 from django.contrib import admin
 from django.urls import path, include
-from lists import views
+from lists import api, views
+from superlists.db_threads import asgi_view
 
+# под ASGI (ASYNC_VIEWS) представления выполняются в пуле потоков
 urlpatterns = [
-    path('<int:list_id>/', views.view_list, name='view_list'),
-    path('new', views.new_list, name='new_list'),
-    path('users/<str:email>/', views.my_lists, name="my_lists"),
+    path('<int:list_id>/', asgi_view(views.view_list), name='view_list'),
+    path('<int:list_id>/items/', asgi_view(views.list_items), name='list_items'),
+    path('<int:list_id>/export/', asgi_view(views.export_list), name='export_list'),
+    path('new', asgi_view(views.new_list), name='new_list'),
+    path('users/<str:email>/', asgi_view(views.my_lists), name="my_lists"),
+    path('api/lists/', asgi_view(api.new_list), name='api_new_list'),
+    path(
+        'api/lists/<int:list_id>/items/', asgi_view(api.list_items),
+        name='api_list_items',
+    ),
 ]
@@ -1,31 +1,94 @@
+import hashlib
+import tempfile
+from itertools import islice
 from django.shortcuts import render, redirect
+from django.http import HttpResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
 from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
+from django.conf import settings
+from django.db.models import Count, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.urls import reverse
+from django.utils.safestring import mark_safe
+from django.views.decorators.http import condition
 from lists.forms import ItemForm, ExistingListItemForm, NewListForm
-from lists.models import Item, List
+from lists.models import MAX_ID, Item, List
+from lists.sharding import shard_for_list, shards
+from lists.table_cache import get_table_page
 
 
 User = get_user_model()
 
+# метка в list.html, на месте которой при потоковой отдаче выводятся строки
+ITEMS_MARKER = '<!-- items -->'
+# размер порции, которой читается временный файл потокового ответа под ASGI
+STREAM_READ_SIZE = 64 * 1024
+
 
 def home_page(request):
     """Домашняя страница"""
     return render(request, 'home.html', {'form': ItemForm()})
 
+def _get_list(request, list_id):
+    '''список по id: один индексный запрос на весь запрос (и запрос
+    к каталогу при шардировании), его используют и проверка условного
+    GET, и само представление'''
+    if not hasattr(request, '_list'):
+        request._list = List.objects.using(shard_for_list(list_id)).filter(
+            id=list_id
+        ).first()
+    if request._list is None:
+        raise List.DoesNotExist
+    return request._list
+
+def _list_etag(request, list_id):
+    '''ETag страницы списка'''
+    list_ = _get_list(request, list_id)
+    return f'{list_id}-{list_.version}-{_viewer_key(request)}'
+
+# Last-Modified не отдается: страница зависит и от зрителя
+# (_viewer_key), а If-Modified-Since без ETag этого не учел бы и после
+# входа или выхода вернул бы 304 для устаревшей страницы
+@condition(etag_func=_list_etag)
 def view_list(request, list_id):
     '''представление списка'''
-    list_ = List.objects.get(id=list_id)
+    list_ = _get_list(request, list_id)
 
     if request.method == "POST":
-        form = ExistingListItemForm(for_list=list_, data=request.POST)
-        if form.is_valid():
-            form.save()
+        form = ExistingListItemForm(
+            for_list=list_, data=request.POST, check_unique=False
+        )
+        if form.is_valid() and form.save() is not None:
             return redirect(list_)
     else:
         form = ExistingListItemForm(for_list=list_)
-    return render(request, 'list.html', {
-        'list': list_, "form": form,
-    })
+        if request.GET.get('stream'):
+            return _streaming_response(_stream_list_page(request, list_, form))
+    context = {'list': list_, "form": form}
+    context.update(_table_page(list_, _get_cursor(request), _get_offset(request)))
+    return render(request, 'list.html', context)
+
+def list_items(request, list_id):
+    '''фрагмент таблицы: следующая страница элементов списка'''
+    list_ = List.objects.using(shard_for_list(list_id)).get(id=list_id)
+    page = _table_page(list_, _get_cursor(request), _get_offset(request))
+    response = HttpResponse(page['items_html'])
+    if page['next_cursor']:
+        response['X-Next-Cursor'] = page['next_cursor']
+        response['X-Next-Offset'] = page['next_offset']
+    return response
+
+def export_list(request, list_id):
+    '''выгрузка списка в текстовом виде (потоком)'''
+    list_ = List.objects.using(shard_for_list(list_id)).get(id=list_id)
+    lines = (
+        f'{number}: {item.text}\n'
+        for number, item in enumerate(_iter_items(list_), start=1)
+    )
+    response = _streaming_response(lines, content_type='text/plain; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="list-{list_.id}.txt"'
+    return response
 
 def new_list(request):
     '''новый список'''
@@ -35,7 +98,171 @@ def new_list(request):
         return redirect(list_)
     return render(request, 'home.html', {'form': form})
 
+def _owner_lists_state(request, email):
+    '''время изменения и количество списков владельца одним запросом
+    (при шардировании - по запросу на шард)'''
+    if not hasattr(request, '_owner_lists_state'):
+        states = [
+            List.objects.using(shard).filter(owner_id=email).aggregate(
+                updated_at=Max('updated_at'), count=Count('id'),
+            )
+            for shard in shards()
+        ]
+        request._owner_lists_state = {
+            'updated_at': max(
+                (state['updated_at'] for state in states if state['updated_at']),
+                default=None,
+            ),
+            'count': sum(state['count'] for state in states),
+        }
+    return request._owner_lists_state
+
+def _my_lists_etag(request, email):
+    '''ETag страницы "Моих списков"'''
+    state = _owner_lists_state(request, email)
+    if state['updated_at'] is not None:
+        updated = state['updated_at'].timestamp()
+        return f"{updated}-{state['count']}-{_viewer_key(request)}"
+
+@condition(etag_func=_my_lists_etag)
 def my_lists(request, email):
     '''Списки пользователя'''
     owner = User.objects.get(email=email)
-    return render(request, 'my_lists.html', {'owner': owner})
\ No newline at end of file
+    after = _get_cursor(request)
+    page_size = settings.MY_LISTS_PAGE_SIZE
+    item_counts = Item.objects.filter(list=OuterRef('pk')).order_by().values(
+        'list'
+    ).annotate(count=Count('id')).values('count')
+    # страница с каждого шарда, затем общая страница по id
+    lists = sorted(
+        (
+            list_
+            for shard in shards()
+            for list_ in owner.list_set.using(shard).filter(id__gt=after).order_by(
+                'id'
+            ).only('id', 'name', 'owner').annotate(
+                item_count=Coalesce(Subquery(item_counts), Value(0))
+            )[:page_size + 1]
+        ),
+        key=lambda list_: list_.id,
+    )[:page_size + 1]
+    next_cursor = lists[page_size - 1].id if len(lists) > page_size else None
+    lists = lists[:page_size]
+    list_url = _list_url_builder()
+    for list_ in lists:
+        list_.url = list_url(list_.id)
+    return render(request, 'my_lists.html', {
+        'owner': owner, 'lists': lists, 'next_cursor': next_cursor,
+    })
+
+def _table_page(list_, after, offset=None):
+    '''отрисованные строки страницы таблицы (через кэш версий списка)'''
+    def render_page():
+        page = _item_page(list_, after, offset)
+        return {
+            'items_html': render_to_string('list_items.html', page),
+            'next_cursor': page['next_cursor'],
+            'next_offset': page['next_offset'],
+        }
+    page = get_table_page(list_, after, offset, render_page)
+    return {
+        'items_html': mark_safe(page['items_html']),
+        'next_cursor': page['next_cursor'],
+        'next_offset': page['next_offset'],
+    }
+
+def _item_page(list_, after, offset=None):
+    '''страница элементов списка после курсора и номер первой строки
+
+    Номер строк перед курсором приходит в ссылке (?n=) вместе с самим
+    курсором, поэтому строки до курсора не пересчитываются. Только для
+    ссылок без n (старые закладки) он считается запросом.
+    '''
+    page_size = settings.LIST_ITEMS_PAGE_SIZE
+    items = list(list_.item_set.filter(id__gt=after)[:page_size + 1])
+    next_cursor = items[page_size - 1].id if len(items) > page_size else None
+    if offset is None:
+        offset = list_.item_set.filter(id__lte=after).count() if after else 0
+    return {
+        'items': items[:page_size], 'offset': offset,
+        'next_cursor': next_cursor, 'next_offset': offset + page_size,
+    }
+
+def _stream_list_page(request, list_, form):
+    '''страница списка по частям: шапка, строки порциями, окончание'''
+    page = render_to_string('list.html', {
+        'list': list_, 'form': form, 'streaming': True,
+    }, request)
+    head, tail = page.split(ITEMS_MARKER, 1)
+    yield head
+    offset = 0
+    items = _iter_items(list_)
+    while True:
+        chunk = list(islice(items, settings.LIST_STREAM_CHUNK_SIZE))
+        if not chunk:
+            break
+        yield render_to_string('list_items.html', {'items': chunk, 'offset': offset})
+        offset += len(chunk)
+    yield tail
+
+def _streaming_response(content, **kwargs):
+    '''потоковый ответ. Django 3.2 под ASGI перебирает потоковый ответ
+    в цикле событий, где ORM недоступен, поэтому в этом режиме части
+    пишутся заранее, еще в потоке представления, во временный файл
+    (в памяти держится не больше LIST_STREAM_SPOOL_SIZE байт), а ответ
+    читает его порциями'''
+    if settings.ASYNC_VIEWS:
+        spool = tempfile.SpooledTemporaryFile(max_size=settings.LIST_STREAM_SPOOL_SIZE)
+        for part in content:
+            spool.write(part.encode())
+        spool.seek(0)
+        content = _read_spool(spool)
+    return StreamingHttpResponse(content, **kwargs)
+
+def _read_spool(spool):
+    '''части временного файла ответа; файл закрывается в конце'''
+    with spool:
+        while True:
+            chunk = spool.read(STREAM_READ_SIZE)
+            if not chunk:
+                return
+            yield chunk
+
+def _iter_items(list_):
+    '''элементы списка через курсор, без загрузки всех строк в память'''
+    return list_.item_set.all().iterator(chunk_size=settings.LIST_STREAM_CHUNK_SIZE)
+
+def _viewer_key(request):
+    '''то, от чего еще зависит страница, кроме данных списка:
+    сеанс (пользователь в шапке), CSRF-cookie, сообщения и параметры url'''
+    cookies = request.COOKIES
+    viewer = '|'.join([
+        cookies.get(settings.SESSION_COOKIE_NAME, ''),
+        cookies.get(settings.CSRF_COOKIE_NAME, ''),
+        cookies.get('messages', ''),
+        request.GET.urlencode(),
+    ])
+    return hashlib.md5(viewer.encode()).hexdigest()[:16]
+
+def _get_cursor(request):
+    '''получить курсор страницы (id последней показанной строки)'''
+    after = _get_number(request, 'after')
+    return 0 if after is None else after
+
+def _get_offset(request):
+    '''число строк перед курсором из ссылки (?n=); None, если его нет'''
+    return _get_number(request, 'n')
+
+def _get_number(request, name):
+    '''неотрицательное целое из параметра url; None, если параметра нет
+    или это не целое до MAX_ID'''
+    try:
+        number = max(int(request.GET[name]), 0)
+    except (KeyError, ValueError):
+        return None
+    return number if number <= MAX_ID else None
+
+def _list_url_builder():
+    '''построитель url списков: reverse вызывается один раз на страницу'''
+    prefix, suffix = reverse('view_list', args=[0]).rsplit('0', 1)
+    return lambda list_id: f'{prefix}{list_id}{suffix}'
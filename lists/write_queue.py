@@ -0,0 +1,118 @@
+'''Групповая фиксация записей элементов списков.
+
+SQLite допускает одного пишущего сразу, и каждая транзакция фиксируется
+отдельно, со своей записью на диск. Когда включено ITEM_WRITE_BATCHING,
+записи (новый элемент в view_list, новый список в new_list) из
+параллельных потоков процесса собираются в группу. Первый поток группы
+(ведущий) ждет до ITEM_WRITE_BATCH_WINDOW секунд, пока не наберется
+ITEM_WRITE_BATCH_SIZE записей, и выполняет всю группу одной транзакцией,
+каждую запись под своей точкой сохранения. Остальные потоки ждут и
+получают свой результат или свое исключение (например, IntegrityError
+повтора элемента), как если бы выполняли запись сами.
+
+Группы собираются из потоков одного процесса, поэтому нужен gunicorn
+с --threads. Внутри уже открытой транзакции запись выполняется сразу.
+'''
+import contextvars
+import threading
+from django.conf import settings
+from django.db import connection, transaction
+
+
+class _Write(object):
+    '''запись, ожидающая своей группы'''
+
+    def __init__(self, operation):
+        self.operation = operation
+        # контекст запроса, который поставил запись: ее запросы к базе
+        # попадают в его замеры (superlists.metrics, query_log)
+        self.context = contextvars.copy_context()
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class WriteQueue(object):
+    '''записи процесса, которые фиксируются группами'''
+
+    def __init__(self, window=None, size=None):
+        self.window = settings.ITEM_WRITE_BATCH_WINDOW if window is None else window
+        self.size = settings.ITEM_WRITE_BATCH_SIZE if size is None else size
+        self._condition = threading.Condition()
+        # группы выполняются по очереди; пока одна фиксируется,
+        # следующая набирает записи
+        self._commit_lock = threading.Lock()
+        self._pending = []
+        self.commits = self.writes = 0
+
+    def submit(self, operation):
+        '''выполнить operation() в транзакции группы и вернуть ее результат'''
+        write = _Write(operation)
+        with self._condition:
+            self._pending.append(write)
+            leader = len(self._pending) == 1
+            self._condition.notify_all()
+        if leader:
+            self._lead()
+        else:
+            write.done.wait()
+        if write.error is not None:
+            raise write.error
+        return write.result
+
+    def _lead(self):
+        '''собрать группу и выполнить ее'''
+        with self._condition:
+            self._condition.wait_for(
+                lambda: len(self._pending) >= self.size, self.window
+            )
+        with self._commit_lock:
+            with self._condition:
+                batch, self._pending = self._pending, []
+            self._run(batch)
+
+    def _run(self, batch):
+        '''выполнить группу одной транзакцией; ошибка записи откатывает
+        только ее точку сохранения, ошибка фиксации достается всем'''
+        try:
+            with transaction.atomic():
+                for write in batch:
+                    try:
+                        write.result = write.context.run(_savepoint, write.operation)
+                    except Exception as error:
+                        write.error = error
+        except Exception as error:
+            for write in batch:
+                if write.error is None:
+                    write.result, write.error = None, error
+        finally:
+            self.commits += 1
+            self.writes += len(batch)
+            for write in batch:
+                write.done.set()
+
+
+def _savepoint(operation):
+    with transaction.atomic():
+        return operation()
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue():
+    '''общая очередь записей процесса'''
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = WriteQueue()
+        return _queue
+
+
+def submit(operation):
+    '''выполнить запись: в группе, если включено ITEM_WRITE_BATCHING,
+    иначе (или внутри открытой транзакции) сразу'''
+    if not settings.ITEM_WRITE_BATCHING or connection.in_atomic_block:
+        return operation()
+    return get_queue().submit(operation)
@@ -0,0 +1,23 @@
+from django.apps import AppConfig
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+class SuperlistsConfig(AppConfig):
+    name = 'superlists'
+
+    def ready(self):
+        '''настроить соединения с базой данных: PRAGMA для SQLite,
+        замер запросов для метрик, журнал медленных запросов и
+        закрепление чтений за основной базой после записи'''
+        from superlists.db_router import install_write_recorder
+        from superlists.metrics import install_query_recorder
+        from superlists.query_log import install_query_logger
+        from superlists.sqlite import configure_sqlite
+        for install in (
+            configure_sqlite, install_query_recorder, install_query_logger,
+            install_write_recorder,
+        ):
+            connection_created.connect(install)
+            for connection in connections.all():
+                install(connection)
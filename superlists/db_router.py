@@ -0,0 +1,171 @@
+'''Чтение с реплик базы данных.
+
+ReplicaRouter (DATABASE_ROUTERS) отправляет чтения моделей из
+REPLICA_MODELS (списки, элементы, пользователи: view_list, my_lists,
+get_user) на реплики из DATABASE_REPLICAS, а все записи - в основную
+базу. Чтения идут на реплику только внутри HTTP-запроса
+(ReplicaMiddleware) и вне транзакций; команды manage.py и фоновые
+задачи всегда читают основную базу.
+
+После записи (INSERT, UPDATE или DELETE, которые видит обертка
+record_write) чтения пользователя на REPLICA_PIN_SECONDS закрепляются
+за основной базой (cookie), чтобы он сразу видел добавленный элемент.
+Небезопасные запросы (POST и т.п.) всегда читают основную базу.
+
+Реплика, которая отстала больше чем на REPLICA_MAX_LAG секунд или
+недоступна, не используется. Отставание - возраст отметки времени
+ReplicaHeartbeat на реплике (ее раз в секунду пишет в основную базу
+команда replica_heartbeat); проверяется не чаще раза в
+REPLICA_LAG_CHECK_INTERVAL секунд на процесс.
+'''
+import asyncio
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.utils import timezone
+from django.utils.decorators import sync_and_async_middleware
+
+PIN_COOKIE = 'pin_primary'
+
+# состояние текущего HTTP-запроса; переходит и в потоки sync_to_async
+_state = ContextVar('replica_state', default=None)
+
+
+class RequestState:
+    '''чтения текущего запроса закреплены за основной базой; была запись'''
+
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.wrote = False
+
+
+class ReplicaLag:
+    '''какие реплики не отстали (с кэшем результата проверки)'''
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked = {}  # псевдоним -> (время проверки, не отстала)
+
+    def fresh_replicas(self):
+        '''реплики, с которых сейчас можно читать'''
+        return [alias for alias in settings.DATABASE_REPLICAS if self.is_fresh(alias)]
+
+    def is_fresh(self, alias):
+        now = time.monotonic()
+        with self._lock:
+            checked = self._checked.get(alias)
+        if checked and now - checked[0] < settings.REPLICA_LAG_CHECK_INTERVAL:
+            return checked[1]
+        lag = self.lag(alias)
+        fresh = lag is not None and lag <= settings.REPLICA_MAX_LAG
+        with self._lock:
+            self._checked[alias] = (now, fresh)
+        return fresh
+
+    def lag(self, alias):
+        '''отставание реплики в секундах; None - неизвестно'''
+        from superlists.models import ReplicaHeartbeat
+        try:
+            written_at = ReplicaHeartbeat.objects.using(alias).values_list(
+                'written_at', flat=True
+            ).first()
+        except DatabaseError:
+            return None
+        if written_at is None:
+            return None
+        return (timezone.now() - written_at).total_seconds()
+
+    def clear(self):
+        with self._lock:
+            self._checked.clear()
+
+
+replica_lag = ReplicaLag()
+
+
+class ReplicaRouter:
+    '''чтения - с реплик, записи - в основную базу'''
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if (
+            state is None or state.pinned or not settings.DATABASE_REPLICAS
+            or model._meta.label_lower not in settings.REPLICA_MODELS
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return None
+        replicas = replica_lag.fresh_replicas()
+        return random.choice(replicas) if replicas else None
+
+    def db_for_write(self, model, **hints):
+        # Django спрашивает базу для записи и при присваивании связей,
+        # поэтому закрепление делает record_write по настоящим записям
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        '''реплики - копии основной базы, связи между ними допустимы'''
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+# начала запросов, которые изменяют данные (REPLAC - REPLACE)
+_WRITES = {'INSERT', 'UPDATE', 'DELETE', 'REPLAC'}
+
+
+def record_write(execute, sql, params, many, context):
+    '''обертка выполнения запросов (execute_wrapper): запись закрепляет
+    чтения запроса и пользователя за основной базой'''
+    state = _state.get()
+    if state is not None and not state.wrote and sql.lstrip()[:6].upper() in _WRITES:
+        state.pinned = state.wrote = True
+    return execute(sql, params, many, context)
+
+
+def install_write_recorder(connection, **kwargs):
+    '''подключить record_write к соединению с основной базой
+    (сигнал connection_created)'''
+    if connection.alias in settings.DATABASE_REPLICAS:
+        return
+    if record_write not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_write)
+
+
+@sync_and_async_middleware
+def ReplicaMiddleware(get_response):
+    '''включить чтение с реплик для запроса и закрепление после записи'''
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            token = _start(request)
+            try:
+                return _finish(await get_response(request))
+            finally:
+                _state.reset(token)
+    else:
+        def middleware(request):
+            token = _start(request)
+            try:
+                return _finish(get_response(request))
+            finally:
+                _state.reset(token)
+    return middleware
+
+
+def _start(request):
+    pinned = request.method not in ('GET', 'HEAD') or PIN_COOKIE in request.COOKIES
+    return _state.set(RequestState(pinned))
+
+
+def _finish(response):
+    '''после записи закрепить следующие чтения пользователя (cookie)'''
+    if _state.get().wrote and settings.DATABASE_REPLICAS:
+        response.set_cookie(
+            PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS,
+            httponly=True, samesite='Lax',
+        )
+    return response
@@ -0,0 +1,47 @@
+'''Представления под ASGI в пуле потоков.
+
+Django 3.2 под ASGI выполняет синхронные представления, как и
+sync_to_async по умолчанию (thread_sensitive=True), в одном общем потоке
+процесса; через этот же поток проходят сигнал request_started и
+синхронные части промежуточных слоев. Пока одно представление ждет
+заблокированную базу, ждут и все остальные запросы процесса.
+
+database_sync_to_async выполняет функцию в пуле потоков, а соединения
+с базой этого потока закрывает (close_old_connections) до и после
+вызова, как Django делает в начале и в конце обычного запроса.
+asgi_view делает так со всеми представлениями сайта, если включены
+ASYNC_VIEWS (superlists.asgi).
+'''
+import functools
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+
+def database_sync_to_async(func):
+    '''асинхронная версия func, которая выполняется в пуле потоков'''
+    @functools.wraps(func)
+    def call(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(call, thread_sensitive=False)
+
+
+def async_view(view):
+    '''асинхронная версия представления view (атрибуты вроде csrf_exempt
+    сохраняются)'''
+    call = database_sync_to_async(view)
+
+    @functools.wraps(view)
+    async def view_in_thread(request, *args, **kwargs):
+        return await call(request, *args, **kwargs)
+    return view_in_thread
+
+
+def asgi_view(view):
+    '''view для адресов сайта: под ASGI (ASYNC_VIEWS) - async_view(view)'''
+    return async_view(view) if settings.ASYNC_VIEWS else view
@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from superlists.models import ReplicaHeartbeat
+
+
+class Command(BaseCommand):
+    '''отметка времени в основной базе, по которой видно отставание реплик'''
+
+    help = 'Write the replica heartbeat to the primary database every --interval seconds'
+
+    def add_arguments(self, parser):
+        '''добавить аргументы'''
+        parser.add_argument('--once', action='store_true', help='write once and exit')
+        parser.add_argument('--interval', type=float, default=1.0, help='seconds between writes')
+
+    def handle(self, *args, **options):
+        '''Обработать'''
+        while True:
+            ReplicaHeartbeat.beat()
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,302 @@
+'''Метрики сайта в текстовом формате Prometheus.
+
+MetricsMiddleware замеряет каждый запрос: время ответа, число и время
+запросов к базе данных, время отрисовки шаблонов и размер ответа, по
+имени url. Страница /metrics (только с адресов METRICS_ALLOWED_IPS)
+отдает накопленные счетчики и гистограммы, а заголовок Server-Timing
+показывает, на что ушло время, прямо в инструментах разработчика.
+
+Каждый рабочий процесс gunicorn считает свои метрики. Если задан
+METRICS_DIR, фоновый поток процесса раз в METRICS_FLUSH_INTERVAL секунд
+(и при выходе) сохраняет их в свой файл в этом каталоге, а /metrics складывает файлы
+всех процессов, в том числе уже завершившихся, чтобы счетчики не
+уменьшались.
+'''
+import asyncio
+import atexit
+import json
+import os
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.template.backends.django import DjangoTemplates
+from django.utils.decorators import sync_and_async_middleware
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576)
+
+# имя -> (тип, описание, границы корзин гистограммы)
+METRICS = {
+    'superlists_requests_total': (
+        'counter', 'HTTP requests by view, method and status.', None),
+    'superlists_request_duration_seconds': (
+        'histogram', 'Time to produce a response.', LATENCY_BUCKETS),
+    'superlists_db_queries': (
+        'histogram', 'Database queries per request.', QUERY_BUCKETS),
+    'superlists_db_duration_seconds': (
+        'histogram', 'Time spent in database queries per request.', LATENCY_BUCKETS),
+    'superlists_template_duration_seconds': (
+        'histogram', 'Time spent rendering templates per request.', LATENCY_BUCKETS),
+    'superlists_response_size_bytes': (
+        'histogram', 'Response body size (not streamed responses).', SIZE_BUCKETS),
+}
+
+# замеры текущего запроса; переходят и в потоки sync_to_async
+_timings = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    '''то, что набирается за время одного запроса'''
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+
+
+class Registry:
+    '''метрики процесса и их сложение с метриками других процессов'''
+
+    def __init__(self, directory=None):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.flusher = None
+        # pid может повториться после перезапуска, время запуска - нет
+        self.process_id = f'{os.getpid()}-{time.time_ns()}'
+
+    def inc(self, name, labels, value=1):
+        '''увеличить счетчик'''
+        key = (name, tuple(sorted(labels.items())))
+        self._start_flusher()
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, labels, value):
+        '''записать значение в гистограмму'''
+        buckets = METRICS[name][2]
+        key = (name, tuple(sorted(labels.items())))
+        self._start_flusher()
+        with self.lock:
+            counts, total, count = self.histograms.get(
+                key, ([0] * (len(buckets) + 1), 0.0, 0)
+            )
+            index = next(
+                (i for i, bound in enumerate(buckets) if value <= bound), len(buckets)
+            )
+            counts = counts[:]  # снимок для flush может еще читаться
+            counts[index] += 1
+            self.histograms[key] = (counts, total + value, count + 1)
+
+    def snapshot(self):
+        '''метрики процесса в виде, пригодном для JSON'''
+        with self.lock:
+            return {
+                'counters': [
+                    [name, dict(labels), value]
+                    for (name, labels), value in self.counters.items()
+                ],
+                'histograms': [
+                    [name, dict(labels), counts, total, count]
+                    for (name, labels), (counts, total, count) in self.histograms.items()
+                ],
+            }
+
+    def _start_flusher(self):
+        '''запустить фоновое сохранение метрик (в рабочем процессе,
+        при первом замере, а не в главном процессе gunicorn до fork)'''
+        if self.directory and self.flusher is None:
+            with self.lock:
+                if self.flusher is None:
+                    self.flusher = threading.Thread(
+                        target=self._flush_periodically, daemon=True
+                    )
+                    self.flusher.start()
+                    atexit.register(self.flush)
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(settings.METRICS_FLUSH_INTERVAL)
+            self.flush()
+
+    def flush(self):
+        '''сохранить метрики процесса в его файл'''
+        if not self.directory:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, f'metrics-{self.process_id}.json')
+        with open(path + '.tmp', 'w') as metrics_file:
+            json.dump(self.snapshot(), metrics_file)
+        os.replace(path + '.tmp', path)
+
+    def collect(self):
+        '''метрики всех процессов, сложенные вместе'''
+        self.flush()
+        snapshots = [self.snapshot()]
+        if self.directory:
+            snapshots = []
+            for filename in sorted(os.listdir(self.directory)):
+                if filename.startswith('metrics-') and filename.endswith('.json'):
+                    with open(os.path.join(self.directory, filename)) as metrics_file:
+                        snapshots.append(json.load(metrics_file))
+        counters, histograms = {}, {}
+        for snapshot in snapshots:
+            for name, labels, value in snapshot['counters']:
+                key = (name, tuple(sorted(labels.items())))
+                counters[key] = counters.get(key, 0) + value
+            for name, labels, counts, total, count in snapshot['histograms']:
+                key = (name, tuple(sorted(labels.items())))
+                before = histograms.get(key, ([0] * len(counts), 0.0, 0))
+                histograms[key] = (
+                    [a + b for a, b in zip(before[0], counts)],
+                    before[1] + total, before[2] + count,
+                )
+        return counters, histograms
+
+    def render(self):
+        '''текстовый формат Prometheus'''
+        counters, histograms = self.collect()
+        lines = []
+        for name, (kind, help_text, buckets) in METRICS.items():
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            if kind == 'counter':
+                for (metric, labels), value in sorted(counters.items()):
+                    if metric == name:
+                        lines.append(f'{name}{_labels(labels)} {value}')
+                continue
+            for (metric, labels), (counts, total, count) in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                cumulative = 0
+                for bound, bucket_count in zip(buckets + ('+Inf',), counts):
+                    cumulative += bucket_count
+                    le = bound if isinstance(bound, str) else repr(float(bound))
+                    lines.append(
+                        f'{name}_bucket{_labels(labels + (("le", le),))} {cumulative}'
+                    )
+                lines.append(f'{name}_sum{_labels(labels)} {total}')
+                lines.append(f'{name}_count{_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    '''метки метрики: {view="home",le="0.1"}'''
+    if not labels:
+        return ''
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for key, value in labels
+    )
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+registry = Registry(settings.METRICS_DIR)
+
+
+def record_query(execute, sql, params, many, context):
+    '''обертка выполнения запросов к базе данных (execute_wrapper)'''
+    timings = _timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.db_queries += 1
+        timings.db_time += time.perf_counter() - started
+
+
+def install_query_recorder(connection, **kwargs):
+    '''подключить record_query к соединению (сигнал connection_created)'''
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    '''шаблоны Django с замером времени отрисовки'''
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
+
+
+class TimedTemplate:
+    '''шаблон, который добавляет время отрисовки к замерам запроса'''
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        timings = _timings.get()
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            if timings is not None:
+                timings.template_time += time.perf_counter() - started
+
+
+@sync_and_async_middleware
+def MetricsMiddleware(get_response):
+    '''замер запросов для /metrics и заголовка Server-Timing'''
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            timings, started = _start()
+            response = await get_response(request)
+            return _finish(request, response, timings, started)
+    else:
+        def middleware(request):
+            timings, started = _start()
+            response = get_response(request)
+            return _finish(request, response, timings, started)
+    return middleware
+
+
+def _start():
+    timings = RequestTimings()
+    _timings.set(timings)
+    return timings, time.perf_counter()
+
+
+def _finish(request, response, timings, started):
+    '''записать замеры запроса и добавить заголовок Server-Timing'''
+    _timings.set(None)
+    elapsed = time.perf_counter() - started
+    match = getattr(request, 'resolver_match', None)
+    view = match.url_name if match and match.url_name else 'unknown'
+    registry.inc('superlists_requests_total', {
+        'view': view, 'method': request.method, 'status': response.status_code,
+    })
+    labels = {'view': view}
+    registry.observe('superlists_request_duration_seconds', labels, elapsed)
+    registry.observe('superlists_db_queries', labels, timings.db_queries)
+    registry.observe('superlists_db_duration_seconds', labels, timings.db_time)
+    registry.observe('superlists_template_duration_seconds', labels, timings.template_time)
+    if not response.streaming:
+        registry.observe('superlists_response_size_bytes', labels, len(response.content))
+    response['Server-Timing'] = ', '.join([
+        f'app;dur={elapsed * 1000:.1f}',
+        f'db;dur={timings.db_time * 1000:.1f};desc="{timings.db_queries} queries"',
+        f'tpl;dur={timings.template_time * 1000:.1f}',
+    ])
+    return response
+
+
+def metrics(request):
+    '''страница метрик; доступна только с адресов METRICS_ALLOWED_IPS'''
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(
+        registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -0,0 +1,15 @@
+from django.db import models
+from django.utils import timezone
+
+
+class ReplicaHeartbeat(models.Model):
+    '''отметка времени, которую команда replica_heartbeat регулярно
+    записывает в основную базу; по ее копии на реплике видно отставание'''
+    written_at = models.DateTimeField(default=timezone.now)
+
+    @staticmethod
+    def beat():
+        '''записать текущее время (одна строка)'''
+        ReplicaHeartbeat.objects.update_or_create(
+            pk=1, defaults={'written_at': timezone.now()}
+        )
@@ -0,0 +1,67 @@
+'''Бюджеты запросов к базе данных для страниц сайта (по именам url).
+
+Тест обращается к странице через QueryBudgetMixin.assertQueryBudget при
+нескольких объемах данных (DATA_SIZES): число запросов не должно
+превышать бюджет страницы и не должно расти вместе с числом строк,
+так ловятся запросы в цикле по спискам или элементам (N+1).
+'''
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from accounts.authentication import user_cache
+
+# наибольшее число запросов к базе данных на один HTTP-запрос
+QUERY_BUDGETS = {
+    # lists/urls.py
+    'view_list': 5,
+    'list_items': 3,
+    'export_list': 2,
+    'new_list': 5,
+    'my_lists': 5,
+    'api_new_list': 5,
+    'api_list_items': 6,
+    # accounts/urls.py
+    'send_login_email': 2,
+    'login': 10,
+    'logout': 4,
+    # superlists/urls.py
+    'home': 2,
+    'metrics': 0,
+}
+
+# объемы данных (число списков и элементов), при которых считаются запросы
+DATA_SIZES = (1, 10, 50)
+
+
+class QueryBudgetMixin:
+    '''примесь к TestCase: проверка бюджета запросов страницы'''
+
+    def assertQueryBudget(self, url_name, make_request, sizes=DATA_SIZES):
+        '''make_request(size) готовит данные объема size и возвращает
+        функцию, которая выполняет запрос к странице url_name'''
+        budget = QUERY_BUDGETS[url_name]
+        counts = {}
+        for size in sizes:
+            do_request = make_request(size)
+            # без кэшей: считается худший случай
+            caches[settings.LIST_TABLE_CACHE_ALIAS].clear()
+            user_cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                do_request()
+            counts[size] = len(context)
+            queries = '\n'.join(
+                f'{i}. {query["sql"]}'
+                for i, query in enumerate(context.captured_queries, start=1)
+            )
+            self.assertLessEqual(
+                counts[size], budget,
+                f'{url_name}: {counts[size]} queries with {size} rows, '
+                f'budget is {budget}\n{queries}'
+            )
+        self.assertEqual(
+            len(set(counts.values())), 1,
+            f'{url_name}: number of queries grows with data size: {counts}'
+        )
+
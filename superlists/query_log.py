@@ -0,0 +1,167 @@
+'''Журнал медленных и повторяющихся запросов к базе данных.
+
+Обертка log_query (execute_wrapper, подключается ко всем соединениям
+в SuperlistsConfig.ready) замеряет каждый запрос и работает без DEBUG:
+
+* запрос дольше SQL_SLOW_QUERY_MS записывается в журнал (WARNING) вместе
+  с именем представления и местом в коде проекта, откуда он выполнен;
+* запросы одного HTTP-запроса группируются по форме (SQL без значений),
+  и форма, выполненная SQL_REPEATED_QUERY_THRESHOLD и более раз,
+  записывается как вероятный N+1 (WARNING); сводка по всем формам
+  пишется на уровне DEBUG.
+
+Вне HTTP-запросов (например, в командах manage.py) те же проверки
+включает контекстный менеджер request_queries.
+'''
+import asyncio
+import logging
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.utils.decorators import sync_and_async_middleware
+
+logger = logging.getLogger(__name__)
+
+_current = ContextVar('request_queries', default=None)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s')
+_REPEATED_GROUP = re.compile(r'(\((?:\?, )*\?\))(?:, \1)+')
+_REPEATED_VALUE = re.compile(r'\?(?:, \?)+')
+_SAVEPOINT = re.compile(r'"s\d+_x\d+"')
+
+# код, который не считается местом выполнения запроса: стандартная
+# библиотека, Django, установленные пакеты и обертки запросов
+_SKIPPED_PATHS = tuple(
+    os.path.dirname(path) + os.sep
+    for path in (os.__file__, sys.modules['django'].__file__)
+)
+_SKIPPED_FILES = {
+    __file__, os.path.join(os.path.dirname(__file__), 'metrics.py'),
+}
+
+
+def query_shape(sql):
+    '''форма запроса: SQL без значений, списки значений свернуты'''
+    shape = _STRING.sub('?', sql)
+    shape = _NUMBER.sub('?', shape)
+    shape = _PLACEHOLDER.sub('?', shape)
+    shape = _SAVEPOINT.sub('?', shape)
+    shape = _REPEATED_GROUP.sub(r'\1, ...', shape)
+    return _REPEATED_VALUE.sub('?, ...', shape)
+
+
+def query_origin():
+    '''место в коде проекта, откуда выполнен запрос: "файл:строка в функции"'''
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if not (
+            filename in _SKIPPED_FILES or filename.startswith(_SKIPPED_PATHS)
+            or 'site-packages' in filename
+        ):
+            path = os.path.relpath(filename, settings.BASE_DIR)
+            return f'{path}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return 'unknown'
+
+
+class RequestQueries:
+    '''запросы к базе данных одного HTTP-запроса, по формам'''
+
+    def __init__(self, name, request=None):
+        self.name = name
+        self.request = request
+        # форма -> [число выполнений, общее время, место выполнения
+        # (определяется при первом повторе, для одиночных не нужно)]
+        self.shapes = {}
+
+    @property
+    def view(self):
+        '''имя url представления, когда оно уже известно, иначе name'''
+        match = getattr(self.request, 'resolver_match', None)
+        return match.url_name if match and match.url_name else self.name
+
+    def record(self, sql, duration):
+        shape = query_shape(sql)
+        entry = self.shapes.get(shape)
+        if entry is None:
+            self.shapes[shape] = [1, duration, None]
+            return
+        entry[0] += 1
+        entry[1] += duration
+        if entry[2] is None:
+            entry[2] = query_origin()
+
+    def report(self):
+        '''записать в журнал повторяющиеся формы и сводку'''
+        threshold = settings.SQL_REPEATED_QUERY_THRESHOLD
+        for shape, (count, total, origin) in self.shapes.items():
+            if count >= threshold:
+                logger.warning(
+                    'repeated query in %s: %d times, %.1f ms total, at %s: %s',
+                    self.view, count, total * 1000, origin, shape,
+                )
+        if logger.isEnabledFor(logging.DEBUG):
+            for shape, (count, total, _) in sorted(
+                self.shapes.items(), key=lambda item: -item[1][1]
+            ):
+                logger.debug(
+                    '%s: %d x %.1f ms: %s', self.view, count, total * 1000, shape
+                )
+
+
+def log_query(execute, sql, params, many, context):
+    '''обертка выполнения запросов к базе данных (execute_wrapper)'''
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = time.perf_counter() - started
+        queries = _current.get()
+        if queries is not None:
+            queries.record(sql, duration)
+        if duration * 1000 >= settings.SQL_SLOW_QUERY_MS:
+            logger.warning(
+                'slow query %.1f ms in %s at %s: %s',
+                duration * 1000, queries.view if queries else '-',
+                query_origin(), sql,
+            )
+
+
+def install_query_logger(connection, **kwargs):
+    '''подключить log_query к соединению (сигнал connection_created)'''
+    if log_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(log_query)
+
+
+@contextmanager
+def request_queries(name, request=None):
+    '''собирать запросы блока под именем name и в конце сообщить о повторах'''
+    queries = RequestQueries(name, request)
+    token = _current.set(queries)
+    try:
+        yield queries
+    finally:
+        _current.reset(token)
+        queries.report()
+
+
+@sync_and_async_middleware
+def QueryLogMiddleware(get_response):
+    '''сводка запросов к базе данных каждого HTTP-запроса'''
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            with request_queries(request.path, request):
+                return await get_response(request)
+    else:
+        def middleware(request):
+            with request_queries(request.path, request):
+                return get_response(request)
+    return middleware
@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'superlists',
     'lists',
     'accounts',
     'functional_tests',
@@ -49,6 +50,9 @@ AUTHENTICATION_BACKENDS = [
 ]
 
 MIDDLEWARE = [
+    'superlists.metrics.MetricsMiddleware',
+    'superlists.query_log.QueryLogMiddleware',
+    'superlists.db_router.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -62,7 +66,7 @@ ROOT_URLCONF = 'superlists.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'superlists.metrics.TimedDjangoTemplates',
         'DIRS': [],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -86,9 +90,95 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / '..' / 'database' / 'db.sqlite3',
+        # тестовая база - в памяти; тесты с потоками переключают ее на
+        # временный файл (superlists/test_databases.py)
     }
 }
 
+# Реплики для чтения (superlists/db_router.py): псевдонимы из DATABASES.
+# DATABASE_REPLICA_NAME - файл реплики SQLite (копия основной базы,
+# которую обновляет репликация или регулярный .backup); реплики PostgreSQL
+# добавляются в DATABASES так же, со своим HOST. В тестах реплика
+# совпадает с основной базой (MIRROR)
+DATABASE_REPLICAS = []
+if os.environ.get('DATABASE_REPLICA_NAME'):
+    DATABASES['replica'] = dict(
+        DATABASES['default'], NAME=os.environ['DATABASE_REPLICA_NAME'],
+        TEST={'MIRROR': 'default'},
+    )
+    DATABASE_REPLICAS = ['replica']
+# Шардирование списков (lists/sharding.py): базы, по которым распределяются
+# списки и их элементы; с одной базой выключено. LIST_SHARD_NAMES - файлы
+# SQLite дополнительных шардов через запятую
+LIST_SHARDS = ['default']
+for number, name in enumerate(
+    filter(None, os.environ.get('LIST_SHARD_NAMES', '').split(',')), start=1
+):
+    DATABASES[f'shard{number}'] = dict(
+        DATABASES['default'], NAME=name,
+        TEST={'NAME': BASE_DIR / '..' / 'database' / f'test_shard{number}.sqlite3'},
+    )
+    LIST_SHARDS.append(f'shard{number}')
+DATABASE_ROUTERS = [
+    'lists.sharding.ShardRouter', 'superlists.db_router.ReplicaRouter',
+]
+# модели, которые читаются с реплик; сколько секунд после записи чтения
+# пользователя идут в основную базу; допустимое отставание реплики и
+# как часто его проверять, в секундах
+REPLICA_MODELS = ['lists.list', 'lists.item', 'accounts.user']
+REPLICA_PIN_SECONDS = 5
+REPLICA_MAX_LAG = 2
+REPLICA_LAG_CHECK_INTERVAL = 1
+
+# PRAGMA, которые выполняются для каждого нового соединения с SQLite
+# (superlists/sqlite.py): WAL - чтение не ждет записи; NORMAL - без fsync
+# на каждую транзакцию (в режиме WAL база остается согласованной);
+# ожидание блокировки в мс; кэш страниц (отрицательное - в КиБ, 64 МиБ)
+# и отображение файла базы в память (256 МиБ)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+}
+
+# Кэши. Кэши таблиц списков и сеансов подключаемые: locmem, file или
+# memcached (локальный сервер), выбираются переменными окружения
+# LIST_CACHE_BACKEND и SESSION_CACHE_BACKEND
+CACHE_BACKENDS = {
+    'locmem': 'django.core.cache.backends.locmem.LocMemCache',
+    'file': 'django.core.cache.backends.filebased.FileBasedCache',
+    'memcached': 'django.core.cache.backends.memcached.PyMemcacheCache',
+}
+CACHE_LOCATIONS = {
+    'locmem': '{name}',
+    'file': str(BASE_DIR / '..' / 'cache' / '{name}'),
+    'memcached': '127.0.0.1:11211',
+}
+
+def _cache_config(name, default_backend):
+    '''настройки кэша по имени, с выбором сервера из окружения'''
+    backend = os.environ.get(f'{name.upper()}_CACHE_BACKEND', default_backend)
+    location = CACHE_LOCATIONS[backend].format(name=name)
+    return {
+        'BACKEND': CACHE_BACKENDS[backend],
+        'LOCATION': os.environ.get(f'{name.upper()}_CACHE_LOCATION', location),
+        'KEY_PREFIX': name,
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'lists': _cache_config('list', 'locmem'),
+    # сеансы в кэше должны быть видны всем процессам gunicorn
+    'sessions': _cache_config('session', 'file'),
+}
+LIST_TABLE_CACHE_ALIAS = 'lists'
+# устаревшие версии таблиц не удаляются явно, а вытесняются по времени
+LIST_TABLE_CACHE_TIMEOUT = 24 * 60 * 60
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -160,6 +250,97 @@ LOGGING = {
         'django': {
             'handlers': ['console'],
         },
+        # медленные и повторяющиеся запросы к базе данных; DEBUG - сводка
+        # запросов каждого HTTP-запроса
+        'superlists.query_log': {
+            'handlers': ['console'],
+            'level': os.environ.get('SQL_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
     },
     'root': {'level': 'INFO'},
- }
\ No newline at end of file
+ }
+
+# Хранение сеансов, выбирается переменной окружения SESSION_MODE:
+# db - в базе данных, cache - только в кэше 'sessions', cached_db - кэш
+# с записью в базу, signed_cookies - в подписанной cookie без сервера
+SESSION_ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cache': 'django.contrib.sessions.backends.cache',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'signed_cookies': 'django.contrib.sessions.backends.signed_cookies',
+}
+SESSION_MODE = os.environ.get('SESSION_MODE', 'db')
+SESSION_ENGINE = SESSION_ENGINES[SESSION_MODE]
+SESSION_CACHE_ALIAS = 'sessions'
+
+# Размер страницы "Моих списков" (постраничный вывод по курсору id)
+MY_LISTS_PAGE_SIZE = 50
+
+# Размер страницы элементов списка (постраничный вывод по курсору id)
+LIST_ITEMS_PAGE_SIZE = 100
+
+# Сколько строк списка читать и выводить за раз при потоковой отдаче
+LIST_STREAM_CHUNK_SIZE = 500
+# Под ASGI потоковый ответ сначала пишется во временный файл: сколько
+# байт держать в памяти, прежде чем файл уйдет на диск
+LIST_STREAM_SPOOL_SIZE = 1024 * 1024
+
+# JSON API списков: размер страницы элементов и предел пакета добавления
+API_ITEMS_PAGE_LIMIT = 500
+API_MAX_ITEMS_PER_REQUEST = 1000
+
+# Групповая фиксация записей элементов (lists/write_queue.py): записи
+# параллельных потоков процесса выполняются одной транзакцией. Первая
+# запись группы ждет остальные до ITEM_WRITE_BATCH_WINDOW секунд или
+# пока их не наберется ITEM_WRITE_BATCH_SIZE
+ITEM_WRITE_BATCHING = os.environ.get('ITEM_WRITE_BATCHING') == '1'
+ITEM_WRITE_BATCH_WINDOW = 0.002
+ITEM_WRITE_BATCH_SIZE = 32
+
+# Сколько строк вставлять одним INSERT при импорте (import_lists)
+IMPORT_INSERT_CHUNK_SIZE = 500
+
+# Срок действия ссылки для входа, в секундах
+LOGIN_TOKEN_TTL = 60 * 60
+
+# Кэш пользователей для get_user: время жизни записи (с), размер кэша
+# процесса и необязательный общий кэш (псевдоним из CACHES или None)
+USER_CACHE_TTL = 60
+USER_CACHE_SIZE = 10000
+USER_CACHE_ALIAS = os.environ.get('USER_CACHE_ALIAS') or None
+
+# Очередь исходящих писем. EMAIL_OUTBOX_DELIVERY: thread - отправка
+# в пуле потоков процесса после ответа, command - отдельным процессом
+# manage.py send_outbox. Неудачные попытки повторяются с удвоением паузы
+# (в режиме thread - по таймеру на время следующей попытки)
+EMAIL_OUTBOX_DELIVERY = os.environ.get('EMAIL_OUTBOX_DELIVERY', 'thread')
+EMAIL_OUTBOX_THREADS = 2
+EMAIL_OUTBOX_BATCH_SIZE = 50
+EMAIL_OUTBOX_MAX_ATTEMPTS = 5
+EMAIL_OUTBOX_RETRY_DELAY = 30
+EMAIL_OUTBOX_LEASE = 5 * 60
+
+# Пул SMTP-соединений обработчика исходящих: число открытых соединений
+# и сколько секунд простоя допускается без проверки командой NOOP
+EMAIL_POOL_SIZE = 2
+EMAIL_POOL_MAX_IDLE = 30
+
+# Асинхронные версии представлений, которые выполняются в пуле потоков
+# (superlists/db_threads.py); включается в superlists/asgi.py
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS') == '1'
+
+# Метрики (/metrics): с каких адресов их можно читать, каталог, куда
+# рабочие процессы сохраняют свои метрики для сложения (None - метрики
+# только текущего процесса), и как часто сохранять, в секундах.
+# Через unix-сокет gunicorn идут и запросы от nginx, поэтому метрики
+# читают через отдельный адрес 127.0.0.1 (второй --bind в службе)
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+METRICS_DIR = os.environ.get('METRICS_DIR') or None
+METRICS_FLUSH_INTERVAL = 1
+
+# Журнал запросов к базе данных (superlists.query_log): запрос дольше
+# SQL_SLOW_QUERY_MS миллисекунд - медленный; одна и та же форма запроса
+# SQL_REPEATED_QUERY_THRESHOLD и более раз за HTTP-запрос - вероятный N+1
+SQL_SLOW_QUERY_MS = int(os.environ.get('SQL_SLOW_QUERY_MS', 100))
+SQL_REPEATED_QUERY_THRESHOLD = 10
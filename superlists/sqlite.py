@@ -0,0 +1,24 @@
+'''Настройка соединений SQLite для нескольких рабочих процессов.
+
+С журналом по умолчанию (rollback journal) пишущий процесс блокирует
+и читающих, а при нескольких рабочих процессах gunicorn запросы чаще
+получают "database is locked". Для каждого нового соединения с SQLite
+выполняются PRAGMA из настройки SQLITE_PRAGMAS: журнал WAL (чтение не
+ждет записи), synchronous=NORMAL (в режиме WAL не теряет согласованность
+при сбое), время ожидания блокировки, размер кэша страниц и mmap_size.
+'''
+from django.conf import settings
+
+
+def configure_sqlite(connection, **kwargs):
+    '''выполнить SQLITE_PRAGMAS для нового соединения (сигнал connection_created)
+
+    Соединение, которое еще не открыто (ready() проходит по всем
+    псевдонимам), не открывается: PRAGMA выполнятся по сигналу, когда
+    Django откроет его сам.
+    '''
+    if connection.vendor != 'sqlite' or connection.connection is None:
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
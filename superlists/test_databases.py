@@ -0,0 +1,83 @@
+'''Базы данных SQLite для тестов: дополнительные (реплики, шарды) и
+основная в файле для тестов с потоками.
+
+Тестовый запуск Django проверяет и создает только базы из DATABASES,
+поэтому ExtraDatabasesMixin подключает свои базы в setUpClass, уже
+после этих проверок, и очищает их после каждого теста.
+
+Основная тестовая база - в памяти. В общей памяти SQLite параллельные
+потоки получают "table is locked" вместо ожидания, поэтому тесты
+конкурентной записи через FileDatabaseMixin на время своего класса
+переключают основную базу на временный файл.
+'''
+import os
+import tempfile
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class ExtraDatabasesMixin:
+    '''примесь к TransactionTestCase: базы extra_databases на время тестов класса'''
+
+    extra_databases = ()
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls._extra_directory = tempfile.TemporaryDirectory()
+        for alias in cls.extra_databases:
+            name = os.path.join(cls._extra_directory.name, f'{alias}.sqlite3')
+            connections.databases[alias] = dict(
+                connections.databases['default'], NAME=name, TEST={'NAME': name},
+            )
+            connections[alias].creation.create_test_db(verbosity=0, serialize=False)
+
+    @classmethod
+    def tearDownClass(cls):
+        for alias in cls.extra_databases:
+            connections[alias].creation.destroy_test_db(
+                connections[alias].settings_dict['NAME'], verbosity=0
+            )
+            del connections[alias]
+            del connections.databases[alias]
+        cls._extra_directory.cleanup()
+        super().tearDownClass()
+
+    def tearDown(self):
+        for alias in self.extra_databases:
+            call_command(
+                'flush', database=alias, interactive=False, verbosity=0,
+                inhibit_post_migrate=True,
+            )
+        super().tearDown()
+
+
+class FileDatabaseMixin:
+    '''примесь к TransactionTestCase с потоками: основная база на время
+    тестов класса - временный файл, а не общая память'''
+
+    @classmethod
+    def setUpClass(cls):
+        cls._file_directory = tempfile.TemporaryDirectory()
+        connection = connections[DEFAULT_DB_ALIAS]
+        # соединение с базой в памяти не закрывается: иначе она пропадет
+        cls._memory_name = connection.settings_dict['NAME']
+        cls._memory_connection = connection.connection
+        connection.connection = None
+        connection.settings_dict['NAME'] = os.path.join(
+            cls._file_directory.name, 'default.sqlite3'
+        )
+        call_command(
+            'migrate', database=DEFAULT_DB_ALIAS, interactive=False, verbosity=0,
+            run_syncdb=True,
+        )
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connection = connections[DEFAULT_DB_ALIAS]
+        connection.close()
+        connection.settings_dict['NAME'] = cls._memory_name
+        connection.connection = cls._memory_connection
+        cls._file_directory.cleanup()
@@ -0,0 +1,96 @@
+from datetime import timedelta
+from django.core.cache import caches
+from django.test import TransactionTestCase, override_settings
+from django.utils import timezone
+from accounts.models import User
+from lists.models import Item, List
+from superlists.db_router import PIN_COOKIE, ReplicaRouter, replica_lag
+from superlists.models import ReplicaHeartbeat
+from superlists.test_databases import ExtraDatabasesMixin
+
+
+@override_settings(DATABASE_REPLICAS=['test_replica'])
+class ReplicaRouterTest(ExtraDatabasesMixin, TransactionTestCase):
+    '''тест чтения с реплики: вторая база SQLite с теми же таблицами,
+    данные в которую тест записывает сам (как будто их скопировала репликация)'''
+
+    extra_databases = ('test_replica',)
+
+    def setUp(self):
+        '''установка: реплика не отстала, кэш таблиц пуст'''
+        replica_lag.clear()
+        caches['lists'].clear()
+        self.beat(timezone.now())
+
+    def beat(self, written_at):
+        '''вспомогательная функция: отметка времени, дошедшая до реплики'''
+        ReplicaHeartbeat.objects.using('test_replica').update_or_create(
+            pk=1, defaults={'written_at': written_at}
+        )
+
+    def create_list(self, primary_text, replica_text):
+        '''вспомогательная функция: один список с разным элементом
+        в основной базе и на реплике'''
+        list_ = List.create_new(first_item_text=primary_text)
+        List.objects.using('test_replica').create(id=list_.id, name=replica_text)
+        # bulk_create: Item.save() обновил бы версию списка в основной базе
+        Item.objects.using('test_replica').bulk_create([Item(list_id=list_.id, text=replica_text)])
+        return list_
+
+    def test_list_page_is_read_from_replica(self):
+        '''тест: страница списка читается с реплики'''
+        list_ = self.create_list('on primary', 'on replica')
+        response = self.client.get(f'/lists/{list_.id}/')
+        self.assertContains(response, 'on replica')
+        self.assertNotContains(response, 'on primary')
+
+    def test_my_lists_and_user_are_read_from_replica(self):
+        '''тест: "Мои списки" и пользователь читаются с реплики'''
+        User.objects.using('test_replica').create(email='a@b.com')
+        List.objects.using('test_replica').create(owner_id='a@b.com', name='replica list')
+        response = self.client.get('/lists/users/a@b.com/')
+        self.assertContains(response, 'replica list')
+
+    def test_reads_go_to_primary_after_write(self):
+        '''тест: после записи чтения пользователя идут в основную базу'''
+        list_ = self.create_list('on primary', 'on replica')
+        response = self.client.post(f'/lists/{list_.id}/', data={'text': 'new item'})
+        self.assertIn(PIN_COOKIE, response.cookies)
+        response = self.client.get(f'/lists/{list_.id}/')
+        self.assertContains(response, 'new item')
+        self.assertContains(response, 'on primary')
+
+    def test_viewing_list_does_not_pin_reads(self):
+        '''тест: просмотр списка (без записи) не закрепляет чтения'''
+        list_ = self.create_list('on primary', 'on replica')
+        response = self.client.get(f'/lists/{list_.id}/')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+        response = self.client.get(f'/lists/{list_.id}/')
+        self.assertContains(response, 'on replica')
+
+    def test_other_users_still_read_from_replica_after_write(self):
+        '''тест: запись одного пользователя не закрепляет чтения других'''
+        list_ = self.create_list('on primary', 'on replica')
+        self.client.post(f'/lists/{list_.id}/', data={'text': 'new item'})
+        self.client.cookies.clear()
+        response = self.client.get(f'/lists/{list_.id}/')
+        self.assertContains(response, 'on replica')
+
+    def test_falls_back_to_primary_when_replica_is_behind(self):
+        '''тест: с отставшей реплики не читает'''
+        self.beat(timezone.now() - timedelta(minutes=1))
+        list_ = self.create_list('on primary', 'on replica')
+        response = self.client.get(f'/lists/{list_.id}/')
+        self.assertContains(response, 'on primary')
+
+    def test_falls_back_to_primary_without_heartbeat(self):
+        '''тест: без отметки времени на реплике отставание неизвестно'''
+        ReplicaHeartbeat.objects.using('test_replica').all().delete()
+        list_ = self.create_list('on primary', 'on replica')
+        response = self.client.get(f'/lists/{list_.id}/')
+        self.assertContains(response, 'on primary')
+
+    def test_reads_outside_requests_use_primary(self):
+        '''тест: вне HTTP-запроса чтения идут в основную базу'''
+        self.assertIsNone(ReplicaRouter().db_for_read(List))
+        self.assertEqual(ReplicaRouter().db_for_write(List), 'default')
@@ -0,0 +1,42 @@
+import asyncio
+import threading
+from asgiref.sync import sync_to_async
+from django.db import connection
+from django.test import TransactionTestCase
+from lists import api
+from superlists.db_threads import async_view, database_sync_to_async
+from superlists.test_databases import FileDatabaseMixin
+
+
+class DatabaseSyncToAsyncTest(FileDatabaseMixin, TransactionTestCase):
+    '''тест обращений к базе из асинхронного кода'''
+
+    async def test_does_not_wait_for_shared_thread(self):
+        '''тест: вызов не ждет, пока освободится общий поток sync_to_async'''
+        started, released = threading.Event(), threading.Event()
+
+        def hold_shared_thread():
+            started.set()
+            return released.wait(5)
+
+        busy = asyncio.ensure_future(sync_to_async(hold_shared_thread)())
+        while not started.is_set():
+            await asyncio.sleep(0.01)
+        await database_sync_to_async(released.set)()
+        self.assertTrue(await busy)
+
+    async def test_closes_connection_after_call(self):
+        '''тест: соединение потока закрывается после вызова'''
+        def query():
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            return connection
+
+        used = await database_sync_to_async(query)()
+        self.assertIsNone(used.connection)
+
+    def test_async_view_keeps_view_attributes(self):
+        '''тест: асинхронная версия представления сохраняет его атрибуты'''
+        view = async_view(api.list_items)
+        self.assertTrue(asyncio.iscoroutinefunction(view))
+        self.assertTrue(view.csrf_exempt)
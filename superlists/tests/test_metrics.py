@@ -0,0 +1,121 @@
+import tempfile
+from unittest.mock import patch
+from django.test import TestCase
+from lists.models import List
+from superlists.metrics import Registry
+
+
+class MetricsMiddlewareTest(TestCase):
+    '''тест замера запросов'''
+
+    def setUp(self):
+        '''установка: свои метрики на каждый тест'''
+        self.registry = Registry()
+        patcher = patch('superlists.metrics.registry', self.registry)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_sends_server_timing_header(self):
+        '''тест: отправляет заголовок Server-Timing'''
+        list_ = List.create_new(first_item_text='item')
+        response = self.client.get(f'/lists/{list_.id}/')
+        timing = response['Server-Timing']
+        self.assertRegex(
+            timing, r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+$'
+        )
+        self.assertNotIn('desc="0 queries"', timing)
+
+    def test_counts_requests_by_view_method_and_status(self):
+        '''тест: считает запросы по представлению, методу и статусу'''
+        self.client.get('/')
+        self.client.get('/')
+        self.client.post('/lists/new', data={'text': ''})
+        counters, _ = self.registry.collect()
+        self.assertEqual(counters[('superlists_requests_total', (
+            ('method', 'GET'), ('status', 200), ('view', 'home'),
+        ))], 2)
+        self.assertEqual(counters[('superlists_requests_total', (
+            ('method', 'POST'), ('status', 200), ('view', 'new_list'),
+        ))], 1)
+
+    def test_records_db_queries_template_time_and_size(self):
+        '''тест: записывает запросы к базе, время шаблонов и размер ответа'''
+        list_ = List.create_new(first_item_text='item')
+        response = self.client.get(f'/lists/{list_.id}/')
+        _, histograms = self.registry.collect()
+        labels = (('view', 'view_list'),)
+        queries = histograms[('superlists_db_queries', labels)]
+        self.assertGreater(queries[1], 0)
+        template_time = histograms[('superlists_template_duration_seconds', labels)]
+        self.assertGreater(template_time[1], 0)
+        size = histograms[('superlists_response_size_bytes', labels)]
+        self.assertEqual(size[1], len(response.content))
+
+    async def test_measures_async_views(self):
+        '''тест: замеряет и асинхронные запросы'''
+        response = await self.async_client.get('/')
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+
+
+class MetricsPageTest(TestCase):
+    '''тест страницы метрик'''
+
+    def test_renders_prometheus_text_format(self):
+        '''тест: отдает метрики в текстовом формате Prometheus'''
+        self.client.get('/')
+        response = self.client.get('/metrics')
+        self.assertEqual(response['Content-Type'], 'text/plain; version=0.0.4; charset=utf-8')
+        text = response.content.decode()
+        self.assertIn('# TYPE superlists_request_duration_seconds histogram', text)
+        self.assertRegex(
+            text, r'superlists_requests_total\{method="GET",status="200",view="home"\} \d+'
+        )
+        self.assertIn('superlists_request_duration_seconds_bucket{view="home",le="+Inf"}', text)
+
+    def test_not_available_from_other_addresses(self):
+        '''тест: недоступна с других адресов'''
+        response = self.client.get('/metrics', REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 404)
+
+    def test_not_available_through_unix_socket(self):
+        '''тест: недоступна через unix-сокет gunicorn (пустой адрес),
+        через который идут и запросы от nginx'''
+        response = self.client.get('/metrics', REMOTE_ADDR='')
+        self.assertEqual(response.status_code, 404)
+
+
+class RegistryTest(TestCase):
+    '''тест сложения метрик рабочих процессов'''
+
+    def test_adds_up_metrics_of_all_processes(self):
+        '''тест: складывает метрики всех процессов, в том числе завершенных'''
+        with tempfile.TemporaryDirectory() as directory:
+            first, second = Registry(directory), Registry(directory)
+            first.inc('superlists_requests_total', {'view': 'home'})
+            second.inc('superlists_requests_total', {'view': 'home'}, 2)
+            first.observe('superlists_db_queries', {'view': 'home'}, 1)
+            second.observe('superlists_db_queries', {'view': 'home'}, 200)
+            first.flush()
+            del first  # процесс завершился, его файл остается
+
+            counters, histograms = second.collect()
+
+        self.assertEqual(
+            counters[('superlists_requests_total', (('view', 'home'),))], 3
+        )
+        counts, total, count = histograms[('superlists_db_queries', (('view', 'home'),))]
+        self.assertEqual((total, count), (201, 2))
+        self.assertEqual(counts[1], 1)  # корзина le=1
+        self.assertEqual(counts[-1], 1)  # корзина +Inf
+
+    def test_histogram_buckets_are_cumulative(self):
+        '''тест: корзины гистограммы накопительные'''
+        registry = Registry()
+        for value in (0.001, 0.02, 20):
+            registry.observe('superlists_request_duration_seconds', {'view': 'home'}, value)
+        text = registry.render()
+        self.assertIn('superlists_request_duration_seconds_bucket{view="home",le="0.005"} 1', text)
+        self.assertIn('superlists_request_duration_seconds_bucket{view="home",le="0.025"} 2', text)
+        self.assertIn('superlists_request_duration_seconds_bucket{view="home",le="10.0"} 2', text)
+        self.assertIn('superlists_request_duration_seconds_bucket{view="home",le="+Inf"} 3', text)
+        self.assertIn('superlists_request_duration_seconds_count{view="home"} 3', text)
@@ -0,0 +1,67 @@
+from django.test import TestCase, override_settings
+from lists.models import List
+from superlists.query_log import query_shape, request_queries
+
+
+class QueryShapeTest(TestCase):
+    '''тест формы запроса'''
+
+    def test_replaces_values_with_placeholders(self):
+        '''тест: значения заменяются знаками вопроса'''
+        self.assertEqual(
+            query_shape("SELECT * FROM t WHERE a = 'it''s' AND b = 42 AND c = %s"),
+            'SELECT * FROM t WHERE a = ? AND b = ? AND c = ?',
+        )
+
+    def test_collapses_value_lists(self):
+        '''тест: списки значений сворачиваются'''
+        self.assertEqual(
+            query_shape('SELECT * FROM t WHERE id IN (%s, %s, %s)'),
+            query_shape('SELECT * FROM t WHERE id IN (%s, %s)'),
+        )
+        self.assertEqual(
+            query_shape('INSERT INTO t (a, b) VALUES (%s, %s), (%s, %s)'),
+            'INSERT INTO t (a, b) VALUES (?, ...), ...',
+        )
+
+    def test_keeps_identifiers_with_digits(self):
+        '''тест: имена с цифрами не меняются'''
+        self.assertEqual(
+            query_shape('SELECT "t2"."id" FROM "t2"'), 'SELECT "t2"."id" FROM "t2"'
+        )
+
+
+class QueryLogTest(TestCase):
+    '''тест журнала запросов'''
+
+    @override_settings(SQL_SLOW_QUERY_MS=0)
+    def test_logs_slow_queries_with_view_and_origin(self):
+        '''тест: медленный запрос записывается с представлением и местом в коде'''
+        with self.assertLogs('superlists.query_log', 'WARNING') as logs:
+            list_ = List.create_new(first_item_text='item')
+            self.client.get(f'/lists/{list_.id}/')
+        message = next(
+            line for line in logs.output if 'SELECT' in line and 'FROM "lists_list"' in line
+        )
+        self.assertIn('slow query', message)
+        self.assertIn(' in view_list at lists/views.py:', message)
+
+    def test_does_not_log_fast_queries(self):
+        '''тест: быстрые запросы не записываются'''
+        list_ = List.create_new(first_item_text='item')
+        with self.assertRaises(AssertionError):
+            with self.assertLogs('superlists.query_log', 'WARNING'):
+                self.client.get(f'/lists/{list_.id}/')
+
+    @override_settings(SQL_REPEATED_QUERY_THRESHOLD=3)
+    def test_flags_repeated_queries(self):
+        '''тест: повторяющаяся форма запроса отмечается как N+1'''
+        lists = [List.create_new(first_item_text=f'item {i}') for i in range(3)]
+        with self.assertLogs('superlists.query_log', 'WARNING') as logs:
+            with request_queries('loop'):
+                for list_ in lists:
+                    list_.item_set.count()
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('repeated query in loop: 3 times', logs.output[0])
+        self.assertIn('superlists/tests/test_query_log.py:', logs.output[0])
+        self.assertIn('WHERE "lists_item"."list_id" = ?', logs.output[0])
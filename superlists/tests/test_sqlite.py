@@ -0,0 +1,54 @@
+from unittest.mock import Mock
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from superlists.sqlite import configure_sqlite
+from superlists.test_databases import FileDatabaseMixin
+
+
+class SQLitePragmasTest(TestCase):
+    '''тест настройки соединений SQLite'''
+
+    def pragma(self, name):
+        '''вспомогательная функция: значение PRAGMA соединения'''
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA {name}')
+            return cursor.fetchone()[0]
+
+    def test_connection_uses_settings_pragmas(self):
+        '''тест: соединение настроено по SQLITE_PRAGMAS (журнал WAL и
+        mmap проверяет SQLiteFileDatabaseTest: у базы в памяти их нет)'''
+        self.assertEqual(self.pragma('synchronous'), 1)  # NORMAL
+        self.assertEqual(self.pragma('busy_timeout'), 5000)
+        self.assertEqual(self.pragma('cache_size'), -64000)
+
+    @override_settings(SQLITE_PRAGMAS={'cache_size': -1000})
+    def test_applies_pragmas_from_settings(self):
+        '''тест: выполняет PRAGMA из настроек'''
+        self.addCleanup(connection.cursor().execute, 'PRAGMA cache_size = -64000')
+        configure_sqlite(connection)
+        self.assertEqual(self.pragma('cache_size'), -1000)
+
+    def test_ignores_other_databases(self):
+        '''тест: не трогает соединения с другими СУБД'''
+        other = Mock(vendor='postgresql')
+        configure_sqlite(other)
+        self.assertFalse(other.cursor.called)
+
+    def test_does_not_open_closed_connections(self):
+        '''тест: не открывает соединение, которое еще не открыто
+        (обращаться к базе из AppConfig.ready нельзя)'''
+        closed = Mock(vendor='sqlite', connection=None)
+        configure_sqlite(closed)
+        self.assertFalse(closed.cursor.called)
+
+
+class SQLiteFileDatabaseTest(FileDatabaseMixin, TransactionTestCase):
+    '''тест настройки соединения с базой SQLite в файле'''
+
+    def test_file_database_uses_wal_and_mmap(self):
+        '''тест: база в файле работает с журналом WAL и mmap'''
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA mmap_size')
+            self.assertEqual(cursor.fetchone()[0], 256 * 1024 * 1024)
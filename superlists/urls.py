@@ -3,11 +3,13 @@ from django.urls import path, include
 from lists import views as list_views
 from lists import urls as list_urls
 from accounts import urls as accounts_urls
-
+from superlists import metrics
+from superlists.db_threads import asgi_view
 
 urlpatterns = [
    # path('admin/', admin.site.urls),
-    path('', list_views.home_page, name="home"),
+    path('', asgi_view(list_views.home_page), name="home"),
     path('lists/', include(list_urls)),
     path('accounts/', include(accounts_urls)),
+    path('metrics', asgi_view(metrics.metrics), name='metrics'),
 ]